@@ -0,0 +1,310 @@
+"""
+Admission control and load shedding
+
+Two checks keep a flood of requests (e.g. a survey uploaded one row at a
+time through /api/predict) from piling up until everything times out:
+
+- Rate limiting: every client has a token bucket of RATE_LIMIT_BURST
+  requests refilled at RATE_LIMIT_PER_MINUTE, spent by the prediction
+  endpoints (/predict, /predict/batch and job submission). A request
+  without a token gets 429 before its body is read. Clients are told
+  apart by IP address, or by RATE_LIMIT_CLIENT_HEADER (e.g.
+  X-Forwarded-For behind a proxy, or an API key header). Reads (history,
+  statistics, exports, job polling) are not limited.
+- In-flight limit: at most ADMISSION_MAX_INFLIGHT predictions per process
+  (/predict requests, or whole /predict/batch requests) run model
+  inference and the database write at once; the rest queue. A request
+  whose expected wait (queue length x recent service time) exceeds
+  ADMISSION_QUEUE_BUDGET_MS, or that has waited that long, gets 503 at
+  once instead of adding to the backlog. With MODEL_MICROBATCH the
+  limit defaults to MODEL_MICROBATCH_MAX_SIZE, as a micro-batch can only
+  coalesce the requests admitted.
+
+Rejections carry Retry-After and are counted in
+sugarcane_admission_rejected_total.
+
+Token buckets live in process memory (ADMISSION_BACKEND=local), so each
+gunicorn worker enforces the limit separately. ADMISSION_BACKEND=shared
+keeps them in a memory-mapped file (ADMISSION_SHARED_PATH, /dev/shm by
+default) so all workers on the host share one bucket per client. The
+in-flight limit is always per process: every worker runs on its own core.
+"""
+
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import jsonify, request
+
+from app.metrics import ADMISSION_INFLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Endpoints that spend rate-limit tokens
+RATE_LIMITED_ENDPOINTS = ('api.predict', 'api.predict_batch', 'api.create_job')
+
+DEFAULT_SHARED_PATH = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'sugarcane-admission'
+)
+
+# Weight of the latest request in the moving average of service time
+SERVICE_TIME_ALPHA = 0.2
+
+class Overloaded(Exception):
+    """No in-flight slot within the latency budget; retry after `retry_after` seconds"""
+    
+    def __init__(self, retry_after):
+        super().__init__('Server overloaded')
+        self.retry_after = retry_after
+
+def refill(tokens, updated, now, rate, burst):
+    """Tokens in a bucket at `now` that held `tokens` at `updated`"""
+    return min(float(burst), tokens + max(now - updated, 0.0) * rate)
+
+class LocalBuckets:
+    """Token buckets of one process, keyed by client"""
+    
+    def __init__(self, max_clients=10000):
+        self.max_clients = max_clients
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def take(self, key, now, rate, burst):
+        """Take one token; returns 0 when granted, else seconds until the next token"""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = refill(tokens, updated, now, rate, burst)
+            granted = tokens >= 1
+            if granted:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._prune(now, rate, burst)
+        return 0.0 if granted else (1 - tokens) / rate
+    
+    def _prune(self, now, rate, burst):
+        # Full buckets hold no state worth keeping; past that, drop the least recently seen
+        full_after = burst / rate
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < full_after
+        }
+        if len(self._buckets) > self.max_clients:
+            keep = sorted(self._buckets.items(), key=lambda item: item[1][1])[-int(self.max_clients * 0.9):]
+            self._buckets = dict(keep)
+
+class SharedBuckets:
+    """
+    Token buckets in a memory-mapped file shared by all processes on the host
+    
+    The file is a fixed-size open-addressing table of (client hash,
+    tokens, updated) slots. A client whose slots are taken is given the
+    least recently used one, which only resets that bucket to full.
+    Updates are serialized by an fcntl lock, which the kernel releases if
+    a worker dies while holding it. Not available on Windows.
+    """
+    
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 8
+    
+    def __init__(self, path=DEFAULT_SHARED_PATH, slots=10000):
+        # Imported here: fcntl does not exist on Windows, where only LocalBuckets work
+        import fcntl
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = max(slots, self.PROBES)
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._pid = None
+    
+    def _open(self):
+        size = self.slots * self.SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl = self._fcntl
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size != size:
+                # New file, or one laid out for another slot count
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._file = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+    
+    def take(self, key, now, rate, burst):
+        """Take one token; returns 0 when granted, else seconds until the next token"""
+        client = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        start = client % self.slots
+        fcntl = self._fcntl
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.lockf(self._file, fcntl.LOCK_EX)
+            try:
+                index, tokens, updated = self._find(client, start, now, burst)
+                tokens = refill(tokens, updated, now, rate, burst)
+                granted = tokens >= 1
+                if granted:
+                    tokens -= 1
+                self.SLOT.pack_into(self._map, index * self.SLOT.size, client, tokens, now)
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN)
+        return 0.0 if granted else (1 - tokens) / rate
+    
+    def _find(self, client, start, now, burst):
+        """(slot index, tokens, updated) of the client's bucket, claiming a slot if needed"""
+        victim, victim_updated = None, None
+        for probe in range(self.PROBES):
+            index = (start + probe) % self.slots
+            stored, tokens, updated = self.SLOT.unpack_from(self._map, index * self.SLOT.size)
+            if stored == client:
+                return index, tokens, updated
+            if stored == 0:
+                return index, burst, now
+            if victim is None or updated < victim_updated:
+                victim, victim_updated = index, updated
+        return victim, burst, now
+
+class InflightLimiter:
+    """Bounded concurrency with a latency budget for queued callers"""
+    
+    def __init__(self, limit, budget):
+        self.limit = limit
+        self.budget = budget
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = 0.0
+        self._cond = threading.Condition()
+    
+    def expected_wait(self):
+        """Seconds a newly queued caller would wait, from the moving average of service time"""
+        return (self.waiting + 1) * self.service_time / self.limit
+    
+    def acquire(self):
+        """Take a slot, waiting at most the budget; returns seconds waited or raises Overloaded"""
+        started = time.perf_counter()
+        with self._cond:
+            if self.in_flight >= self.limit or self.waiting:
+                expected = self.expected_wait()
+                if expected > self.budget:
+                    raise Overloaded(expected)
+                deadline = started + self.budget
+                self.waiting += 1
+                ADMISSION_QUEUED.inc()
+                try:
+                    while self.in_flight >= self.limit:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            raise Overloaded(self.expected_wait())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    ADMISSION_QUEUED.dec()
+            self.in_flight += 1
+        ADMISSION_INFLIGHT.inc()
+        return time.perf_counter() - started
+    
+    def release(self, seconds):
+        """Free a slot held for `seconds`"""
+        with self._cond:
+            self.in_flight -= 1
+            self.service_time += SERVICE_TIME_ALPHA * (seconds - self.service_time)
+            self._cond.notify()
+        ADMISSION_INFLIGHT.dec()
+
+class AdmissionControl:
+    """Per-client rate limiting and an in-flight limit for predictions"""
+    
+    def __init__(self, app=None):
+        self.rate = 0.0
+        self.burst = 0
+        self.client_header = None
+        self.buckets = None
+        self.limiter = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.rate = float(app.config.get('RATE_LIMIT_PER_MINUTE', 0)) / 60
+        self.burst = max(int(app.config.get('RATE_LIMIT_BURST', 100)), 1)
+        self.client_header = app.config.get('RATE_LIMIT_CLIENT_HEADER')
+        max_clients = int(app.config.get('ADMISSION_MAX_CLIENTS', 10000))
+        
+        self.buckets = None
+        if self.rate > 0:
+            backend = app.config.get('ADMISSION_BACKEND', 'local')
+            if backend == 'shared':
+                try:
+                    self.buckets = SharedBuckets(app.config.get('ADMISSION_SHARED_PATH') or DEFAULT_SHARED_PATH, max_clients)
+                except ImportError:
+                    logger.warning("⚠️ ADMISSION_BACKEND=shared needs fcntl (not on Windows), using local buckets")
+                    backend = 'local'
+            if self.buckets is None:
+                self.buckets = LocalBuckets(max_clients)
+            logger.info(f"🚦 Rate limit: {self.rate * 60:g}/min per client, burst {self.burst} ({backend} buckets)")
+        
+        limit = int(app.config.get('ADMISSION_MAX_INFLIGHT', 0))
+        budget = float(app.config.get('ADMISSION_QUEUE_BUDGET_MS', 250)) / 1000
+        self.limiter = InflightLimiter(limit, budget) if limit > 0 else None
+        if self.limiter is not None:
+            logger.info(f"🚦 In-flight predictions: {limit} per process, {budget * 1000:g} ms queue budget")
+        
+        app.before_request(self._check_rate)
+    
+    def client_key(self):
+        """Client identity for rate limiting: the configured header, else the remote address"""
+        if self.client_header:
+            value = request.headers.get(self.client_header)
+            if value:
+                # X-Forwarded-For lists the original client first
+                return value.split(',')[0].strip()
+        return request.remote_addr or 'unknown'
+    
+    def _check_rate(self):
+        if self.buckets is None or request.method == 'OPTIONS' or request.endpoint not in RATE_LIMITED_ENDPOINTS:
+            return None
+        retry_after = self.buckets.take(self.client_key(), time.monotonic(), self.rate, self.burst)
+        if retry_after:
+            return self.reject('rate_limited', retry_after)
+        return None
+    
+    @contextmanager
+    def slot(self):
+        """Hold an in-flight slot for the block; raises Overloaded when none frees up in time"""
+        if self.limiter is None:
+            yield
+            return
+        waited = self.limiter.acquire()
+        observe_stage('admission_wait', waited)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.limiter.release(time.perf_counter() - started)
+    
+    def reject(self, reason, retry_after):
+        """429 (rate_limited) or 503 (overloaded) response with Retry-After"""
+        seconds = max(1, math.ceil(retry_after))
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        ADMISSION_REJECTED.labels(reason, endpoint).inc()
+        if reason == 'rate_limited':
+            logger.debug("🚦 Rate limited %s on %s", self.client_key(), endpoint)
+            message, status = 'Rate limit exceeded', 429
+        else:
+            logger.debug("🚦 Shedding %s: in-flight limit reached", endpoint)
+            message, status = 'Server overloaded, try again later', 503
+        response = jsonify({'error': message, 'success': False, 'retry_after': seconds})
+        response.status_code = status
+        response.headers['Retry-After'] = str(seconds)
+        return response
+
+admission = AdmissionControl()
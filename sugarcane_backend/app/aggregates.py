@@ -0,0 +1,95 @@
+import logging
+import math
+from sqlalchemy import case, func
+
+from app.ml_models import NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ['Deficient', 'Adequate', 'Excess']
+GROUP_BY_OPTIONS = ('field_id',)
+BUCKET_OPTIONS = ('day', 'week', 'month')
+
+def nutrient_columns(table):
+    """
+    SQL aggregate expressions for every nutrient
+    
+    Count, sum and sum of squares are returned instead of mean/std so
+    partial results can be combined; `summarize` derives the statistics.
+    """
+    columns = [func.count(table.c.id).label('count')]
+    for name in NUTRIENTS:
+        value = table.c[name]
+        columns.extend([
+            func.sum(value).label(f'{name}_sum'),
+            func.sum(value * value).label(f'{name}_sumsq'),
+            func.min(value).label(f'{name}_min'),
+            func.max(value).label(f'{name}_max')
+        ])
+        status = table.c[f'{name}_status']
+        for label in STATUSES:
+            columns.append(
+                func.sum(case((status == label, 1), else_=0)).label(f'{name}_{label.lower()}')
+            )
+    return columns
+
+def bucket_expression(column, bucket, dialect_name):
+    """Expression that truncates a timestamp to a day, week (Monday) or month label"""
+    if dialect_name == 'sqlite':
+        if bucket == 'day':
+            return func.strftime('%Y-%m-%d', column)
+        if bucket == 'week':
+            return func.date(column, 'weekday 0', '-6 days')
+        return func.strftime('%Y-%m', column)
+    
+    if dialect_name == 'postgresql':
+        formats = {'day': 'YYYY-MM-DD', 'week': 'YYYY-MM-DD', 'month': 'YYYY-MM'}
+        return func.to_char(func.date_trunc(bucket, column), formats[bucket])
+    
+    raise ValueError(f'Time buckets are not supported on {dialect_name}')
+
+def merge_aggregates(first, second):
+    """Combine two partial aggregates of the same group (either may be None)"""
+    if first is None:
+        return dict(second) if second is not None else None
+    if second is None:
+        return dict(first)
+    merged = {}
+    for label, value in first.items():
+        other = second.get(label)
+        if value is None or other is None:
+            merged[label] = other if value is None else value
+        elif label.endswith('_min'):
+            merged[label] = min(value, other)
+        elif label.endswith('_max'):
+            merged[label] = max(value, other)
+        else:
+            merged[label] = value + other
+    return merged
+
+def summarize(row):
+    """Turn one aggregate row (SQL result or dict) into the /statistics JSON layout"""
+    row = getattr(row, '_mapping', row)
+    count = row['count'] or 0
+    summary = {'count': count}
+    
+    for name in NUTRIENTS:
+        if not count:
+            summary[name] = None
+            continue
+        
+        mean = row[f'{name}_sum'] / count
+        # Population variance, as numpy.std computes it
+        variance = max(row[f'{name}_sumsq'] / count - mean * mean, 0.0)
+        summary[name] = {
+            'mean': round(float(mean), 2),
+            'min': round(float(row[f'{name}_min']), 2),
+            'max': round(float(row[f'{name}_max']), 2),
+            'std': round(math.sqrt(variance), 2)
+        }
+    
+    summary['status_counts'] = {
+        name: {label: int(row[f'{name}_{label.lower()}'] or 0) for label in STATUSES}
+        for name in NUTRIENTS
+    }
+    return summary
@@ -0,0 +1,652 @@
+"""
+Tiered storage: old predictions archived to partitioned Parquet
+
+The `predictions` table keeps the recent ("hot") rows. `python -m
+app.archive run` moves rows older than ARCHIVE_AFTER_DAYS into Parquet
+files under ARCHIVE_DIR, partitioned Hive-style by field and month:
+    
+    archive/field_id=FIELD_001/month=2025-01/part-20250701T000000-3f2a.parquet
+
+deletes the rows it wrote from the table and vacuums the database.
+Every run adds at most one file per partition; partitions that end up
+with several files are then merged into one (`compact`).
+
+`manifest.json` lists the committed files and the archive watermark, a
+UTC midnight: rows older than the watermark are served from Parquet and
+newer rows from the table. /history, /statistics and /export read both
+tiers when their window reaches past the watermark, and only the table
+otherwise. Cold reads open only the files whose field and time range
+can match (the manifest doubles as the partition index) and filter rows
+on created_at, skipping row groups by their statistics.
+
+A run is safe to interrupt: files are written before the manifest names
+them, and only rows found in a committed file are deleted. Table rows
+older than the watermark (left by an interrupted run, or stored later
+with a backdated created_at) are hidden from queries until the next run,
+which exports those no file holds yet and then deletes them. The newest
+day is never archived, so SQLite keeps allocating ids above the archived
+ones. Trends are served from field_daily_rollups, which keep archived
+days.
+    
+    python -m app.archive run --older-than-days 180
+    python -m app.archive compact
+    python -m app.archive status
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import operator
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+from sqlalchemy import delete, select, text
+
+from app.aggregates import STATUSES, merge_aggregates
+from app.export import arrow_schema
+from app.ml_models import NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = '.lock'
+
+# Partition directory of rows without a field_id
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Rows fetched per round trip while archiving, and scanned per aggregation step
+ARCHIVE_BATCH_SIZE = 50000
+SCAN_BATCH_ROWS = 200000
+
+# Ids per DELETE statement (SQLite allows 999 bound parameters before 3.32)
+DELETE_BATCH_SIZE = 900
+
+class ArchiveError(RuntimeError):
+    """Raised when the archive cannot be read or written"""
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ArchiveError('Archived predictions need pyarrow (pip install pyarrow)')
+    return pyarrow
+
+def _table():
+    from app.models import Prediction
+    return Prediction.__table__
+
+def archive_schema():
+    """Arrow schema of archived rows: every `predictions` column"""
+    _pyarrow()
+    return arrow_schema()
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def _lock_file(lock):
+    """Take an exclusive lock on an open file without blocking (released when it is closed)"""
+    try:
+        import fcntl
+    except ImportError:
+        # Windows
+        import msvcrt
+        msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+        return
+    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+class ColdStorage:
+    """Parquet tier of the predictions table, read through its manifest"""
+    
+    def __init__(self, app=None):
+        self.directory = None
+        self.after_days = 180
+        self._manifest = None
+        self._manifest_stat = None
+        self._lock = threading.Lock()
+        
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Read the archive location from the app config"""
+        self.directory = Path(app.config['ARCHIVE_DIR'])
+        self.after_days = app.config['ARCHIVE_AFTER_DAYS']
+        self._manifest = None
+        self._manifest_stat = None
+    
+    # Manifest
+    
+    @property
+    def manifest_path(self):
+        return self.directory / MANIFEST_FILE
+    
+    def manifest(self):
+        """Committed archive state, re-read whenever the file changes"""
+        if self.directory is None:
+            return {'watermark': None, 'files': []}
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return {'watermark': None, 'files': []}
+        
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._manifest_stat != key:
+                manifest = json.loads(self.manifest_path.read_text())
+                for entry in manifest['files']:
+                    entry['min_created_at'] = _timestamp(entry['min_created_at'])
+                    entry['max_created_at'] = _timestamp(entry['max_created_at'])
+                manifest['watermark'] = _timestamp(manifest['watermark'])
+                self._manifest, self._manifest_stat = manifest, key
+            return self._manifest
+    
+    def watermark(self):
+        """Rows created before this time are archived; None without an archive"""
+        return self.manifest()['watermark']
+    
+    def reaches(self, since):
+        """True when a window starting at `since` includes archived rows"""
+        watermark = self.watermark()
+        return watermark is not None and since < watermark
+    
+    def _write_manifest(self, watermark, files):
+        entries = [
+            {
+                **entry,
+                'min_created_at': entry['min_created_at'].isoformat(),
+                'max_created_at': entry['max_created_at'].isoformat()
+            }
+            for entry in sorted(files, key=lambda entry: entry['path'])
+        ]
+        manifest = {
+            'watermark': watermark.isoformat() if watermark else None,
+            'updated_at': datetime.utcnow().isoformat(),
+            'rows': sum(entry['rows'] for entry in files),
+            'files': entries
+        }
+        tmp_path = self.directory / f'.{MANIFEST_FILE}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+    
+    @contextmanager
+    def _exclusive(self):
+        """Serialize archive runs across processes"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_FILE, 'w') as lock:
+            try:
+                _lock_file(lock)
+            except OSError:
+                raise ArchiveError(f'Another archive run holds {self.directory / LOCK_FILE}')
+            yield
+    
+    # Reading
+    
+    def files(self, since=None, field_id=None, until=None):
+        """Manifest entries that can hold rows of `field_id` created in [since, until)"""
+        return [
+            entry for entry in self.manifest()['files']
+            if (not field_id or entry['field_id'] == field_id)
+            and (since is None or entry['max_created_at'] >= since)
+            and (until is None or entry['min_created_at'] < until)
+        ]
+    
+    def _scan(self, entries, since, field_id=None, columns=None, before=None, batch_size=SCAN_BATCH_ROWS):
+        """Dataset scanner over `entries` with the window pushed down as a row filter"""
+        pa = _pyarrow()
+        field = pa.compute.field
+        expression = field('created_at') >= pa.scalar(since, pa.timestamp('us'))
+        if field_id:
+            expression &= field('field_id') == field_id
+        if before is not None:
+            before_time = pa.scalar(before[0], pa.timestamp('us'))
+            expression &= (field('created_at') < before_time) | (
+                (field('created_at') == before_time) & (field('id') < before[1])
+            )
+        dataset = pa.dataset.dataset(
+            [str(self.directory / entry['path']) for entry in entries],
+            schema=archive_schema(), format='parquet'
+        )
+        return dataset.scanner(columns=columns, filter=expression, batch_size=batch_size)
+    
+    def history(self, since, limit, field_id=None, before=None, columns=None):
+        """
+        Newest archived rows in the window as dicts of `predictions` columns
+        
+        `before` is a (created_at, id) keyset cursor, `columns` a projection
+        (it must include created_at and id). Files are read newest first,
+        stopping once no remaining file can beat the rows found.
+        """
+        entries = self.files(since, field_id, until=before[0] + timedelta(microseconds=1) if before else None)
+        entries.sort(key=lambda entry: entry['max_created_at'], reverse=True)
+        order = [('created_at', 'descending'), ('id', 'descending')]
+        
+        pa = _pyarrow()
+        found = None
+        for entry in entries:
+            if found is not None and found.num_rows >= limit:
+                if entry['max_created_at'] < found['created_at'][limit - 1].as_py():
+                    break
+            rows = self._scan([entry], since, field_id, columns=columns, before=before).to_table()
+            found = rows if found is None else pa.concat_tables([found, rows])
+            found = found.sort_by(order).slice(0, limit)
+        return found.to_pylist() if found is not None else []
+    
+    def aggregates(self, since, field_id=None, keys=(), bucket=None):
+        """
+        Archived rows in the window aggregated like app.aggregates.nutrient_columns
+        
+        Returns {key tuple: aggregate dict}; keys are 'field_id' and/or
+        'bucket' (labels as bucket_expression renders them). Rows are
+        aggregated SCAN_BATCH_ROWS at a time as they are read, so memory
+        stays flat.
+        """
+        entries = self.files(since, field_id)
+        if not entries:
+            return {}
+        
+        pa = _pyarrow()
+        columns = ['field_id', 'created_at', *NUTRIENTS, *[f'{name}_status' for name in NUTRIENTS]]
+        partials = {}
+        pending, pending_rows = [], 0
+        batches = self._scan(entries, since, field_id, columns=columns).to_batches()
+        for batch in itertools.chain(batches, [None]):
+            if batch is not None:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                # Files are small, so their batches are pooled before aggregating
+                if pending_rows < SCAN_BATCH_ROWS:
+                    continue
+            if pending_rows:
+                for key, partial in _aggregate(pa, pa.Table.from_batches(pending), keys, bucket):
+                    partials[key] = merge_aggregates(partials.get(key), partial)
+            pending, pending_rows = [], 0
+        return partials
+    
+    def iter_rows(self, since, columns, field_id=None, batch_size=ARCHIVE_BATCH_SIZE):
+        """
+        Archived rows in the window, oldest first, as lists of column tuples
+        
+        Every file is written sorted by (created_at, id), so the files of a
+        month are read a batch at a time and merged on that key: memory holds
+        one batch per file rather than the month.
+        """
+        entries = self.files(since, field_id)
+        scanned = list(dict.fromkeys([*columns, 'created_at', 'id']))
+        key = operator.itemgetter(scanned.index('created_at'), scanned.index('id'))
+        width = len(columns)
+        # Months do not overlap, so merging within each month orders all rows
+        rows = itertools.chain.from_iterable(
+            heapq.merge(*[
+                self._file_rows(entry, since, field_id, scanned, batch_size)
+                for entry in entries if entry['month'] == month
+            ], key=key)
+            for month in sorted({entry['month'] for entry in entries})
+        )
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+            yield [row[:width] for row in chunk] if width < len(scanned) else chunk
+    
+    def _file_rows(self, entry, since, field_id, columns, batch_size):
+        """Rows of one archive file in the window as tuples, in file order"""
+        for batch in self._scan([entry], since, field_id, columns=columns, batch_size=batch_size).to_batches():
+            yield from zip(*[column.to_pylist() for column in batch.columns])
+    
+    # Archiving
+    
+    def archive(self, engine, older_than_days=None, vacuum=True, compact=True, batch_size=ARCHIVE_BATCH_SIZE):
+        """
+        Move rows older than `older_than_days` (whole UTC days) into Parquet
+        
+        Returns a summary dict. The cutoff never passes the start of the
+        newest row's day, and the watermark never moves back.
+        """
+        older_than_days = self.after_days if older_than_days is None else older_than_days
+        table = _table()
+        started = time.perf_counter()
+        with self._exclusive():
+            manifest = self.manifest()
+            watermark = manifest['watermark']
+            self._remove_orphans(manifest)
+            
+            settled = self._settle(engine, manifest, batch_size) if watermark is not None else []
+            if settled:
+                manifest = self.manifest()
+            
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            cutoff = today - timedelta(days=older_than_days)
+            with engine.connect() as connection:
+                newest = connection.execute(select(table.c.created_at).order_by(table.c.created_at.desc()).limit(1)).scalar()
+            if newest is not None:
+                cutoff = min(cutoff, newest.replace(hour=0, minute=0, second=0, microsecond=0))
+            if watermark is not None and cutoff <= watermark:
+                logger.info(f"🗄️ Nothing older than {cutoff.date()} left to archive")
+                compacted = self._compact({(entry['field_id'], entry['month']) for entry in settled}) if compact and settled else 0
+                return {'watermark': watermark.isoformat(), 'archived_rows': 0, 'files': 0, 'compacted': compacted}
+            
+            start = watermark or self._oldest(engine)
+            written, written_ids = [], []
+            if start is not None:
+                month = _month_start(start)
+                while month < cutoff:
+                    entries, ids = self._write_month(engine, max(month, start), min(_next_month(month), cutoff), batch_size)
+                    written.extend(entries)
+                    written_ids.append(ids)
+                    month = _next_month(month)
+            
+            # Commit point: from here on queries read these rows from Parquet
+            self._write_manifest(cutoff, manifest['files'] + written)
+            deleted = self._delete_ids(engine, written_ids)
+            archived = sum(entry['rows'] for entry in written)
+            if deleted != archived:
+                logger.warning(f"⚠️ Archived {archived} rows but deleted {deleted}")
+            if vacuum:
+                self._vacuum(engine)
+            partitions = {(entry['field_id'], entry['month']) for entry in settled + written}
+            compacted = self._compact(partitions) if compact else 0
+        
+        elapsed = time.perf_counter() - started
+        logger.info(f"🗄️ Archived {archived} rows before {cutoff.date()} into {len(written)} files in {elapsed:.1f}s")
+        return {'watermark': cutoff.isoformat(), 'archived_rows': archived, 'files': len(written), 'compacted': compacted}
+    
+    def compact(self):
+        """Merge every partition with more than one file into a single file"""
+        with self._exclusive():
+            return self._compact(None)
+    
+    def _oldest(self, engine):
+        table = _table()
+        with engine.connect() as connection:
+            return connection.execute(select(table.c.created_at).order_by(table.c.created_at).limit(1)).scalar()
+    
+    def _partition_dir(self, field_id, month):
+        name = quote(field_id, safe='') if field_id is not None else NULL_PARTITION
+        return Path(f'field_id={name}') / f'month={month}'
+    
+    def _write_month(self, engine, start, end, batch_size, exclude=None):
+        """
+        Write rows created in [start, end) with one file per field
+        
+        Rows whose id is in `exclude` (an Arrow array) are skipped. Returns
+        the manifest entries and an Arrow array of the ids written.
+        """
+        pa = _pyarrow()
+        table = _table()
+        schema = archive_schema()
+        month = start.strftime('%Y-%m')
+        run = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        statement = (
+            select(*table.columns)
+            .where(table.c.created_at >= start, table.c.created_at < end)
+            .order_by(table.c.field_id, table.c.created_at, table.c.id)
+            .execution_options(yield_per=batch_size)
+        )
+        
+        entries = []
+        ids = []
+        writer = None
+        current = None
+        
+        def close():
+            if writer is not None:
+                writer.close()
+                os.replace(current['tmp_path'], self.directory / current['path'])
+                del current['tmp_path']
+                entries.append(current)
+        
+        try:
+            with engine.connect() as connection:
+                for partition in connection.execute(statement).partitions():
+                    columns = list(zip(*partition))
+                    batch = pa.Table.from_arrays(
+                        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+                    )
+                    if exclude is not None and len(exclude):
+                        batch = batch.filter(pa.compute.invert(pa.compute.is_in(batch['id'], value_set=exclude)))
+                    ids.append(batch['id'].combine_chunks())
+                    field_ids = batch['field_id'].to_pylist()
+                    # Rows arrive sorted by field, so each field is one run of the batch
+                    offset = 0
+                    while offset < len(field_ids):
+                        field_id = field_ids[offset]
+                        stop = offset
+                        while stop < len(field_ids) and field_ids[stop] == field_id:
+                            stop += 1
+                        rows = batch.slice(offset, stop - offset)
+                        if current is None or current['field_id'] != field_id:
+                            close()
+                            directory = self._partition_dir(field_id, month)
+                            (self.directory / directory).mkdir(parents=True, exist_ok=True)
+                            path = directory / f'part-{run}.parquet'
+                            current = {
+                                'path': path.as_posix(), 'field_id': field_id, 'month': month, 'rows': 0,
+                                'min_created_at': rows['created_at'][0].as_py(),
+                                'tmp_path': self.directory / directory / f'.part-{run}.parquet.tmp'
+                            }
+                            writer = pa.parquet.ParquetWriter(current['tmp_path'], schema)
+                        writer.write_table(rows)
+                        current['rows'] += rows.num_rows
+                        current['max_created_at'] = rows['created_at'][-1].as_py()
+                        offset = stop
+            close()
+            writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+        if entries:
+            logger.info(f"🗄️ {month}: {sum(entry['rows'] for entry in entries)} rows in {len(entries)} partitions")
+        return entries, pa.concat_arrays(ids) if ids else pa.array([], pa.int64())
+    
+    def _settle(self, engine, manifest, batch_size):
+        """
+        Archive and delete table rows older than the watermark
+        
+        Rows a committed file already holds are deleted; the others are
+        written to new files first. Returns the manifest entries added.
+        """
+        pa = _pyarrow()
+        table = _table()
+        watermark = manifest['watermark']
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(table.c.id, table.c.created_at).where(table.c.created_at < watermark)
+            ).all()
+        if not rows:
+            return []
+        
+        oldest = min(row.created_at for row in rows)
+        archived = pa.array([], pa.int64())
+        entries = self.files(oldest, until=watermark)
+        if entries:
+            dataset = pa.dataset.dataset(
+                [str(self.directory / entry['path']) for entry in entries], schema=archive_schema(), format='parquet'
+            )
+            ids = pa.array([row.id for row in rows], pa.int64())
+            archived = dataset.to_table(columns=['id'], filter=pa.compute.field('id').isin(ids))['id'].combine_chunks()
+        
+        written, written_ids = [], [archived]
+        month = _month_start(oldest)
+        while month < watermark:
+            month_entries, month_ids = self._write_month(
+                engine, max(month, oldest), min(_next_month(month), watermark), batch_size, exclude=archived
+            )
+            written.extend(month_entries)
+            written_ids.append(month_ids)
+            month = _next_month(month)
+        if written:
+            self._write_manifest(watermark, manifest['files'] + written)
+        deleted = self._delete_ids(engine, written_ids)
+        logger.info(
+            f"🗄️ Settled {deleted} rows older than the watermark "
+            f"({len(archived)} already archived, {sum(entry['rows'] for entry in written)} exported)"
+        )
+        return written
+    
+    def _delete_ids(self, engine, ids):
+        """Delete the rows whose id is in any of the Arrow arrays `ids`; returns rows deleted"""
+        table = _table()
+        deleted = 0
+        with engine.begin() as connection:
+            for array in ids:
+                values = array.to_pylist()
+                for offset in range(0, len(values), DELETE_BATCH_SIZE):
+                    chunk = values[offset:offset + DELETE_BATCH_SIZE]
+                    deleted += connection.execute(delete(table).where(table.c.id.in_(chunk))).rowcount
+        return deleted
+    
+    def _vacuum(self, engine):
+        """Return the space of deleted rows to the filesystem (SQLite) or the table (PostgreSQL)"""
+        statement = {'sqlite': 'VACUUM', 'postgresql': 'VACUUM ANALYZE predictions'}.get(engine.dialect.name)
+        if statement is None:
+            return
+        start = time.perf_counter()
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level='AUTOCOMMIT').execute(text(statement))
+        logger.info(f"🧹 {statement} took {time.perf_counter() - start:.1f}s")
+    
+    def _remove_orphans(self, manifest):
+        """Delete files of runs that stopped before committing them to the manifest"""
+        committed = {entry['path'] for entry in manifest['files']}
+        for path in self.directory.glob('field_id=*/month=*/*'):
+            if path.relative_to(self.directory).as_posix() not in committed:
+                logger.info(f"🧹 Removing uncommitted archive file {path}")
+                path.unlink()
+    
+    def _compact(self, partitions):
+        """Merge the files of each partition (all partitions when None); returns partitions merged"""
+        pa = _pyarrow()
+        schema = archive_schema()
+        manifest = self.manifest()
+        grouped = {}
+        for entry in manifest['files']:
+            grouped.setdefault((entry['field_id'], entry['month']), []).append(entry)
+        
+        replaced, added = set(), []
+        for key, entries in grouped.items():
+            if len(entries) < 2 or (partitions is not None and key not in partitions):
+                continue
+            rows = pa.parquet.read_table(
+                [str(self.directory / entry['path']) for entry in entries], schema=schema, partitioning=None
+            ).sort_by([('created_at', 'ascending'), ('id', 'ascending')])
+            directory = self._partition_dir(*key)
+            path = directory / f"part-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+            tmp_path = self.directory / directory / f'.{path.name}.tmp'
+            pa.parquet.write_table(rows, tmp_path)
+            os.replace(tmp_path, self.directory / path)
+            
+            replaced.update(entry['path'] for entry in entries)
+            added.append({
+                'path': path.as_posix(), 'field_id': key[0], 'month': key[1], 'rows': rows.num_rows,
+                'min_created_at': min(entry['min_created_at'] for entry in entries),
+                'max_created_at': max(entry['max_created_at'] for entry in entries)
+            })
+        
+        if added:
+            # Merged files replace their parts in one manifest write; parts are removed afterwards
+            files = [entry for entry in manifest['files'] if entry['path'] not in replaced]
+            self._write_manifest(manifest['watermark'], files + added)
+            for name in replaced:
+                (self.directory / name).unlink()
+            logger.info(f"🗜️ Compacted {len(added)} archive partitions")
+        return len(added)
+
+def _aggregate(pa, rows, keys, bucket):
+    """(key tuple, aggregate dict) per group of an Arrow table of archived rows"""
+    pc = pa.compute
+    derived = {'id': pc.cast(pc.is_valid(rows['created_at']), pa.int64())}
+    aggregations = [('id', 'sum', 'count')]
+    for name in NUTRIENTS:
+        value = rows[name]
+        derived[name] = value
+        derived[f'{name}_sumsq'] = pc.multiply(value, value)
+        aggregations.extend([
+            (name, 'sum', f'{name}_sum'),
+            (f'{name}_sumsq', 'sum', f'{name}_sumsq'),
+            (name, 'min', f'{name}_min'),
+            (name, 'max', f'{name}_max')
+        ])
+        for label in STATUSES:
+            column = f'{name}_{label.lower()}'
+            derived[column] = pc.cast(pc.equal(rows[f'{name}_status'], label), pa.int64())
+            aggregations.append((column, 'sum', column))
+    if 'field_id' in keys:
+        derived['field_id'] = rows['field_id']
+    if 'bucket' in keys:
+        derived['bucket'] = _bucket_labels(pa, rows['created_at'], bucket)
+    
+    grouped = pa.table(derived).group_by(list(keys)).aggregate(
+        [(column, function) for column, function, _ in aggregations]
+    )
+    labels = {f'{column}_{function}': label for column, function, label in aggregations}
+    for row in grouped.to_pylist():
+        key = tuple(row.pop(name) for name in keys)
+        yield key, {labels[name]: value for name, value in row.items()}
+
+def _bucket_labels(pa, created_at, bucket):
+    """Bucket labels of timestamps, matching app.aggregates.bucket_expression"""
+    pc = pa.compute
+    if bucket == 'week':
+        created_at = pc.floor_temporal(created_at, unit='week', week_starts_monday=True)
+    return pc.strftime(created_at, format='%Y-%m' if bucket == 'month' else '%Y-%m-%d')
+
+cold_storage = ColdStorage()
+
+def main():
+    from app import create_app, db
+    
+    parser = argparse.ArgumentParser(description='Archive old predictions to partitioned Parquet')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='move rows older than the retention age into the archive')
+    run.add_argument('--older-than-days', type=int, help='retention age in days (default: ARCHIVE_AFTER_DAYS)')
+    run.add_argument('--no-vacuum', action='store_true', help='skip VACUUM after deleting the archived rows')
+    run.add_argument('--no-compact', action='store_true', help='leave small files for a later compact')
+    commands.add_parser('compact', help='merge partitions that have several files')
+    commands.add_parser('status', help='print the archive watermark, files and rows')
+    args = parser.parse_args()
+    
+    app = create_app({'JOB_RECOVER_ON_START': False})
+    storage = ColdStorage(app)
+    with app.app_context():
+        try:
+            if args.command == 'run':
+                result = storage.archive(
+                    db.engine, args.older_than_days, vacuum=not args.no_vacuum, compact=not args.no_compact
+                )
+            elif args.command == 'compact':
+                result = {'compacted': storage.compact()}
+            else:
+                manifest = storage.manifest()
+                watermark = manifest['watermark']
+                result = {
+                    'directory': str(storage.directory),
+                    'watermark': watermark.isoformat() if watermark else None,
+                    'files': len(manifest['files']),
+                    'rows': sum(entry['rows'] for entry in manifest['files'])
+                }
+        except ArchiveError as e:
+            parser.exit(1, f'{e}\n')
+    print(json.dumps(result, indent=2))
+
+if __name__ == '__main__':
+    main()
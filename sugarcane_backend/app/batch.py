@@ -0,0 +1,134 @@
+import io
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns read as text so that ids like "007" survive CSV parsing
+TEXT_COLUMNS = {'field_id': str, 'notes': str}
+
+class BatchInputError(ValueError):
+    """Raised when a batch body cannot be parsed at all"""
+
+def load_batch_frame(request):
+    """
+    Parse a batch request body into a DataFrame
+    
+    Accepts:
+    - JSON list of samples, or {"samples": [...]}
+    - CSV body (Content-Type: text/csv)
+    - multipart upload with a CSV in the "file" field
+    """
+    if 'file' in request.files:
+        return read_csv_frame(request.files['file'].stream)
+    
+    if request.mimetype in ('text/csv', 'application/csv'):
+        return read_csv_frame(io.BytesIO(request.get_data()))
+    
+    data = request.get_json(silent=True)
+    
+    if isinstance(data, dict):
+        data = data.get('samples')
+    
+    if not isinstance(data, list):
+        raise BatchInputError('Expected a JSON list of samples or {"samples": [...]}')
+    
+    if not all(isinstance(row, dict) for row in data):
+        raise BatchInputError('Every sample must be a JSON object')
+    
+    return pd.DataFrame.from_records(data)
+
+def read_csv_frame(source, **kwargs):
+    """Read a CSV source, keeping identifier columns as text"""
+    try:
+        return pd.read_csv(source, dtype=TEXT_COLUMNS, skipinitialspace=True, **kwargs)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise BatchInputError(f'Invalid CSV: {str(e)}')
+
+def validate_batch(frame, feature_names):
+    """
+    Validate a batch of samples column-wise
+    
+    Applies the same rules as /predict (required fields, numeric values,
+    NDVI in [0, 1], non-negative chlorophyll, text or numeric field_id and
+    notes) to whole columns at once.
+    
+    Returns (X, valid_rows, errors):
+    - X: float matrix of the valid rows in `feature_names` order
+    - valid_rows: positional indexes of the rows in X
+    - errors: list of {'index', 'error'} for rejected rows
+    """
+    n_rows = len(frame)
+    columns = {}
+    missing = {}
+    invalid = {}
+    
+    for name in feature_names:
+        if name in frame.columns:
+            raw = frame[name]
+            # Treat empty strings like absent values
+            if raw.dtype == object:
+                raw = raw.replace(r'^\s*$', np.nan, regex=True)
+            values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=float)
+            missing[name] = raw.isna().to_numpy()
+            invalid[name] = np.isnan(values) & ~missing[name]
+        else:
+            values = np.full(n_rows, np.nan)
+            missing[name] = np.ones(n_rows, dtype=bool)
+            invalid[name] = np.zeros(n_rows, dtype=bool)
+        columns[name] = values
+    
+    with np.errstate(invalid='ignore'):
+        range_errors = []
+        if 'ndvi' in columns:
+            ndvi = columns['ndvi']
+            range_errors.append(((ndvi < 0) | (ndvi > 1), 'NDVI must be between 0 and 1'))
+        if 'chlorophyll' in columns:
+            range_errors.append((columns['chlorophyll'] < 0, 'Chlorophyll must be non-negative'))
+    
+    # JSON samples can carry objects or lists where text belongs
+    text_errors = [
+        (~frame[name].map(_is_text_value).to_numpy(dtype=bool), f'{name} must be a string')
+        for name in TEXT_COLUMNS if name in frame.columns and frame[name].dtype == object
+    ]
+    
+    any_missing = np.logical_or.reduce(list(missing.values())) if missing else np.zeros(n_rows, dtype=bool)
+    any_invalid = np.logical_or.reduce(list(invalid.values())) if invalid else np.zeros(n_rows, dtype=bool)
+    bad = any_missing | any_invalid
+    for mask, _ in range_errors + text_errors:
+        bad |= mask
+    
+    # Only rejected rows are visited one by one to build their messages
+    errors = []
+    for i in np.flatnonzero(bad):
+        messages = []
+        missing_fields = [name for name in feature_names if missing[name][i]]
+        if missing_fields:
+            messages.append(f"Missing required fields: {', '.join(missing_fields)}")
+        invalid_fields = [name for name in feature_names if invalid[name][i]]
+        if invalid_fields:
+            messages.append(f"Invalid input format: {', '.join(invalid_fields)}")
+        messages.extend(message for mask, message in range_errors + text_errors if mask[i])
+        errors.append({'index': int(i), 'error': '; '.join(messages)})
+    
+    valid_rows = np.flatnonzero(~bad)
+    X = np.column_stack([columns[name][valid_rows] for name in feature_names]) if feature_names else np.empty((len(valid_rows), 0))
+    
+    if 'day_of_year' in feature_names:
+        # Match int() truncation used by the single-sample endpoint
+        day_col = feature_names.index('day_of_year')
+        X[:, day_col] = np.trunc(X[:, day_col])
+    
+    return X, valid_rows, errors
+
+def _is_text_value(value):
+    """True for values /predict accepts as text: strings, numbers and null"""
+    return value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool))
+
+def text_column(frame, name, rows, default):
+    """Return a text column for the given rows, filling blanks with a default"""
+    if name not in frame.columns:
+        return [default] * len(rows)
+    values = frame[name].iloc[rows]
+    return [default if pd.isna(value) else str(value) for value in values]
@@ -0,0 +1,150 @@
+"""
+Micro-batching of concurrent single-row predictions
+
+With MODEL_MICROBATCH=true, get_model_manager() returns a
+BatchingModelManager. Concurrent `predict` calls queue their rows; one
+caller at a time runs everything queued (up to MODEL_MICROBATCH_MAX_SIZE
+rows) through `ModelManager.predict_many`, which does one scaler
+transform and one call per model for the whole batch. Each caller gets
+the same result dict `predict` would have returned. Everything else
+(predict_batch, version switches, ...) goes straight to the wrapped
+ModelManager.
+
+Rows that arrive while a batch is running form the next batch, so a
+lone request is predicted at once and batches grow with the load.
+MODEL_MICROBATCH_WAIT_MS additionally holds each batch open for late
+arrivals. benchmarks/bench_microbatch.py shows that this only adds
+latency when clients wait for their answers, hence the default of 0.
+"""
+
+import logging
+import threading
+import time
+
+from app.metrics import MICROBATCH_ROWS, observe_stage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT = 0.0
+
+class _PendingPrediction:
+    """One queued predict call and the event its caller waits on"""
+    
+    __slots__ = ('inputs', 'queued_at', 'result', 'leader', 'done')
+    
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.queued_at = time.perf_counter()
+        self.result = None
+        self.leader = False
+        self.done = threading.Event()
+    
+    def resolve(self, result):
+        self.result = result
+        self.done.set()
+    
+    def promote(self):
+        """Wake the caller to run the next batch itself"""
+        self.leader = True
+        self.done.set()
+
+class BatchingModelManager:
+    """ModelManager whose single-row `predict` calls are coalesced into batches"""
+    
+    def __init__(self, manager, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+        self.manager = manager
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending = []
+        self._leader_active = False
+        self._arrived = threading.Condition()
+        logger.info(f"📦 Prediction micro-batching: up to {self.max_batch_size} rows, {self.max_wait * 1000:g} ms window")
+    
+    def __getattr__(self, name):
+        return getattr(self.manager, name)
+    
+    def predict(self, ndvi, chlorophyll, latitude=None, longitude=None, day_of_year=None):
+        """
+        Same contract as ModelManager.predict; the row is predicted as part of a batch
+        
+        There is no dispatcher thread: the caller that finds no batch
+        running becomes the leader and predicts its own row together with
+        every row queued meanwhile. On finishing, it hands leadership to
+        the oldest row still queued, whose caller runs the next batch.
+        """
+        inputs = {
+            'ndvi': ndvi,
+            'chlorophyll': chlorophyll,
+            'latitude': latitude,
+            'longitude': longitude,
+            'day_of_year': day_of_year
+        }
+        cached = self.manager.cached_prediction(inputs)
+        if cached is not None:
+            return cached
+        
+        pending = _PendingPrediction(inputs)
+        with self._arrived:
+            self._pending.append(pending)
+            if self._leader_active:
+                self._arrived.notify()
+            else:
+                self._leader_active = pending.leader = True
+        
+        if not pending.leader:
+            pending.done.wait()
+        if pending.leader:
+            # First in line: run the batch, which starts with this row
+            self._lead()
+        return pending.result
+    
+    def _lead(self):
+        """Collect a batch (this caller's row first), predict it and pass leadership on"""
+        with self._arrived:
+            if self.max_wait:
+                deadline = self._pending[0].queued_at + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    self._arrived.wait(timeout)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+        
+        try:
+            self._dispatch(batch)
+        except Exception as e:
+            logger.error(f"❌ Micro-batch failed: {str(e)}")
+            for pending in batch:
+                if pending.result is None:
+                    pending.resolve({'success': False, 'error': f"❌ Prediction failed: {str(e)}"})
+        finally:
+            with self._arrived:
+                if self._pending:
+                    self._pending[0].promote()
+                else:
+                    self._leader_active = False
+    
+    def _dispatch(self, batch):
+        started = time.perf_counter()
+        for pending in batch:
+            observe_stage('batch_wait', started - pending.queued_at)
+        MICROBATCH_ROWS.observe(len(batch))
+        
+        # Rows without some optional feature have fewer columns, so they
+        # are predicted together only with rows missing the same ones
+        groups = {}
+        for pending in batch:
+            key = tuple(value is None for value in pending.inputs.values())
+            groups.setdefault(key, []).append(pending)
+        
+        for group in groups.values():
+            try:
+                results = self.manager.predict_many([pending.inputs for pending in group])
+            except Exception as e:
+                # Predict rows one by one so a bad row fails alone, with predict()'s error
+                logger.warning(f"⚠️ Micro-batch of {len(group)} rows failed ({str(e)}), predicting rows separately")
+                results = [self.manager.predict(**pending.inputs) for pending in group]
+            for pending, result in zip(group, results):
+                pending.resolve(result)
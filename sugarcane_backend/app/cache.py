@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Decimal places kept per feature when building cache keys (meter precision)
+DEFAULT_PRECISION = {
+    'ndvi': 3,
+    'chlorophyll': 1,
+    'latitude': 4,
+    'longitude': 4,
+    'day_of_year': 0
+}
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of prediction results
+    
+    Keys are the model version plus the feature vector rounded to the
+    configured precision, so near-identical readings share an entry and a
+    model reload never serves stale results. Entries expire after `ttl`
+    seconds; the least recently used entry is evicted beyond `maxsize`.
+    """
+    
+    def __init__(self, maxsize=10000, ttl=3600, precision=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.precision = dict(DEFAULT_PRECISION)
+        if precision:
+            self.precision.update(precision)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @classmethod
+    def from_env(cls):
+        """Build a cache from PREDICTION_CACHE_* environment variables"""
+        precision = os.environ.get('PREDICTION_CACHE_PRECISION')
+        return cls(
+            maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', 10000)),
+            ttl=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)),
+            precision=json.loads(precision) if precision else None
+        )
+    
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+    
+    def make_key(self, version, features):
+        """Quantize a {name: value} feature mapping into a cache key"""
+        key = [version]
+        for name, value in features.items():
+            if value is None:
+                key.append(None)
+            else:
+                key.append(round(float(value), self.precision.get(name, 6)))
+        return tuple(key)
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            size = len(self._entries)
+            self._entries.clear()
+        if size:
+            logger.info(f"🧹 Prediction cache cleared ({size} entries)")
+        return size
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'precision': dict(self.precision)
+            }
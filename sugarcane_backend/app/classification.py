@@ -0,0 +1,176 @@
+"""
+Nutrient status classification over whole arrays of predictions
+
+Per-nutrient status comes from threshold bands binned with np.digitize:
+    
+    value <  low            Deficient
+    low <= value <= high    Adequate
+    value >  high           Excess
+
+Bands can be overridden per region from a JSON file named by the
+NUTRIENT_THRESHOLDS environment variable; a row uses the first region
+whose bounds contain its latitude/longitude:
+    
+    {
+      "default": {"nitrogen": [50, 150], "phosphorus": [20, 40], "potassium": [150, 300]},
+      "regions": [
+        {"name": "konkan", "bounds": [15.6, 72.6, 20.2, 74.0],
+         "thresholds": {"nitrogen": [60, 160]}}
+      ]
+    }
+
+`bounds` is [min_lat, min_lon, max_lat, max_lon]; nutrients missing from
+a region or from "default" keep the built-in bands.
+
+The shipped classifier (classifier_nutrient_status.pkl) predicts one
+overall status per sample from the scaled features.
+"""
+
+import json
+import logging
+import os
+import numpy as np
+from app.tree_compiler import UnsupportedModel, compile_model
+
+logger = logging.getLogger(__name__)
+
+# Index returned by np.digitize -> status
+STATUS_LABELS = np.array(['Deficient', 'Adequate', 'Excess'], dtype=object)
+
+# CRITICAL: ADJUST THESE THRESHOLDS FOR YOUR DATA!
+DEFAULT_THRESHOLDS = {
+    'nitrogen': (50, 150),
+    'phosphorus': (20, 40),
+    'potassium': (150, 300)
+}
+
+class ThresholdError(ValueError):
+    """Raised for malformed threshold configuration"""
+
+def _bins(thresholds):
+    """(low, high) bands -> np.digitize bin edges, so that `high` itself is Adequate"""
+    bins = {}
+    for name, band in thresholds.items():
+        try:
+            low, high = (float(value) for value in band)
+        except (TypeError, ValueError):
+            raise ThresholdError(f'Thresholds for {name} must be [low, high], got {band!r}')
+        if low > high:
+            raise ThresholdError(f'Low threshold for {name} is above the high threshold')
+        bins[name] = np.array([low, np.nextafter(high, np.inf)])
+    return bins
+
+class StatusThresholds:
+    """Precomputed per-nutrient bins, with optional per-region overrides"""
+    
+    def __init__(self, default=None, regions=()):
+        thresholds = dict(DEFAULT_THRESHOLDS)
+        thresholds.update(default or {})
+        self.thresholds = thresholds
+        self.default_bins = _bins(thresholds)
+        
+        self.regions = []
+        for region in regions:
+            try:
+                bounds = np.array(region['bounds'], dtype=float)
+            except (KeyError, TypeError, ValueError):
+                raise ThresholdError(f"Region {region.get('name')!r} needs bounds [min_lat, min_lon, max_lat, max_lon]")
+            if bounds.shape != (4,):
+                raise ThresholdError(f"Region {region.get('name')!r} needs bounds [min_lat, min_lon, max_lat, max_lon]")
+            self.regions.append((region.get('name'), bounds, _bins(region.get('thresholds', {}))))
+    
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            config = json.load(f)
+        thresholds = cls(config.get('default'), config.get('regions', ()))
+        logger.info(f"📏 Status thresholds loaded from {path} ({len(thresholds.regions)} regions)")
+        return thresholds
+    
+    @classmethod
+    def from_env(cls):
+        """Thresholds from the NUTRIENT_THRESHOLDS file, else the built-in bands"""
+        path = os.environ.get('NUTRIENT_THRESHOLDS')
+        return cls.from_file(path) if path else cls()
+    
+    def classify(self, predictions, latitude=None, longitude=None):
+        """
+        Status label arrays keyed by nutrient
+        
+        `predictions` maps nutrient -> array of values. Rows with a
+        latitude/longitude inside a region's bounds use its bands.
+        """
+        codes = {
+            name: np.digitize(values, self.default_bins[name])
+            for name, values in predictions.items()
+        }
+        
+        if self.regions and latitude is not None and longitude is not None:
+            latitude = np.asarray(latitude, dtype=float)
+            longitude = np.asarray(longitude, dtype=float)
+            unassigned = np.ones(len(latitude), dtype=bool)
+            for _, (min_lat, min_lon, max_lat, max_lon), bins in self.regions:
+                inside = (
+                    unassigned
+                    & (latitude >= min_lat) & (latitude <= max_lat)
+                    & (longitude >= min_lon) & (longitude <= max_lon)
+                )
+                if not inside.any():
+                    continue
+                for name, edges in bins.items():
+                    if name in codes:
+                        codes[name][inside] = np.digitize(predictions[name][inside], edges)
+                unassigned &= ~inside
+        
+        return {name: STATUS_LABELS[code] for name, code in codes.items()}
+    
+    def describe(self):
+        return {
+            'default': {name: list(band) for name, band in self.thresholds.items()},
+            'regions': [
+                {
+                    'name': name,
+                    'bounds': bounds.tolist(),
+                    'thresholds': {nutrient: [float(edges[0]), float(np.nextafter(edges[1], -np.inf))]
+                                   for nutrient, edges in bins.items()}
+                }
+                for name, bounds, bins in self.regions
+            ]
+        }
+
+class StatusModel:
+    """
+    Trained overall-status classifier
+    
+    Small inputs are classified by the compiled trees (mean class
+    probabilities across trees, as the forest itself does); larger ones
+    by the library's multi-threaded predict.
+    """
+    
+    native_max_rows = 512
+    
+    def __init__(self, model):
+        self.model = model
+        self.classes = np.asarray(model.classes_, dtype=object)
+        try:
+            self.compiled = compile_model(model)
+        except UnsupportedModel as e:
+            logger.warning(f"⚠️ Status classifier not compiled: {str(e)}")
+            self.compiled = None
+    
+    def predict(self, X_scaled):
+        if self.compiled is not None and len(X_scaled) <= self.native_max_rows:
+            return self.classes[np.argmax(self.compiled.predict(X_scaled), axis=1)]
+        return np.asarray(self.model.predict(X_scaled), dtype=object)
+    
+    def verify(self, n_features, n_samples=2048, seed=0):
+        """Disable the compiled path unless it agrees with the classifier"""
+        if self.compiled is None:
+            return
+        X = np.random.default_rng(seed).standard_normal((n_samples, n_features))
+        expected = np.asarray(self.model.predict(X), dtype=object)
+        actual = self.classes[np.argmax(self.compiled.predict(X), axis=1)]
+        mismatches = int(np.sum(expected != actual))
+        if mismatches:
+            logger.warning(f"⚠️ Compiled status classifier disagrees on {mismatches} samples, using library predict")
+            self.compiled = None
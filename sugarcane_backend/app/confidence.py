@@ -0,0 +1,249 @@
+"""
+Per-prediction confidence derived from the models themselves
+
+Each estimator returns the prediction together with a spread (a standard
+deviation in nutrient units) from the same vectorized pass:
+    
+    nitrogen (RandomForest)   spread of the per-tree outputs
+    potassium (XGBoost)       spread of interleaved sub-ensemble estimates
+    phosphorus (SVR, RBF)     Gaussian-process posterior standard deviation
+                              over the support vectors, with the SVR epsilon
+                              as the noise level
+
+The spread is mapped to a 0-1 score by `confidence_from_spread`, relative
+to how much the model's predictions vary across typical inputs. Scaled
+features are standardized, so standard normal samples stand in for the
+training distribution when that scale is measured at load time.
+"""
+
+import json
+import logging
+import numpy as np
+from app.tree_compiler import UnsupportedModel, compile_model
+
+logger = logging.getLogger(__name__)
+
+# Reported when a model has no supported spread estimator
+FALLBACK_CONFIDENCE = 0.85
+
+# Rows evaluated per pass, bounding the (rows x trees) intermediate arrays
+CHUNK_ROWS = 4096
+
+# Interleaved sub-ensembles used for the boosting spread
+BOOSTING_GROUPS = 5
+
+# Standard normal samples used to measure each model's prediction scale
+CALIBRATION_SAMPLES = 2048
+
+def confidence_from_spread(spread, scale):
+    """Map a spread to a 0-1 confidence: 1 / (1 + spread / scale)"""
+    return 1.0 / (1.0 + np.asarray(spread, dtype=float) / scale)
+
+class SpreadEstimator:
+    """Base class; subclasses implement `_predict_spread` for one chunk"""
+    
+    kind = None
+    scale = 1.0
+    
+    def calibrate(self, n_features, seed=0):
+        """Set `scale` to the standard deviation of predictions over typical inputs"""
+        X = np.random.default_rng(seed).standard_normal((CALIBRATION_SAMPLES, n_features))
+        self.scale = max(float(np.std(self.predict(X))), 1e-9)
+        return self.scale
+    
+    def confidence(self, X):
+        """Return (prediction, confidence) arrays for every row of scaled X"""
+        prediction, spread = self.predict_spread(X)
+        return prediction, confidence_from_spread(spread, self.scale)
+    
+    def predict_spread(self, X):
+        """Return (prediction, spread) arrays for every row of scaled X"""
+        X = np.asarray(X, dtype=float)
+        if len(X) <= CHUNK_ROWS:
+            return self._predict_spread(X)
+        
+        predictions, spreads = [], []
+        for start in range(0, len(X), CHUNK_ROWS):
+            prediction, spread = self._predict_spread(X[start:start + CHUNK_ROWS])
+            predictions.append(prediction)
+            spreads.append(spread)
+        return np.concatenate(predictions), np.concatenate(spreads)
+    
+    def predict(self, X):
+        return self.predict_spread(X)[0]
+    
+    def _predict_spread(self, X):
+        raise NotImplementedError
+
+class ForestSpread(SpreadEstimator):
+    """
+    RandomForest mean and standard deviation across trees
+    
+    Inputs of up to `native_max_rows` rows (the model's native backend
+    setting, see NATIVE_TREE_MAX_ROWS) are walked by the compiled NumPy
+    trees. Larger ones go through the library's multi-threaded `apply()`,
+    with leaf values looked up in the compiled tables. Forests the
+    compiler rejects use each tree's own predict.
+    """
+    
+    kind = 'tree_variance'
+    
+    def __init__(self, model, compiled=None, native_max_rows=0):
+        self.model = model
+        self.compiled = compiled
+        self.native_max_rows = native_max_rows if compiled is not None else 0
+    
+    def _tree_outputs(self, X):
+        if len(X) <= self.native_max_rows:
+            return self.compiled.tree_outputs(X)
+        if self.compiled is not None:
+            return self.compiled.leaf_outputs(self.model.apply(X))
+        X = X.astype(np.float32)
+        return np.stack([tree.predict(X, check_input=False) for tree in self.model.estimators_], axis=1)
+    
+    def _predict_spread(self, X):
+        outputs = self._tree_outputs(X)
+        return outputs.mean(axis=1), outputs.std(axis=1)
+
+class BoostingSpread(SpreadEstimator):
+    """
+    Gradient boosting prediction with a sub-ensemble spread
+    
+    Boosted trees are not independent estimates, so their outputs cannot
+    be compared directly. Instead the trees are dealt round-robin into
+    `groups` interleaved sub-ensembles; each one, scaled by `groups`,
+    estimates the full margin, and their mean is exactly the model's
+    margin. The spread is the standard deviation of those estimates.
+    
+    Inputs of up to `native_max_rows` rows use the compiled trees (the
+    model's native backend setting). Larger ones run each sub-ensemble
+    as its own booster, so the spread costs about as much as one full
+    predict call.
+    """
+    
+    kind = 'subensemble_spread'
+    
+    def __init__(self, model, compiled=None, native_max_rows=0, groups=BOOSTING_GROUPS):
+        self.model = model
+        self.compiled = compiled
+        self.native_max_rows = native_max_rows if compiled is not None else 0
+        self.groups = groups
+        self.base_score = float(_base_score(model.get_booster()))
+        self.sub_boosters = _interleaved_boosters(model.get_booster(), groups, model.n_jobs)
+    
+    def _predict_spread(self, X):
+        if len(X) <= self.native_max_rows:
+            outputs = self.compiled.tree_outputs(X)
+            margins = np.stack([
+                outputs[:, group::self.groups].sum(axis=1, dtype=np.float64)
+                for group in range(self.groups)
+            ], axis=1)
+            estimates = margins * self.groups + self.base_score
+            return self.compiled.combine(outputs), estimates.std(axis=1)
+        
+        margins = np.stack([
+            booster.inplace_predict(X, predict_type='margin', missing=self.model.missing)
+            for booster in self.sub_boosters
+        ], axis=1).astype(np.float64)
+        # Each sub-booster adds base_score to its own trees' sum
+        estimates = (margins - self.base_score) * self.groups + self.base_score
+        return estimates.mean(axis=1), estimates.std(axis=1)
+
+def _base_score(booster):
+    """Base score of a booster, as float32 like XGBoost applies it"""
+    config = json.loads(booster.save_config())
+    return np.float32(float(config['learner']['learner_model_param']['base_score']))
+
+def _interleaved_boosters(booster, groups, n_jobs=None):
+    """Split a booster's trees round-robin into `groups` boosters"""
+    import xgboost
+    
+    boosters = []
+    for group in range(groups):
+        config = json.loads(booster.save_raw('json'))
+        model = config['learner']['gradient_booster']['model']
+        trees = model['trees'][group::groups]
+        for index, tree in enumerate(trees):
+            tree['id'] = index
+        model['trees'] = trees
+        model['tree_info'] = [0] * len(trees)
+        model['iteration_indptr'] = list(range(len(trees) + 1))
+        model['gbtree_model_param']['num_trees'] = str(len(trees))
+        
+        sub_booster = xgboost.Booster()
+        sub_booster.load_model(bytearray(json.dumps(config).encode()))
+        if n_jobs is not None:
+            sub_booster.set_param('nthread', n_jobs)
+        boosters.append(sub_booster)
+    return boosters
+
+class KernelSpread(SpreadEstimator):
+    """
+    RBF SVR prediction with a calibrated kernel variance
+    
+    The SVR's own kernel over its support vectors defines a Gaussian
+    process. Training targets at the support vectors are recovered from
+    the epsilon tube (y = f(x) +/- epsilon), giving the signal variance;
+    epsilon itself is the noise level. Inside the training support the
+    posterior standard deviation shrinks to about epsilon and it grows
+    toward the signal standard deviation as inputs move away from it.
+    The kernel row computed for the prediction is reused for the variance.
+    """
+    
+    kind = 'kernel_variance'
+    
+    def __init__(self, model):
+        if getattr(model, 'kernel', None) != 'rbf':
+            raise UnsupportedModel(f"No kernel variance for kernel {getattr(model, 'kernel', None)!r}")
+        
+        self.gamma = float(model._gamma)
+        self.support_vectors = np.asarray(model.support_vectors_, dtype=float)
+        self.sv_norms = (self.support_vectors ** 2).sum(axis=1)
+        self.dual_coef = np.asarray(model.dual_coef_, dtype=float)[0]
+        self.intercept = float(model.intercept_[0])
+        
+        gram = self._kernel(self.support_vectors)
+        targets = gram @ self.dual_coef + self.intercept + model.epsilon * np.sign(self.dual_coef)
+        self.noise_var = max(float(model.epsilon) ** 2, 1e-12)
+        self.signal_var = max(float(np.var(targets)), self.noise_var)
+        
+        # k^T (K + r I)^-1 k == |k^T W|^2 with W from the eigendecomposition
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        ratio = self.noise_var / self.signal_var
+        self.projection = eigenvectors / np.sqrt(np.clip(eigenvalues, 0, None) + ratio)
+    
+    def _kernel(self, X):
+        sq_dist = (X ** 2).sum(axis=1)[:, None] + self.sv_norms[None, :] - 2.0 * X @ self.support_vectors.T
+        return np.exp(-self.gamma * np.clip(sq_dist, 0, None))
+    
+    def _predict_spread(self, X):
+        kernel = self._kernel(X)
+        prediction = kernel @ self.dual_coef + self.intercept
+        explained = ((kernel @ self.projection) ** 2).sum(axis=1)
+        variance = self.signal_var * np.clip(1.0 - explained, 0, None) + self.noise_var
+        return prediction, np.sqrt(variance)
+
+def build_spread_estimator(model, n_features, compiled=None, native_max_rows=0):
+    """
+    Calibrated spread estimator for a supported model; raises UnsupportedModel otherwise
+    
+    `compiled` is the model's native backend (or None) and `native_max_rows`
+    the largest input it serves, as for predictions without confidence.
+    """
+    name = type(model).__name__
+    if name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        if compiled is None:
+            # The leaf tables speed up the library path too
+            try:
+                compiled = compile_model(model)
+            except UnsupportedModel as e:
+                logger.info(f"🌲 Per-tree predictions for the {name} spread: {str(e)}")
+        estimator = ForestSpread(model, compiled, native_max_rows)
+    elif name == 'XGBRegressor':
+        estimator = BoostingSpread(model, compiled, native_max_rows)
+    elif name == 'SVR':
+        estimator = KernelSpread(model)
+    else:
+        raise UnsupportedModel(f'No confidence estimator for {name}')
+    estimator.calibrate(n_features)
+    return estimator
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+# Exported columns, in output order (names of `predictions` table columns)
+EXPORT_COLUMNS = [
+    'id', 'created_at', 'field_id',
+    'ndvi', 'chlorophyll', 'latitude', 'longitude', 'day_of_year',
+    'nitrogen', 'phosphorus', 'potassium',
+    'nitrogen_status', 'phosphorus_status', 'potassium_status',
+    'nitrogen_confidence', 'phosphorus_confidence', 'potassium_confidence',
+    'notes', 'model_version'
+]
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def iter_csv(partitions):
+    """Encode row partitions as CSV, one chunk of text per partition"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    
+    created_at = EXPORT_COLUMNS.index('created_at')
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            row = list(row)
+            row[created_at] = _isoformat(row[created_at])
+            writer.writerow(row)
+        yield buffer.getvalue()
+
+def iter_ndjson(partitions):
+    """Encode row partitions as newline-delimited JSON"""
+    for rows in partitions:
+        lines = []
+        for row in rows:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record['created_at'] = _isoformat(record['created_at'])
+            lines.append(json.dumps(record))
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_parquet(partitions):
+    """Encode row partitions as Parquet, one row group per partition"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = arrow_schema(EXPORT_COLUMNS)
+    
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in partitions:
+            columns = list(zip(*rows)) if rows else [[] for _ in EXPORT_COLUMNS]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def arrow_schema(columns=None):
+    """Arrow schema of `predictions` columns (all of them by default)"""
+    import pyarrow as pa
+    from sqlalchemy import DateTime, Float, Integer
+    from app.models import Prediction
+    
+    table = Prediction.__table__
+    fields = []
+    for name in columns or [column.name for column in table.columns]:
+        column_type = table.c[name].type
+        if isinstance(column_type, DateTime):
+            arrow_type = pa.timestamp('us')
+        elif isinstance(column_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column_type, Float):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append((name, arrow_type))
+    return pa.schema(fields)
+
+def encode_export(file_format, partitions):
+    """Return a generator encoding row partitions in the requested format"""
+    encoders = {
+        'csv': iter_csv,
+        'ndjson': iter_ndjson,
+        'parquet': iter_parquet
+    }
+    return encoders[file_format](partitions)
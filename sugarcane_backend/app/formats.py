@@ -0,0 +1,128 @@
+"""
+Response formats for /history pages
+
+`format=` (or the Accept header) picks one of:
+- json: the default layout, one nested object per prediction
+  (Prediction.to_dict), or flat objects when `fields=` is given
+- columnar: JSON with one array per column instead of one object per row,
+  so keys are sent once per page instead of once per row
+- msgpack: the columnar document as MessagePack (needs `msgpack`)
+- arrow: an Arrow IPC stream of the page (needs `pyarrow`); the page
+  metadata travels in X-Next-Cursor / X-Count headers
+
+Column names are those of /export (EXPORT_COLUMNS). Timestamps are ISO
+8601 strings, except in Arrow, where they are timestamp[us] columns.
+"""
+
+import logging
+
+from app.export import EXPORT_COLUMNS, arrow_schema
+from app.models import prediction_dict
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.sugarcane.columnar+json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+FIELD_NAMES = EXPORT_COLUMNS
+
+class FormatError(ValueError):
+    """Raised for unknown formats or fields; `status` is the HTTP status to answer with"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def negotiate(requested, accept_mimetypes):
+    """Format name from `format=`, else the best match of the Accept header (json by default)"""
+    if requested:
+        requested = requested.lower()
+        if requested not in HISTORY_FORMATS:
+            raise FormatError(f"Unsupported format: {requested} (expected {', '.join(HISTORY_FORMATS)})")
+        name = requested
+    else:
+        mimetype = accept_mimetypes.best_match(list(HISTORY_FORMATS.values()), default=HISTORY_FORMATS['json'])
+        name = next(name for name, value in HISTORY_FORMATS.items() if value == mimetype)
+    
+    # Optional encoders are checked up front, before any query runs
+    if name == 'msgpack':
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            raise FormatError('MessagePack responses require msgpack', status=406)
+    elif name == 'arrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise FormatError('Arrow responses require pyarrow', status=406)
+    return name
+
+def parse_fields(value):
+    """`fields=a,b,c` -> column names in request order, None when absent"""
+    if not value:
+        return None
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELD_NAMES]
+    if unknown or not fields:
+        raise FormatError(f"Unknown fields: {', '.join(unknown)} (expected {', '.join(FIELD_NAMES)})")
+    return fields
+
+def _isoformat(values):
+    return [value.isoformat() if value is not None else None for value in values]
+
+def columns(rows, fields):
+    """{field: list of values} of tuple rows whose first values are `fields`"""
+    transposed = list(zip(*rows)) if rows else [()] * len(fields)
+    data = {}
+    for name, values in zip(fields, transposed):
+        data[name] = _isoformat(values) if name == 'created_at' else list(values)
+    return data
+
+def history_response(app, file_format, rows, fields, meta):
+    """
+    Flask response for one /history page
+    
+    `rows` are tuples starting with the values of `fields` (the whole
+    EXPORT_COLUMNS list when no projection was asked for), `meta` the
+    page metadata (count, limit, days, next_cursor).
+    """
+    mimetype = HISTORY_FORMATS[file_format]
+    if file_format == 'arrow':
+        return app.response_class(
+            _arrow_stream(rows, fields or FIELD_NAMES), mimetype=mimetype,
+            headers={'X-Next-Cursor': meta['next_cursor'] or '', 'X-Count': str(meta['count'])}
+        )
+    
+    if file_format == 'json':
+        if fields is None:
+            data = [prediction_dict(row) for row in rows]
+        else:
+            data = [dict(zip(fields, row)) for row in rows]
+            if 'created_at' in fields:
+                for record in data:
+                    record['created_at'] = record['created_at'].isoformat() if record['created_at'] else None
+        return app.json.response({'success': True, **meta, 'data': data})
+    
+    fields = fields or FIELD_NAMES
+    document = {'success': True, **meta, 'fields': fields, 'columns': columns(rows, fields)}
+    if file_format == 'msgpack':
+        import msgpack
+        return app.response_class(msgpack.packb(document), mimetype=mimetype)
+    return app.response_class(app.json.dumps(document), mimetype=mimetype)
+
+def _arrow_stream(rows, fields):
+    import pyarrow as pa
+    
+    schema = arrow_schema(fields)
+    transposed = list(zip(*rows)) if rows else [()] * len(fields)
+    table = pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(transposed, schema)], schema=schema
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
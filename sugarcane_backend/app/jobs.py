@@ -0,0 +1,355 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, or_, select, update
+
+from app.batch import read_csv_frame, validate_batch, text_column
+from app.ml_models import NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+SURVEY_FORMATS = ('csv', 'parquet')
+
+# Columns of the downloadable job output, one row per input row
+OUTPUT_COLUMNS = (
+    ['row', 'field_id']
+    + NUTRIENTS
+    + [f'{name}_status' for name in NUTRIENTS]
+    + [f'{name}_confidence' for name in NUTRIENTS]
+    + ['error']
+)
+
+class JobRunner:
+    """
+    Run survey prediction jobs in a local process pool
+    
+    Job state lives in the `jobs` table, so queued or interrupted jobs
+    are picked up again after the web process restarts. Workers claim a
+    job atomically, record themselves as its owner, process it chunk by
+    chunk and commit predictions together with the job progress, so a
+    resumed job continues after the last committed chunk.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Read job settings from the app config"""
+        self.app = app
+        self.jobs_dir = Path(app.config['JOBS_DIR']).resolve()
+        self.max_workers = app.config['JOB_WORKERS']
+        self.chunk_size = app.config['JOB_CHUNK_SIZE']
+        self.stale_after = app.config['JOB_STALE_AFTER']
+        self._executor = None
+        atexit.register(self.shutdown)
+    
+    def create_job(self, stream, filename, file_format):
+        """Save an uploaded survey file, record the job and queue it"""
+        from app import db
+        from app.models import Job
+        
+        job_id = uuid.uuid4().hex
+        job_dir = self.jobs_dir / job_id
+        output_dir = job_dir / 'output'
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        input_path = job_dir / f'input.{file_format}'
+        with open(input_path, 'wb') as f:
+            shutil.copyfileobj(stream, f)
+        
+        job = Job(
+            id=job_id,
+            status='queued',
+            filename=filename,
+            file_format=file_format,
+            input_path=str(input_path),
+            output_dir=str(output_dir)
+        )
+        db.session.add(job)
+        db.session.commit()
+        
+        logger.info(f"📥 Job {job_id} queued ({filename}, {file_format})")
+        self.submit(job_id)
+        return job
+    
+    def submit(self, job_id):
+        """Hand a job to the worker pool"""
+        args = (
+            run_job,
+            job_id,
+            self._database_uri(),
+            str(_models_path()),
+            self.chunk_size,
+            self.stale_after,
+            self.app.config['SQLITE_PRAGMAS']
+        )
+        try:
+            future = self._get_executor().submit(*args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) and took the pool with it
+            logger.warning("⚠️ Job worker pool broken, starting a new one")
+            self._executor = None
+            future = self._get_executor().submit(*args)
+        future.add_done_callback(_log_job_result)
+    
+    def recover(self):
+        """
+        Requeue jobs left queued or running by a previous web process
+        
+        A running job is taken over at once when its worker was a process
+        on this host that has exited, and otherwise once its heartbeat is
+        older than JOB_STALE_AFTER (e.g. a worker on another host).
+        """
+        from app import db
+        from app.models import Job
+        
+        jobs = Job.__table__
+        stale = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with self.app.app_context():
+            job_ids = [job.id for job in Job.query.filter(Job.status == 'queued')]
+            for job in Job.query.filter(Job.status == 'running').all():
+                if job.heartbeat_at is not None and job.heartbeat_at >= stale and not _worker_exited(job.worker):
+                    continue
+                # Only if no other process took the job over in the meantime
+                requeued = db.session.execute(
+                    update(jobs)
+                    .where(jobs.c.id == job.id, jobs.c.status == 'running', jobs.c.worker == job.worker)
+                    .values(status='queued')
+                ).rowcount
+                if requeued:
+                    job_ids.append(job.id)
+            db.session.commit()
+        
+        for job_id in job_ids:
+            logger.info(f"🔁 Resuming job {job_id}")
+            self.submit(job_id)
+        return job_ids
+    
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def _get_executor(self):
+        # A pool created before a fork belongs to the parent process
+        if self._executor is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+    
+    def _database_uri(self):
+        from app import db
+        with self.app.app_context():
+            return db.engine.url.render_as_string(hide_password=False)
+
+def _models_path():
+    from app.ml_models import DEFAULT_MODELS_PATH
+    return Path(DEFAULT_MODELS_PATH).resolve()
+
+def _worker_exited(worker):
+    """Whether `worker` (host:pid) was a process on this host that is gone"""
+    host, _, pid = (worker or '').rpartition(':')
+    # Signal 0 only checks for the process; on Windows os.kill would terminate it
+    if host != socket.gethostname() or os.name == 'nt':
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        pass
+    return False
+
+def _log_job_result(future):
+    try:
+        future.result()
+    except Exception as e:
+        logger.error(f"❌ Job worker crashed: {str(e)}")
+
+def iter_output_csv(job):
+    """Yield the job output as CSV text, one chunk file at a time"""
+    yield ','.join(OUTPUT_COLUMNS) + '\n'
+    for part in sorted(Path(job.output_dir).glob('part-*.csv')):
+        with open(part, 'r', newline='') as f:
+            yield from iter(lambda: f.read(64 * 1024), '')
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+_worker_models = {}
+
+def _get_worker_models(models_path):
+    """Load models once per worker process, with the API's model settings"""
+    if models_path not in _worker_models:
+        from app.ml_models import model_manager_from_env
+        _worker_models[models_path] = model_manager_from_env(models_path)
+    else:
+        _worker_models[models_path].refresh_if_changed()
+    return _worker_models[models_path]
+
+def _iter_survey_chunks(path, file_format, chunk_size):
+    if file_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Parquet support requires pyarrow')
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from read_csv_frame(path, chunksize=chunk_size)
+
+def _count_rows(path, file_format):
+    if file_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return None
+        return pq.ParquetFile(path).metadata.num_rows
+    with open(path, 'rb') as f:
+        lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+    return max(lines - 1, 0)
+
+def _chunk_output(frame, first_row, valid_rows, errors, result):
+    """Build the output rows of one chunk in input order"""
+    output = pd.DataFrame(index=range(len(frame)), columns=OUTPUT_COLUMNS)
+    output['row'] = range(first_row, first_row + len(frame))
+    output['field_id'] = text_column(frame, 'field_id', range(len(frame)), 'UNKNOWN')
+    for name in NUTRIENTS:
+        output.loc[valid_rows, name] = result['predictions'][name]
+        output.loc[valid_rows, f'{name}_status'] = result['status'][name]
+        output.loc[valid_rows, f'{name}_confidence'] = result['confidence'][name]
+    if errors:
+        output.loc[[e['index'] for e in errors], 'error'] = [e['error'] for e in errors]
+    return output
+
+def run_job(job_id, database_uri, models_path, chunk_size, stale_after, sqlite_pragmas):
+    """Process one survey job (runs inside a worker process)"""
+    from app.models import Job
+    from app.persistence import configure_sqlite, insert_predictions, prediction_rows, writer_engine_options
+    
+    engine = create_engine(database_uri, **writer_engine_options(database_uri))
+    configure_sqlite(engine, sqlite_pragmas)
+    jobs = Job.__table__
+    
+    try:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=stale_after)
+        
+        # Claim the job; another process may already own it
+        with engine.begin() as conn:
+            claimed = conn.execute(
+                update(jobs)
+                .where(jobs.c.id == job_id)
+                .where(or_(
+                    jobs.c.status == 'queued',
+                    (jobs.c.status == 'running') & ((jobs.c.heartbeat_at == None) | (jobs.c.heartbeat_at < stale))
+                ))
+                .values(status='running', heartbeat_at=now, worker=f'{socket.gethostname()}:{os.getpid()}')
+            ).rowcount
+            if not claimed:
+                return job_id
+            job = conn.execute(select(jobs).where(jobs.c.id == job_id)).one()
+        
+        if job.started_at is None or job.total_rows is None:
+            with engine.begin() as conn:
+                conn.execute(
+                    update(jobs).where(jobs.c.id == job_id).values(
+                        started_at=job.started_at or now,
+                        total_rows=_count_rows(job.input_path, job.file_format)
+                    )
+                )
+        
+        models = _get_worker_models(models_path)
+        output_dir = Path(job.output_dir)
+        first_row = 0
+        
+        for chunk_index, frame in enumerate(_iter_survey_chunks(job.input_path, job.file_format, chunk_size)):
+            n_rows = len(frame)
+            if chunk_index < job.chunks_done:
+                first_row += n_rows
+                continue
+            
+            frame = frame.reset_index(drop=True)
+            X, valid_rows, errors = validate_batch(frame, models.feature_names)
+            result = models.predict_batch(X)
+            field_ids = text_column(frame, 'field_id', valid_rows, 'UNKNOWN')
+            
+            # Output file first: a chunk that is not committed is redone and overwritten
+            output = _chunk_output(frame, first_row, valid_rows, errors, result)
+            output.to_csv(output_dir / f'part-{chunk_index:06d}.csv', header=False, index=False)
+            
+            rows = prediction_rows(
+                models.feature_names,
+                X,
+                {
+                    'predictions': {name: values.tolist() for name, values in result['predictions'].items()},
+                    'status': {name: values.tolist() for name, values in result['status'].items()},
+                    'confidence': {name: values.tolist() for name, values in result['confidence'].items()},
+                    'model_version': result['model_version']
+                },
+                field_ids,
+                text_column(frame, 'notes', valid_rows, f'job:{job_id}'),
+                datetime.utcnow()
+            )
+            
+            with engine.begin() as conn:
+                insert_predictions(conn, rows)
+                conn.execute(
+                    update(jobs).where(jobs.c.id == job_id).values(
+                        processed_rows=jobs.c.processed_rows + n_rows,
+                        failed_rows=jobs.c.failed_rows + len(errors),
+                        chunks_done=chunk_index + 1,
+                        heartbeat_at=datetime.utcnow()
+                    )
+                )
+            first_row += n_rows
+        
+        with engine.begin() as conn:
+            conn.execute(
+                update(jobs).where(jobs.c.id == job_id).values(
+                    status='completed',
+                    finished_at=datetime.utcnow(),
+                    heartbeat_at=datetime.utcnow()
+                )
+            )
+        logger.info(f"✅ Job {job_id} completed")
+    
+    except Exception as e:
+        logger.error(f"❌ Job {job_id} failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        with engine.begin() as conn:
+            conn.execute(
+                update(jobs).where(jobs.c.id == job_id).values(
+                    status='failed',
+                    error=str(e),
+                    finished_at=datetime.utcnow()
+                )
+            )
+    
+    finally:
+        engine.dispose()
+    
+    return job_id
+
+job_runner = JobRunner()
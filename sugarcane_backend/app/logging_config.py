@@ -0,0 +1,138 @@
+"""
+Non-blocking logging
+
+Log calls only put records on an in-memory queue (QueueHandler); a
+background QueueListener thread formats them and writes the file and
+console output. Threads do not survive fork, so each process (e.g. each
+gunicorn worker) starts its own queue and listener on its first record.
+
+Request logs are one JSON object per line on the `app.requests` logger,
+sampled at LOG_REQUEST_SAMPLE_RATE; errors and slow requests are always
+logged.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+
+from flask import g, request
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class ProcessQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that (re)starts its listener in every process"""
+    
+    def __init__(self, handlers):
+        super().__init__(queue.SimpleQueue())
+        self.handlers = handlers
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+    
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Records queued in the parent before fork belong to its listener
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+    
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+    
+    def stop(self):
+        """Drain the queue and stop this process's listener"""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+
+_queue_handler = None
+
+def configure_logging(level=None, log_file=None):
+    """
+    Route the root logger through a queue to file and console handlers
+    
+    `level` defaults to LOG_LEVEL (INFO); `log_file` to LOG_FILE
+    (logs/app.log), an empty value disables the file. Safe to call again,
+    e.g. to change the level.
+    """
+    global _queue_handler
+    
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if _queue_handler is not None:
+        return _queue_handler
+    
+    if log_file is None:
+        log_file = os.environ.get('LOG_FILE', 'logs/app.log')
+    
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    _queue_handler = ProcessQueueHandler(handlers)
+    root.addHandler(_queue_handler)
+    # Library warnings go through the queue instead of straight to stderr
+    logging.captureWarnings(True)
+    atexit.register(_queue_handler.stop)
+    return _queue_handler
+
+class RequestLogger:
+    """Sampled structured request logs with timing"""
+    
+    def __init__(self, app=None):
+        self.logger = logging.getLogger('app.requests')
+        self.sample_rate = 0.01
+        self.slow_ms = 1000.0
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.sample_rate = float(app.config.get('LOG_REQUEST_SAMPLE_RATE', self.sample_rate))
+        self.slow_ms = float(app.config.get('LOG_SLOW_REQUEST_MS', self.slow_ms))
+        app.before_request(self._start)
+        app.after_request(self._finish)
+    
+    def _start(self):
+        g.request_started = time.perf_counter()
+    
+    def _finish(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        
+        duration_ms = (time.perf_counter() - started) * 1000
+        if response.status_code < 500 and duration_ms < self.slow_ms and random.random() >= self.sample_rate:
+            return response
+        if not self.logger.isEnabledFor(logging.INFO):
+            return response
+        
+        self.logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'request_bytes': request.content_length,
+            'response_bytes': response.content_length,
+            'pid': os.getpid(),
+            'sampled': response.status_code < 500 and duration_ms < self.slow_ms
+        }))
+        return response
+
+request_logger = RequestLogger()
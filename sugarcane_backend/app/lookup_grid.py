@@ -0,0 +1,263 @@
+"""
+Precomputed lookup grid for low-latency scoring
+
+The models see a small, bounded feature space (NDVI in [0, 1], a range
+of chlorophyll readings, the estate's latitudes/longitudes and day of
+year 1-366). A lookup grid evaluates the loaded models once on a
+regular grid over that box and stores every nitrogen/phosphorus/
+potassium prediction and confidence as one float32 .npy array beside
+the model files. With MODEL_LOOKUP_GRID=true, rows inside the box are
+answered by multilinear interpolation between the 2^5 surrounding grid
+points, and rows outside it (or with missing features) go to the real
+models.
+
+Trees make the models piecewise constant, so interpolation smooths
+their steps. The build measures this on random held-out points inside
+the box against the real models and records the maximum and p99 error
+per nutrient in the grid's JSON metadata; the load report repeats it.
+    
+    python -m app.lookup_grid build --shape ndvi=21,chlorophyll=21,latitude=9,longitude=9,day_of_year=25
+    python -m app.lookup_grid evaluate --samples 50000
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from app.ml_models import NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+GRID_FILE = 'lookup_grid.npy'
+META_FILE = 'lookup_grid.json'
+
+# Grid points per feature
+DEFAULT_SHAPE = {'ndvi': 21, 'chlorophyll': 21, 'latitude': 9, 'longitude': 9, 'day_of_year': 25}
+
+# Fixed feature ranges; others span the scaler mean +/- SCALER_SPAN standard deviations
+FIXED_BOUNDS = {'ndvi': (0.0, 1.0), 'day_of_year': (1.0, 366.0)}
+SCALER_SPAN = 3.0
+
+# Channels stored per grid point
+CHANNELS = NUTRIENTS + [f'{name}_confidence' for name in NUTRIENTS]
+
+# Grid points predicted per predict_batch call while building
+BUILD_CHUNK_ROWS = 50000
+
+class LookupGridError(ValueError):
+    """Raised for missing, stale or malformed lookup grids"""
+
+class LookupGrid:
+    """Regular grid of precomputed predictions with multilinear interpolation"""
+    
+    def __init__(self, feature_names, lower, upper, values, meta=None):
+        self.feature_names = list(feature_names)
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.values = values
+        self.meta = meta or {}
+        self.shape = np.array(values.shape[:-1])
+        if len(self.shape) != len(self.feature_names) or values.shape[-1] != len(CHANNELS):
+            raise LookupGridError(f'Grid array shape {values.shape} does not match its features')
+        if (self.shape < 2).any() or not (self.upper > self.lower).all():
+            raise LookupGridError('Every grid axis needs at least two points and upper > lower')
+        
+        self.step = (self.upper - self.lower) / (self.shape - 1)
+        # Row-major strides of the point axes in the flattened (points, channels) view
+        self.strides = np.cumprod(np.concatenate([self.shape[1:], [1]])[::-1])[::-1]
+        self._flat = values.reshape(-1, len(CHANNELS))
+        # Flat offset and axis bits of each of the 2^d corners around a point
+        n_features = len(self.feature_names)
+        self._corner_bits = (np.arange(1 << n_features)[:, None] >> np.arange(n_features)[::-1]) & 1
+        self._corner_offsets = self._corner_bits @ self.strides
+    
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+    
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Grid stored in a model directory; raises LookupGridError if absent"""
+        directory = Path(directory)
+        meta_path = directory / META_FILE
+        grid_path = directory / GRID_FILE
+        if not meta_path.exists() or not grid_path.exists():
+            raise LookupGridError(f'No lookup grid in {directory} (build one with python -m app.lookup_grid build)')
+        meta = json.loads(meta_path.read_text())
+        values = np.load(grid_path, mmap_mode=mmap_mode)
+        return cls(meta['feature_names'], meta['lower'], meta['upper'], values, meta)
+    
+    def contains(self, X):
+        """Mask of rows whose features all lie inside the grid"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            return np.zeros(len(X), dtype=bool)
+        return ((X >= self.lower) & (X <= self.upper)).all(axis=1)
+    
+    def interpolate(self, X):
+        """Channel values at rows inside the grid, shape (n_rows, len(CHANNELS))"""
+        position = (np.asarray(X, dtype=np.float64) - self.lower) / self.step
+        index = np.clip(np.floor(position).astype(np.int64), 0, self.shape - 2)
+        fraction = position - index
+        
+        # Weight of each corner: product of t or (1 - t) along every axis
+        weights = np.where(self._corner_bits[None, :, :], fraction[:, None, :], 1.0 - fraction[:, None, :]).prod(axis=2)
+        points = (index @ self.strides)[:, None] + self._corner_offsets[None, :]
+        return np.einsum('nk,nkc->nc', weights, self._flat[points])
+    
+    def predict(self, X):
+        """(predictions, confidence) dicts of arrays keyed by nutrient"""
+        values = self.interpolate(X)
+        predictions = {name: values[:, i] for i, name in enumerate(NUTRIENTS)}
+        confidence = {name: values[:, len(NUTRIENTS) + i] for i, name in enumerate(NUTRIENTS)}
+        return predictions, confidence
+
+def default_bounds(scaler, feature_names):
+    """(lower, upper) per feature: fixed ranges, else the scaler's mean +/- SCALER_SPAN std"""
+    bounds = {}
+    for i, name in enumerate(feature_names):
+        if name in FIXED_BOUNDS:
+            bounds[name] = FIXED_BOUNDS[name]
+            continue
+        mean, scale = float(scaler.mean_[i]), float(scaler.scale_[i])
+        lower, upper = mean - SCALER_SPAN * scale, mean + SCALER_SPAN * scale
+        if name == 'chlorophyll':
+            lower = max(lower, 0.0)
+        elif name == 'latitude':
+            lower, upper = max(lower, -90.0), min(upper, 90.0)
+        elif name == 'longitude':
+            lower, upper = max(lower, -180.0), min(upper, 180.0)
+        bounds[name] = (round(lower, 4), round(upper, 4))
+    return bounds
+
+def _model_values(manager, X):
+    """Model outputs as (n_rows, len(CHANNELS)); the manager must not be serving a grid"""
+    if manager.grid is not None:
+        raise LookupGridError('Compare against a ModelManager without MODEL_LOOKUP_GRID')
+    result = manager.predict_batch(X)
+    return np.column_stack(
+        [result['predictions'][name] for name in NUTRIENTS] + [result['confidence'][name] for name in NUTRIENTS]
+    )
+
+def evaluate_grid(manager, grid, n_samples=20000, seed=0):
+    """Interpolation error against the real models at random points inside the grid"""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(grid.lower, grid.upper, (n_samples, grid.n_features))
+    expected = _model_values(manager, X)
+    error = np.abs(grid.interpolate(X) - expected)
+    
+    report = {'samples': n_samples, 'seed': seed}
+    for i, channel in enumerate(CHANNELS):
+        report[channel] = {
+            'max_abs_error': round(float(error[:, i].max()), 6),
+            'p99_abs_error': round(float(np.percentile(error[:, i], 99)), 6),
+            'mean_abs_error': round(float(error[:, i].mean()), 6),
+            'model_range': [round(float(expected[:, i].min()), 4), round(float(expected[:, i].max()), 4)]
+        }
+    return report
+
+def build_grid(manager, directory, shape=None, bounds=None, samples=20000, seed=0):
+    """Evaluate the manager's current models on a grid and save it in `directory`; returns the metadata"""
+    directory = Path(directory)
+    feature_names = list(manager.feature_names)
+    shape = {**DEFAULT_SHAPE, **(shape or {})}
+    bounds = {**default_bounds(manager.scalers['features'], feature_names), **(bounds or {})}
+    unknown = set(shape) - set(feature_names)
+    if unknown:
+        raise LookupGridError(f"Unknown grid features: {', '.join(sorted(unknown))}")
+    
+    axes = [np.linspace(bounds[name][0], bounds[name][1], shape[name]) for name in feature_names]
+    dims = [len(axis) for axis in axes]
+    n_points = int(np.prod(dims))
+    logger.info(f"🧮 Building {'x'.join(map(str, dims))} lookup grid ({n_points} points) for {manager.version}")
+    
+    # Written under a temporary name and renamed, so a loading process
+    # never maps a half-written grid
+    tmp_path = directory / f'.{GRID_FILE}.tmp'
+    values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(*dims, len(CHANNELS)))
+    flat = values.reshape(-1, len(CHANNELS))
+    start = time.perf_counter()
+    for offset in range(0, n_points, BUILD_CHUNK_ROWS):
+        index = np.unravel_index(np.arange(offset, min(offset + BUILD_CHUNK_ROWS, n_points)), dims)
+        X = np.column_stack([axis[i] for axis, i in zip(axes, index)])
+        flat[offset:offset + len(X)] = _model_values(manager, X)
+    values.flush()
+    del flat, values
+    elapsed = time.perf_counter() - start
+    
+    grid = LookupGrid(feature_names, [axis[0] for axis in axes], [axis[-1] for axis in axes],
+                      np.load(tmp_path, mmap_mode='r'))
+    meta = {
+        'model_version': manager.version,
+        'created_at': datetime.utcnow().isoformat(),
+        'feature_names': feature_names,
+        'shape': dims,
+        'lower': grid.lower.tolist(),
+        'upper': grid.upper.tolist(),
+        'channels': CHANNELS,
+        'build_seconds': round(elapsed, 1),
+        'error': evaluate_grid(manager, grid, samples, seed)
+    }
+    os.replace(tmp_path, directory / GRID_FILE)
+    meta_tmp = directory / f'.{META_FILE}.tmp'
+    meta_tmp.write_text(json.dumps(meta, indent=2))
+    os.replace(meta_tmp, directory / META_FILE)
+    
+    logger.info(f"✅ Lookup grid written in {elapsed:.1f}s: {_error_summary(meta['error'])}")
+    return meta
+
+def _error_summary(report):
+    return ', '.join(
+        f"{name} max {report[name]['max_abs_error']:g} (p99 {report[name]['p99_abs_error']:g})" for name in NUTRIENTS
+    )
+
+def _parse_features(value, parse):
+    """'name=value,...' -> {name: parse(value)}"""
+    parsed = {}
+    for item in filter(None, (value or '').split(',')):
+        name, _, spec = item.partition('=')
+        parsed[name.strip()] = parse(spec)
+    return parsed
+
+def main():
+    from app.ml_models import DEFAULT_MODELS_PATH, ModelManager
+    
+    parser = argparse.ArgumentParser(description='Build or check the lookup grid of the active models')
+    parser.add_argument('--models-path', default=DEFAULT_MODELS_PATH)
+    parser.add_argument('--version', help='registry version (default: the active one)')
+    parser.add_argument('--samples', type=int, default=20000, help='held-out points for the error report')
+    parser.add_argument('--seed', type=int, default=0)
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    build = commands.add_parser('build', help='precompute predictions on a grid beside the model files')
+    build.add_argument('--shape', help='points per feature, e.g. ndvi=41,chlorophyll=41,day_of_year=25')
+    build.add_argument('--bounds', help='feature ranges, e.g. latitude=16:21,longitude=72:78')
+    
+    commands.add_parser('evaluate', help='re-measure an existing grid against the models')
+    args = parser.parse_args()
+    
+    manager = ModelManager(args.models_path)
+    if args.version:
+        manager.load_models(args.version)
+    directory = manager.bundle_dir
+    
+    if args.command == 'build':
+        meta = build_grid(
+            manager, directory,
+            shape=_parse_features(args.shape, int),
+            bounds=_parse_features(args.bounds, lambda spec: tuple(float(part) for part in spec.split(':'))),
+            samples=args.samples, seed=args.seed
+        )
+        report = meta['error']
+    else:
+        report = evaluate_grid(manager, LookupGrid.load(directory), args.samples, args.seed)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Prometheus metrics
+
+Served as text by GET /api/metrics. Under gunicorn every worker writes its
+samples to PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py) and a scrape
+aggregates all of them; without it the metrics are per process.
+
+Stage timers wrap the existing code paths:
+    
+    parse, validate             /api/predict request handling
+    scale, model, classify      ModelManager (single and batch)
+    batch_wait                  queued for a micro-batch (MODEL_MICROBATCH)
+    admission_wait              queued for an in-flight slot (ADMISSION_MAX_INFLIGHT)
+    db_write                    enqueue or write in the request
+    sugarcane_db_write_seconds  each bulk INSERT transaction
+
+Requests turned away by admission control (app/admission.py) are counted
+in sugarcane_admission_rejected_total by reason (rate_limited, overloaded).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+
+# Sub-millisecond resolution: most stages take tens of microseconds
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+REQUESTS = Counter(
+    'sugarcane_http_requests_total', 'HTTP requests', ['method', 'endpoint', 'status']
+)
+REQUEST_SECONDS = Histogram(
+    'sugarcane_http_request_seconds', 'HTTP request latency', ['endpoint'], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    'sugarcane_predict_stage_seconds', 'Time per prediction stage', ['stage'], buckets=LATENCY_BUCKETS
+)
+MODEL_SECONDS = Histogram(
+    'sugarcane_model_predict_seconds', 'Time per model predict call', ['model'], buckets=LATENCY_BUCKETS
+)
+PREDICTED_ROWS = Counter(
+    'sugarcane_predicted_rows_total', 'Rows predicted', ['path']
+)
+PREDICTION_ERRORS = Counter(
+    'sugarcane_prediction_errors_total', 'Failed predictions', ['path']
+)
+CACHE_LOOKUPS = Counter(
+    'sugarcane_prediction_cache_lookups_total', 'Prediction cache lookups', ['result']
+)
+MICROBATCH_ROWS = Histogram(
+    'sugarcane_microbatch_rows', 'Rows per coalesced predict batch', buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+DB_WRITE_SECONDS = Histogram(
+    'sugarcane_db_write_seconds', 'Prediction insert transaction latency', buckets=LATENCY_BUCKETS
+)
+DB_WRITE_ROWS = Counter(
+    'sugarcane_db_written_rows_total', 'Prediction rows written'
+)
+DB_WRITE_ERRORS = Counter(
+    'sugarcane_db_write_errors_total', 'Failed prediction insert transactions'
+)
+ADMISSION_REJECTED = Counter(
+    'sugarcane_admission_rejected_total', 'Requests rejected by admission control', ['reason', 'endpoint']
+)
+ADMISSION_INFLIGHT = Gauge(
+    'sugarcane_admission_inflight', 'Predictions holding an in-flight slot', multiprocess_mode='livesum'
+)
+ADMISSION_QUEUED = Gauge(
+    'sugarcane_admission_queued', 'Predictions waiting for an in-flight slot', multiprocess_mode='livesum'
+)
+
+# Label children resolved once; .labels() does a dict lookup under a lock
+_stages = {}
+_models = {}
+
+def observe_stage(stage, seconds):
+    child = _stages.get(stage)
+    if child is None:
+        child = _stages[stage] = STAGE_SECONDS.labels(stage)
+    child.observe(seconds)
+
+def observe_model(model, seconds):
+    child = _models.get(model)
+    if child is None:
+        child = _models[model] = MODEL_SECONDS.labels(model)
+    child.observe(seconds)
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block as one prediction stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+class Metrics:
+    """Request counters and latency for every endpoint, plus /metrics rendering"""
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+    
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+    
+    def _finish(self, response):
+        started = g.get('metrics_started')
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+            REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        return response
+    
+    @staticmethod
+    def render():
+        """Prometheus text exposition of all metrics (all workers in multiprocess mode)"""
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            from prometheus_client import multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+metrics = Metrics()
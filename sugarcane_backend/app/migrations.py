@@ -0,0 +1,46 @@
+import logging
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+def run_migrations(engine, metadata):
+    """
+    Bring an existing database up to date with the declared models
+    
+    `create_all` only creates missing tables, so databases created by an
+    older release keep their old schema. This adds any declared column or
+    index that is missing from an existing table. Every step is
+    idempotent and runs on each startup.
+    """
+    inspector = inspect(engine)
+    applied = []
+    
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(
+                        f'Cannot add NOT NULL column {table.name}.{column.name} without a server default'
+                    )
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.server_default is not None:
+                    ddl += f' DEFAULT {column.server_default.arg}'
+                connection.execute(text(ddl))
+                applied.append(f'add column {table.name}.{column.name}')
+            
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    applied.append(f'create index {index.name}')
+    
+    for step in applied:
+        logger.info(f"🛠️ Migration applied: {step}")
+    return applied
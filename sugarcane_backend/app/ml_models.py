@@ -1,18 +1,79 @@
 import joblib
 import numpy as np
 import os
+import json
+import gc
+import time
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import threading
+from app.cache import PredictionCache
+from app.registry import ModelRegistry, OPTIONAL_FILES, REQUIRED_FILES
+from app.tree_compiler import NativeTreePredictor, UnsupportedModel, compile_model, verify_compiled
+from app.confidence import FALLBACK_CONFIDENCE, build_spread_estimator
+from app.classification import StatusModel, StatusThresholds
+from app.metrics import CACHE_LOOKUPS, PREDICTED_ROWS, PREDICTION_ERRORS, observe_model, stage_timer
 
 logger = logging.getLogger(__name__)
 
+# Feature order the scaler and models were trained with
+FEATURE_ORDER = ['ndvi', 'chlorophyll', 'latitude', 'longitude', 'day_of_year']
+NUTRIENTS = ['nitrogen', 'phosphorus', 'potassium']
+
+DEFAULT_MODELS_PATH = 'trained_models'
+
+# Largest input (rows) served by the native tree backend before falling
+# back to the library predictor, from benchmarks/bench_native_trees.py
+NATIVE_MAX_ROWS = {'nitrogen': 512, 'potassium': 16}
+
+class ModelBundle:
+    """One loaded set of models; replaced as a whole when versions switch"""
+    
+    def __init__(self, version, models, scalers, feature_names, load_report, predictors=None, estimators=None,
+                 status_model=None, directory=None, grid=None):
+        self.version = version
+        self.models = models
+        self.scalers = scalers
+        self.feature_names = feature_names
+        self.load_report = load_report
+        # Objects whose predict() serves requests (a model or its native backend)
+        self.predictors = predictors or dict(models)
+        # Prediction + confidence estimators; models without one report FALLBACK_CONFIDENCE
+        self.estimators = estimators or {}
+        # Trained overall-status classifier, when enabled and shipped
+        self.status_model = status_model
+        # Directory the model files were loaded from
+        self.directory = directory
+        # Precomputed LookupGrid answering in-range rows, when enabled
+        self.grid = grid
+
 class ModelManager:
     """Load and manage ML models with proper error handling"""
     
-    def __init__(self, models_path='trained_models'):
+    def __init__(self, models_path=DEFAULT_MODELS_PATH, cache=None, parallel_load=True, mmap_mode='r',
+                 native_models=(), native_max_rows=None, confidence_mode='model',
+                 thresholds=None, status_classifier=False, n_jobs=None, lookup_grid=False):
         self.models_path = Path(models_path).resolve()
-        self.models = {}
-        self.scalers = {}
+        self.registry = ModelRegistry(self.models_path)
+        self.cache = cache if cache is not None else PredictionCache(maxsize=0)
+        self.parallel_load = parallel_load
+        self.mmap_mode = mmap_mode or None
+        self.native_models = set(native_models)
+        self.native_max_rows = dict(NATIVE_MAX_ROWS)
+        self.native_max_rows.update(native_max_rows or {})
+        self.confidence_mode = confidence_mode
+        self.thresholds = thresholds if thresholds is not None else StatusThresholds()
+        self.status_classifier = status_classifier
+        # Threads per model predict call (None keeps each model's own setting)
+        self.n_jobs = n_jobs
+        # Serve in-range rows from a precomputed grid (see app/lookup_grid.py)
+        self.lookup_grid = lookup_grid
+        self._bundle = None
+        self._reload_lock = threading.Lock()
+        self._pointer_mtime = None
+        self._next_refresh = 0.0
         
         logger.info(f"📁 Model directory: {self.models_path}")
         logger.info(f"📁 Directory exists: {self.models_path.exists()}")
@@ -22,22 +83,102 @@ class ModelManager:
         
         self.load_models()
     
-    def load_models(self):
-        """Load all trained models with detailed error reporting"""
+    # Requests read the current bundle once, so a version switch never
+    # changes models underneath a prediction that is already running
+    @property
+    def models(self):
+        return self._bundle.models
+    
+    @property
+    def scalers(self):
+        return self._bundle.scalers
+    
+    @property
+    def feature_names(self):
+        return self._bundle.feature_names
+    
+    @property
+    def version(self):
+        return self._bundle.version
+    
+    @property
+    def load_report(self):
+        return self._bundle.load_report
+    
+    @property
+    def bundle_dir(self):
+        return self._bundle.directory
+    
+    @property
+    def grid(self):
+        return self._bundle.grid
+    
+    def load_models(self, version=None):
+        """
+        Load all trained models with detailed error reporting
         
-        required_files = {
-            'nitrogen': 'model_nitrogen_rf.pkl',
-            'phosphorus': 'model_phosphorus_svr.pkl',
-            'potassium': 'model_potassium_xgb.pkl',
-            'features_scaler': 'scaler_features.pkl'
-        }
+        Loads the given registry version, else the version named by the
+        ACTIVE pointer, else the flat files in the models directory. The
+        new bundle replaces the current one only after it loaded fully.
+        """
         
+        with self._reload_lock:
+            self._pointer_mtime = self.registry.pointer_mtime()
+            version = version or self.registry.active_version()
+            
+            if version:
+                bundle_dir, manifest = self.registry.resolve(version)
+                files = {key: entry['file'] for key, entry in manifest['files'].items()}
+                feature_order = manifest.get('feature_order')
+            else:
+                bundle_dir = self.models_path
+                files = dict(REQUIRED_FILES)
+                files.update({
+                    key: filename for key, filename in OPTIONAL_FILES.items()
+                    if (bundle_dir / filename).exists()
+                })
+                feature_order = None
+            
+            bundle = self._load_bundle(bundle_dir, files, version, feature_order)
+            self._bundle = bundle
+            
+            # Cached results belong to the previous models
+            self.cache.clear()
+            
+            logger.info(f"✅✅✅ ALL MODELS LOADED SUCCESSFULLY (version {bundle.version}) ✅✅✅")
+            return bundle
+    
+    def activate(self, version):
+        """Load a registry version, switch to it and make it the active version"""
+        bundle = self.load_models(version)
+        self.registry.set_active(version)
+        self._pointer_mtime = self.registry.pointer_mtime()
+        return bundle
+    
+    def refresh_if_changed(self, interval=5.0):
+        """Reload when another process changed the ACTIVE pointer (checked at most every `interval` s)"""
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return False
+        self._next_refresh = now + interval
+        
+        if self.registry.pointer_mtime() == self._pointer_mtime:
+            return False
+        if self.registry.active_version() == self.version:
+            self._pointer_mtime = self.registry.pointer_mtime()
+            return False
+        
+        logger.info("🔀 Active model version changed, reloading")
+        self.load_models()
+        return True
+    
+    def _load_bundle(self, bundle_dir, files, version, feature_order):
         logger.info("🔄 Starting model loading...")
         
         # Check files exist
         missing_files = []
-        for key, filename in required_files.items():
-            filepath = self.models_path / filename
+        for key, filename in files.items():
+            filepath = bundle_dir / filename
             if not filepath.exists():
                 missing_files.append(f"{key} ({filename})")
             else:
@@ -50,27 +191,99 @@ class ModelManager:
         
         # Load models
         try:
-            self.models['nitrogen'] = joblib.load(
-                self.models_path / 'model_nitrogen_rf.pkl'
-            )
-            logger.info("✅ Loaded nitrogen model")
+            rss_before = _resident_memory()
+            start = time.perf_counter()
+            paths = [bundle_dir / filename for filename in files.values()]
             
-            self.models['phosphorus'] = joblib.load(
-                self.models_path / 'model_phosphorus_svr.pkl'
-            )
-            logger.info("✅ Loaded phosphorus model")
+            if self.parallel_load:
+                with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+                    results = list(pool.map(self._try_load_file, paths))
+                # Unpickling imports the model libraries, and scikit-learn's circular imports
+                # can fail when two threads import it at once; by now the other thread has finished
+                results = [
+                    self._load_file(path) if isinstance(result, ImportError) else result
+                    for path, result in zip(paths, results)
+                ]
+            else:
+                results = [self._load_file(path) for path in paths]
             
-            self.models['potassium'] = joblib.load(
-                self.models_path / 'model_potassium_xgb.pkl'
-            )
-            logger.info("✅ Loaded potassium model")
+            loaded = {}
+            report = {}
+            for key, path, (obj, seconds, rss_delta) in zip(files, paths, results):
+                loaded[key] = obj
+                report[key] = {
+                    'file': path.name,
+                    'file_bytes': path.stat().st_size,
+                    'load_seconds': round(seconds, 4),
+                    # Only attributable per model when loading sequentially
+                    'rss_delta_bytes': None if self.parallel_load else rss_delta
+                }
+                logger.info(
+                    f"✅ Loaded {key} in {seconds * 1000:.1f} ms"
+                    + ('' if self.parallel_load else f" (+{rss_delta / 1e6:.1f} MB resident)")
+                )
             
-            self.scalers['features'] = joblib.load(
-                self.models_path / 'scaler_features.pkl'
+            if self.n_jobs is not None:
+                for obj in loaded.values():
+                    self._limit_threads(obj)
+            
+            scaler = loaded['features_scaler']
+            feature_names = list(FEATURE_ORDER)
+            if hasattr(scaler, 'feature_names_in_'):
+                feature_names = [str(name) for name in scaler.feature_names_in_]
+            if feature_order and list(feature_order) != feature_names:
+                raise ValueError(f"Manifest feature order {feature_order} does not match scaler {feature_names}")
+            if hasattr(scaler, 'feature_names_in_'):
+                # Inputs are always arrays in feature_names order; the name
+                # check would only raise a UserWarning on every prediction
+                del scaler.feature_names_in_
+            
+            models = {name: loaded[name] for name in NUTRIENTS}
+            predictors, estimators, backends = self._build_predictors(models, len(feature_names))
+            
+            status_model = None
+            if self.status_classifier:
+                if 'status_classifier' in loaded:
+                    status_model = StatusModel(loaded['status_classifier'])
+                    status_model.verify(len(feature_names))
+                else:
+                    logger.warning("⚠️ Status classifier enabled but not shipped with these models")
+            
+            version = version or f'legacy-{self._fingerprint(bundle_dir, files.values())}'
+            grid = self._load_grid(bundle_dir, version, feature_names) if self.lookup_grid else None
+            
+            rss_after = _resident_memory()
+            load_report = {
+                'parallel': self.parallel_load,
+                'mmap_mode': self.mmap_mode,
+                'total_seconds': round(time.perf_counter() - start, 4),
+                'rss_bytes': rss_after,
+                'rss_delta_bytes': rss_after - rss_before,
+                'backends': backends,
+                'confidence': {
+                    name: estimators[name].kind if name in estimators else 'fixed' for name in NUTRIENTS
+                },
+                'status_classifier': status_model is not None,
+                'lookup_grid': {'shape': grid.meta['shape'], 'error': grid.meta['error']} if grid is not None else None,
+                'models': report
+            }
+            logger.info(
+                f"📦 Models loaded in {load_report['total_seconds'] * 1000:.1f} ms, "
+                f"resident memory {rss_after / 1e6:.1f} MB (+{(rss_after - rss_before) / 1e6:.1f} MB)"
             )
-            logger.info("✅ Loaded feature scaler")
             
-            logger.info("✅✅✅ ALL MODELS LOADED SUCCESSFULLY ✅✅✅")
+            return ModelBundle(
+                version=version,
+                models=models,
+                scalers={'features': scaler},
+                feature_names=feature_names,
+                load_report=load_report,
+                predictors=predictors,
+                estimators=estimators,
+                status_model=status_model,
+                directory=bundle_dir,
+                grid=grid
+            )
             
         except Exception as e:
             error_msg = f"❌ Failed to load models: {str(e)}"
@@ -87,7 +300,25 @@ class ModelManager:
         Adjust if your models use different features
         """
         try:
-            logger.debug(f"🔮 Predict called with NDVI={ndvi}, Chlorophyll={chlorophyll}")
+            logger.debug("🔮 Predict called with NDVI=%s, Chlorophyll=%s", ndvi, chlorophyll)
+            
+            bundle = self._bundle
+            
+            cache_key = None
+            if self.cache.enabled:
+                cache_key = self.cache.make_key(bundle.version, {
+                    'ndvi': ndvi,
+                    'chlorophyll': chlorophyll,
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'day_of_year': day_of_year
+                })
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    CACHE_LOOKUPS.labels('hit').inc()
+                    logger.debug("⚡ Prediction cache hit")
+                    return self._copy_result(cached)
+                CACHE_LOOKUPS.labels('miss').inc()
             
             # Prepare features - MATCH YOUR TRAINING DATA
             features = [ndvi, chlorophyll]
@@ -99,55 +330,39 @@ class ModelManager:
             if day_of_year is not None:
                 features.append(day_of_year)
             
-            logger.debug(f"📊 Features prepared: {features}")
+            logger.debug("📊 Features prepared: %s", features)
             
             # Convert to numpy array
             X = np.array([features])
-            logger.debug(f"📊 Feature shape: {X.shape}")
+            logger.debug("📊 Feature shape: %s", X.shape)
             
-            # Scale features
-            try:
-                X_scaled = self.scalers['features'].transform(X)
-                logger.debug(f"✅ Features scaled: {X_scaled}")
-            except Exception as e:
-                logger.error(f"❌ Feature scaling failed: {str(e)}")
-                logger.error(f"❌ Scaler type: {type(self.scalers['features'])}")
-                raise
+            # Scale features and make predictions
+            X_scaled, predictions, confidence = self._predict_features(bundle, X)
+            nitrogen_pred = float(predictions['nitrogen'][0])
+            phosphorus_pred = float(predictions['phosphorus'][0])
+            potassium_pred = float(predictions['potassium'][0])
             
-            # Make predictions
-            nitrogen_pred = float(self.models['nitrogen'].predict(X_scaled))
-            phosphorus_pred = float(self.models['phosphorus'].predict(X_scaled))
-            potassium_pred = float(self.models['potassium'].predict(X_scaled))
-            
-            logger.info(f"✅ Predictions: N={nitrogen_pred:.2f}, P={phosphorus_pred:.2f}, K={potassium_pred:.2f}")
+            logger.debug("✅ Predictions: N=%.2f, P=%.2f, K=%.2f", nitrogen_pred, phosphorus_pred, potassium_pred)
             
             # Classify status
-            n_status = self._classify_nutrient(nitrogen_pred, 'nitrogen')
-            p_status = self._classify_nutrient(phosphorus_pred, 'phosphorus')
-            k_status = self._classify_nutrient(potassium_pred, 'potassium')
+            with stage_timer('classify'):
+                status, overall_status = self._classify(bundle, predictions, X, X_scaled)
+            n_status = status['nitrogen'][0]
+            p_status = status['phosphorus'][0]
+            k_status = status['potassium'][0]
             
-            logger.info(f"✅ Status: N={n_status}, P={p_status}, K={k_status}")
+            logger.debug("✅ Status: N=%s, P=%s, K=%s", n_status, p_status, k_status)
             
-            return {
-                'success': True,
-                'predictions': {
-                    'nitrogen': nitrogen_pred,
-                    'phosphorus': phosphorus_pred,
-                    'potassium': potassium_pred
-                },
-                'status': {
-                    'nitrogen': n_status,
-                    'phosphorus': p_status,
-                    'potassium': k_status
-                },
-                'confidence': {
-                    'nitrogen': 0.85,
-                    'phosphorus': 0.85,
-                    'potassium': 0.85
-                }
-            }
+            result = self._row_result(bundle, 0, predictions, status, confidence, overall_status)
+            
+            if cache_key is not None:
+                self.cache.put(cache_key, self._copy_result(result))
+            
+            PREDICTED_ROWS.labels('single').inc()
+            return result
         
         except Exception as e:
+            PREDICTION_ERRORS.labels('single').inc()
             error_msg = f"❌ Prediction failed: {str(e)}"
             logger.error(error_msg)
             return {
@@ -155,34 +370,374 @@ class ModelManager:
                 'error': error_msg
             }
     
-    def _classify_nutrient(self, value, nutrient_type):
-        """Classify nutrient level"""
+    def predict_many(self, inputs):
+        """
+        Results of `predict` for many single-row inputs in one vectorized pass
         
-        # CRITICAL: ADJUST THESE THRESHOLDS FOR YOUR DATA!
-        thresholds = {
-            'nitrogen': {'low': 50, 'high': 150},
-            'phosphorus': {'low': 20, 'high': 40},
-            'potassium': {'low': 150, 'high': 300}
+        `inputs` are dicts with predict()'s keyword arguments, all giving
+        the same optional features. Runs one scaler transform and one
+        call per model for all rows; results are stored in the cache but
+        not looked up. Raises on failure (callers retry rows one by one
+        through `predict`, which reports the errors).
+        """
+        bundle = self._bundle
+        X = np.array([[value for value in row.values() if value is not None] for row in inputs], dtype=float)
+        
+        X_scaled, predictions, confidence = self._predict_features(bundle, X)
+        with stage_timer('classify'):
+            status, overall_status = self._classify(bundle, predictions, X, X_scaled)
+        
+        results = [
+            self._row_result(bundle, i, predictions, status, confidence, overall_status)
+            for i in range(len(inputs))
+        ]
+        if self.cache.enabled:
+            for row, result in zip(inputs, results):
+                self.cache.put(self.cache.make_key(bundle.version, row), self._copy_result(result))
+        
+        PREDICTED_ROWS.labels('single').inc(len(inputs))
+        return results
+    
+    def cached_prediction(self, inputs):
+        """Cached `predict` result for a dict of its keyword arguments, or None"""
+        if not self.cache.enabled:
+            return None
+        cached = self.cache.get(self.cache.make_key(self._bundle.version, inputs))
+        if cached is None:
+            CACHE_LOOKUPS.labels('miss').inc()
+            return None
+        CACHE_LOOKUPS.labels('hit').inc()
+        return self._copy_result(cached)
+    
+    @staticmethod
+    def _row_result(bundle, i, predictions, status, confidence, overall_status):
+        """`predict` result dict for row i of vectorized predictions"""
+        result = {
+            'success': True,
+            'predictions': {name: float(predictions[name][i]) for name in NUTRIENTS},
+            'status': {name: status[name][i] for name in NUTRIENTS},
+            'confidence': {name: round(float(confidence[name][i]), 4) for name in NUTRIENTS},
+            'model_version': bundle.version
         }
+        if overall_status is not None:
+            result['overall_status'] = overall_status[i]
+        return result
+    
+    def _build_predictors(self, models, n_features):
+        """
+        Build the native tree backends and confidence estimators for a bundle
         
-        if nutrient_type not in thresholds:
-            return 'Unknown'
+        Each one is checked against the original model's predictions; on a
+        mismatch or unsupported model it is skipped with a warning and the
+        model is served as before.
+        """
+        predictors = dict(models)
+        estimators = {}
+        backends = {name: 'library' for name in models}
+        compiled = {}
+        
+        for name in self.native_models:
+            try:
+                compiled[name] = compile_model(models[name])
+                max_error = verify_compiled(compiled[name], models[name], n_features)
+            except (UnsupportedModel, AssertionError) as e:
+                compiled.pop(name, None)
+                logger.warning(f"⚠️ Native backend disabled for {name}: {str(e)}")
+                continue
+            
+            predictors[name] = NativeTreePredictor(models[name], compiled[name], self.native_max_rows.get(name, 0))
+            backends[name] = 'native'
+            logger.info(
+                f"⚡ Native tree backend for {name}: {compiled[name].n_trees} trees, "
+                f"depth {compiled[name].max_depth}, max error {max_error:.2e}"
+            )
+        
+        if self.confidence_mode != 'model':
+            return predictors, estimators, backends
+        
+        # Confidence uses the same native-or-library choice as plain predictions
+        for name, model in models.items():
+            native_max_rows = self.native_max_rows.get(name, 0) if name in compiled else 0
+            try:
+                estimator = build_spread_estimator(model, n_features, compiled.get(name), native_max_rows)
+                verify_compiled(estimator, model, n_features)
+            except (UnsupportedModel, AssertionError) as e:
+                logger.warning(f"⚠️ Fixed confidence for {name}: {str(e)}")
+                continue
+            
+            estimators[name] = estimator
+            logger.info(f"🎯 Confidence for {name}: {estimator.kind}, scale {estimator.scale:.4g}")
+        
+        return predictors, estimators, backends
+    
+    def _predict_features(self, bundle, X, with_confidence=True):
+        """
+        (X_scaled, predictions, confidence) for a matrix of raw features
+        
+        Rows inside the lookup grid are interpolated from it; the others
+        are scaled and go through the models. X_scaled is None unless
+        every row was scaled.
+        """
+        grid = bundle.grid
+        inside = grid.contains(X) if grid is not None else None
+        if inside is None or not inside.any():
+            X_scaled = self._scale(bundle, X)
+            return (X_scaled, *self._predict_nutrients(bundle, X_scaled, with_confidence))
+        
+        with stage_timer('grid'):
+            if inside.all():
+                predictions, confidence = grid.predict(X)
+                return None, predictions, confidence if with_confidence else {}
+            predictions, confidence = grid.predict(X[inside])
+        
+        # Out-of-grid rows fall back to the models
+        outside_predictions, outside_confidence = self._predict_nutrients(
+            bundle, self._scale(bundle, X[~inside]), with_confidence
+        )
+        merged_predictions, merged_confidence = {}, {}
+        for name in NUTRIENTS:
+            merged_predictions[name] = np.empty(len(X))
+            merged_predictions[name][inside] = predictions[name]
+            merged_predictions[name][~inside] = outside_predictions[name]
+            if with_confidence:
+                merged_confidence[name] = np.empty(len(X))
+                merged_confidence[name][inside] = confidence[name]
+                merged_confidence[name][~inside] = outside_confidence[name]
+        return None, merged_predictions, merged_confidence
+    
+    def _scale(self, bundle, X):
+        try:
+            with stage_timer('scale'):
+                X_scaled = bundle.scalers['features'].transform(X)
+            logger.debug("✅ Features scaled: %s", X_scaled)
+            return X_scaled
+        except Exception as e:
+            logger.error(f"❌ Feature scaling failed: {str(e)}")
+            logger.error(f"❌ Scaler type: {type(bundle.scalers['features'])}")
+            raise
+    
+    def _load_grid(self, bundle_dir, version, feature_names):
+        """Lookup grid saved beside the models, or None if missing or built for other models"""
+        from app.lookup_grid import LookupGrid, LookupGridError
+        
+        try:
+            grid = LookupGrid.load(bundle_dir)
+        except (LookupGridError, OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Lookup grid not used: {str(e)}")
+            return None
+        if grid.meta.get('model_version') != version or grid.feature_names != feature_names:
+            logger.warning(f"⚠️ Lookup grid not used: built for {grid.meta.get('model_version')}, models are {version}")
+            return None
+        
+        error = grid.meta.get('error', {})
+        logger.info(
+            f"🧮 Lookup grid {'x'.join(map(str, grid.meta['shape']))} enabled, max abs error "
+            + ', '.join(f"{name} {error[name]['max_abs_error']:g}" for name in NUTRIENTS if name in error)
+        )
+        return grid
+    
+    def _predict_nutrients(self, bundle, X_scaled, with_confidence=True):
+        """Predictions and confidences per nutrient, one pass per model"""
+        n_rows = X_scaled.shape[0]
+        predictions = {}
+        confidence = {}
+        
+        for name in NUTRIENTS:
+            start = time.perf_counter()
+            estimator = bundle.estimators.get(name)
+            if not with_confidence:
+                values = bundle.predictors[name].predict(X_scaled)
+            elif estimator is not None:
+                values, confidence[name] = estimator.confidence(X_scaled)
+            else:
+                values = bundle.predictors[name].predict(X_scaled)
+                confidence[name] = np.full(n_rows, FALLBACK_CONFIDENCE)
+            observe_model(name, time.perf_counter() - start)
+            predictions[name] = np.asarray(values, dtype=float).reshape(n_rows)
+        
+        return predictions, confidence
+    
+    def _limit_threads(self, obj):
+        """Cap predict-time threads, e.g. one per gunicorn worker instead of one per core"""
+        if type(obj).__name__.startswith('XGB'):
+            obj.set_params(n_jobs=self.n_jobs)
+        elif hasattr(obj, 'n_jobs'):
+            obj.n_jobs = self.n_jobs
+    
+    def _load_file(self, path):
+        """Load one pickle; returns (object, seconds, resident memory delta)"""
+        rss_before = _resident_memory()
+        start = time.perf_counter()
+        # mmap_mode maps NumPy arrays (SVR support vectors, scaler stats)
+        # read-only from the file instead of copying them into the heap
+        obj = joblib.load(path, mmap_mode=self.mmap_mode)
+        return obj, time.perf_counter() - start, _resident_memory() - rss_before
+    
+    def _try_load_file(self, path):
+        """_load_file, returning an ImportError instead of raising it"""
+        try:
+            return self._load_file(path)
+        except ImportError as e:
+            logger.debug("🔄 Retrying %s after the other loads: %s", path.name, e)
+            return e
+    
+    @staticmethod
+    def _copy_result(result):
+        """Copy a result so callers cannot mutate a cached entry"""
+        return {
+            key: dict(value) if isinstance(value, dict) else value
+            for key, value in result.items()
+        }
+    
+    @staticmethod
+    def _fingerprint(bundle_dir, filenames):
+        """Short model version derived from file names, sizes and mtimes"""
+        digest = hashlib.sha1()
+        for filename in sorted(filenames):
+            stat = (bundle_dir / filename).stat()
+            digest.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return digest.hexdigest()[:12]
+    
+    def predict_batch(self, X, with_confidence=True):
+        """
+        Make nutrient predictions for a whole feature matrix
+        
+        X has one row per sample with columns in `self.feature_names` order.
+        Runs one scaler transform and one predict call per model, so the
+        per-call overhead is paid once per batch instead of once per row.
+        Returns arrays keyed by nutrient; raises on failure. With
+        with_confidence=False only the plain predict calls run and
+        'confidence' is None.
+        """
+        bundle = self._bundle
+        X = np.asarray(X, dtype=float)
+        n_rows = X.shape[0]
+        
+        if n_rows == 0:
+            empty = {name: np.empty(0) for name in NUTRIENTS}
+            return {
+                'predictions': empty,
+                'status': {name: np.empty(0, dtype=object) for name in NUTRIENTS},
+                'overall_status': np.empty(0, dtype=object) if bundle.status_model is not None else None,
+                'confidence': dict(empty),
+                'model_version': bundle.version
+            }
+        
+        try:
+            X_scaled, predictions, confidence = self._predict_features(bundle, X, with_confidence)
+            
+            with stage_timer('classify'):
+                status, overall_status = self._classify(bundle, predictions, X, X_scaled)
+        except Exception:
+            PREDICTION_ERRORS.labels('batch').inc()
+            raise
+        
+        PREDICTED_ROWS.labels('batch').inc(n_rows)
+        logger.info("✅ Batch predictions: %d rows", n_rows)
+        
+        return {
+            'predictions': predictions,
+            'status': status,
+            'overall_status': overall_status,
+            'confidence': (
+                {name: np.round(values, 4) for name, values in confidence.items()} if with_confidence else None
+            ),
+            'model_version': bundle.version
+        }
+    
+    def _classify(self, bundle, predictions, X, X_scaled):
+        """
+        Status arrays per nutrient plus the classifier's overall status
         
-        thresh = thresholds[nutrient_type]
+        Per-nutrient status is threshold-binned, using regional bands for
+        rows with a latitude/longitude; overall status is None unless the
+        status classifier is enabled.
+        """
+        coordinates = {}
+        for name in ('latitude', 'longitude'):
+            if name in bundle.feature_names and X.shape[1] == len(bundle.feature_names):
+                coordinates[name] = X[:, bundle.feature_names.index(name)]
         
-        if value < thresh['low']:
-            return 'Deficient'
-        elif value > thresh['high']:
-            return 'Excess'
-        else:
-            return 'Adequate'
+        status = self.thresholds.classify(predictions, **coordinates)
+        overall_status = None
+        if bundle.status_model is not None:
+            if X_scaled is None:
+                X_scaled = bundle.scalers['features'].transform(X)
+            overall_status = bundle.status_model.predict(X_scaled)
+        return status, overall_status
+
+def _resident_memory():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # Peak rather than current RSS (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
 
 # Global instance
 _model_manager = None
+_model_manager_lock = threading.Lock()
 
 def get_model_manager():
     """Get or create model manager singleton"""
     global _model_manager
     if _model_manager is None:
-        _model_manager = ModelManager('trained_models')
+        with _model_manager_lock:
+            if _model_manager is None:
+                _model_manager = _create_model_manager()
+    else:
+        # Follow version switches made by other worker processes
+        _model_manager.refresh_if_changed()
     return _model_manager
+
+def get_loaded_model_manager():
+    """Model manager if models are already loaded, else None (never triggers loading)"""
+    return _model_manager
+
+def model_manager_from_env(models_path=DEFAULT_MODELS_PATH, cache=None):
+    """
+    ModelManager with the model settings of the environment
+    
+    Shared by the API and the survey job workers (spawned processes
+    inherit the environment), so both classify and score alike.
+    """
+    n_jobs = os.environ.get('MODEL_N_JOBS')
+    return ModelManager(
+        models_path,
+        cache=cache,
+        parallel_load=os.environ.get('MODEL_LOAD_PARALLEL', 'true').lower() == 'true',
+        mmap_mode=os.environ.get('MODEL_MMAP_MODE', 'r'),
+        native_models=[name for name in os.environ.get('NATIVE_TREE_MODELS', '').split(',') if name],
+        native_max_rows=json.loads(os.environ.get('NATIVE_TREE_MAX_ROWS', '{}')),
+        confidence_mode=os.environ.get('PREDICTION_CONFIDENCE', 'model'),
+        thresholds=StatusThresholds.from_env(),
+        status_classifier=os.environ.get('NUTRIENT_STATUS_CLASSIFIER', 'false').lower() == 'true',
+        n_jobs=int(n_jobs) if n_jobs else None,
+        lookup_grid=os.environ.get('MODEL_LOOKUP_GRID', 'false').lower() == 'true'
+    )
+
+def _create_model_manager():
+    manager = model_manager_from_env(DEFAULT_MODELS_PATH, cache=PredictionCache.from_env())
+    if os.environ.get('MODEL_MICROBATCH', 'false').lower() == 'true':
+        from app.batching import BatchingModelManager
+        manager = BatchingModelManager(
+            manager,
+            max_batch_size=int(os.environ.get('MODEL_MICROBATCH_MAX_SIZE', 32)),
+            max_wait=float(os.environ.get('MODEL_MICROBATCH_WAIT_MS', 0)) / 1000
+        )
+    return manager
+
+def preload_models():
+    """
+    Load models eagerly, e.g. in the gunicorn master before workers fork
+    
+    Freezing the GC afterwards keeps the collector from touching the
+    model objects, so forked workers share their pages copy-on-write.
+    """
+    manager = get_model_manager()
+    gc.collect()
+    gc.freeze()
+    return manager
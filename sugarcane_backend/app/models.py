@@ -4,8 +4,48 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+def prediction_dict(p):
+    """JSON layout of a prediction: a Prediction or any row with its column attributes"""
+    try:
+        return {
+            'id': p.id,
+            'inputs': {
+                'ndvi': round(float(p.ndvi), 4),
+                'chlorophyll': round(float(p.chlorophyll), 2),
+                'latitude': round(float(p.latitude), 4) if p.latitude else None,
+                'longitude': round(float(p.longitude), 4) if p.longitude else None,
+                'day_of_year': int(p.day_of_year) if p.day_of_year else None
+            },
+            'predictions': {
+                'nitrogen': round(float(p.nitrogen), 2),
+                'phosphorus': round(float(p.phosphorus), 2),
+                'potassium': round(float(p.potassium), 2)
+            },
+            'status': {
+                'nitrogen': p.nitrogen_status,
+                'phosphorus': p.phosphorus_status,
+                'potassium': p.potassium_status
+            },
+            'confidence': {
+                'nitrogen': round(float(p.nitrogen_confidence), 4) if p.nitrogen_confidence else None,
+                'phosphorus': round(float(p.phosphorus_confidence), 4) if p.phosphorus_confidence else None,
+                'potassium': round(float(p.potassium_confidence), 4) if p.potassium_confidence else None
+            },
+            'created_at': p.created_at.isoformat(),
+            'field_id': p.field_id,
+            'notes': p.notes,
+            'model_version': p.model_version
+        }
+    except Exception as e:
+        logger.error(f"❌ Error converting prediction to dict: {str(e)}")
+        raise
+
 class Prediction(db.Model):
     __tablename__ = 'predictions'
+    __table_args__ = (
+        # Field-filtered history and statistics, newest first
+        db.Index('ix_predictions_field_id_created_at', 'field_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -14,6 +54,8 @@ class Prediction(db.Model):
     chlorophyll = db.Column(db.Float, nullable=False)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    # Geohash of (latitude, longitude) for area queries, see app/spatial.py
+    geohash = db.Column(db.String(12), nullable=True, index=True)
     day_of_year = db.Column(db.Integer, nullable=True)
     
     # Predictions
@@ -32,41 +74,105 @@ class Prediction(db.Model):
     potassium_confidence = db.Column(db.Float, nullable=True)
     
     # Metadata
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     field_id = db.Column(db.String(100), nullable=True)
     notes = db.Column(db.Text, nullable=True)
+    model_version = db.Column(db.String(64), nullable=True)
     
     def to_dict(self):
         """Convert prediction to JSON-serializable dict"""
-        try:
-            return {
-                'id': self.id,
-                'inputs': {
-                    'ndvi': round(float(self.ndvi), 4),
-                    'chlorophyll': round(float(self.chlorophyll), 2),
-                    'latitude': round(float(self.latitude), 4) if self.latitude else None,
-                    'longitude': round(float(self.longitude), 4) if self.longitude else None,
-                    'day_of_year': int(self.day_of_year) if self.day_of_year else None
-                },
-                'predictions': {
-                    'nitrogen': round(float(self.nitrogen), 2),
-                    'phosphorus': round(float(self.phosphorus), 2),
-                    'potassium': round(float(self.potassium), 2)
-                },
-                'status': {
-                    'nitrogen': self.nitrogen_status,
-                    'phosphorus': self.phosphorus_status,
-                    'potassium': self.potassium_status
-                },
-                'confidence': {
-                    'nitrogen': round(float(self.nitrogen_confidence), 4) if self.nitrogen_confidence else None,
-                    'phosphorus': round(float(self.phosphorus_confidence), 4) if self.phosphorus_confidence else None,
-                    'potassium': round(float(self.potassium_confidence), 4) if self.potassium_confidence else None
-                },
-                'created_at': self.created_at.isoformat(),
-                'field_id': self.field_id,
-                'notes': self.notes
-            }
-        except Exception as e:
-            logger.error(f"❌ Error converting prediction to dict: {str(e)}")
-            raise
+        return prediction_dict(self)
+
+class FieldDailyRollup(db.Model):
+    """
+    Per-field, per-day prediction aggregates, updated with every write
+    
+    Column names match the labels of app.aggregates.nutrient_columns, so
+    rollup rows (or sums of them) go straight into summarize().
+    """
+    __tablename__ = 'field_daily_rollups'
+    
+    field_id = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    nitrogen_sum = db.Column(db.Float, nullable=False, default=0.0)
+    nitrogen_sumsq = db.Column(db.Float, nullable=False, default=0.0)
+    nitrogen_min = db.Column(db.Float, nullable=True)
+    nitrogen_max = db.Column(db.Float, nullable=True)
+    nitrogen_deficient = db.Column(db.Integer, nullable=False, default=0)
+    nitrogen_adequate = db.Column(db.Integer, nullable=False, default=0)
+    nitrogen_excess = db.Column(db.Integer, nullable=False, default=0)
+    
+    phosphorus_sum = db.Column(db.Float, nullable=False, default=0.0)
+    phosphorus_sumsq = db.Column(db.Float, nullable=False, default=0.0)
+    phosphorus_min = db.Column(db.Float, nullable=True)
+    phosphorus_max = db.Column(db.Float, nullable=True)
+    phosphorus_deficient = db.Column(db.Integer, nullable=False, default=0)
+    phosphorus_adequate = db.Column(db.Integer, nullable=False, default=0)
+    phosphorus_excess = db.Column(db.Integer, nullable=False, default=0)
+    
+    potassium_sum = db.Column(db.Float, nullable=False, default=0.0)
+    potassium_sumsq = db.Column(db.Float, nullable=False, default=0.0)
+    potassium_min = db.Column(db.Float, nullable=True)
+    potassium_max = db.Column(db.Float, nullable=True)
+    potassium_deficient = db.Column(db.Integer, nullable=False, default=0)
+    potassium_adequate = db.Column(db.Integer, nullable=False, default=0)
+    potassium_excess = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    """Asynchronous prediction job for a survey file upload"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    
+    # Input and output locations
+    filename = db.Column(db.String(255), nullable=True)
+    file_format = db.Column(db.String(20), nullable=False)
+    input_path = db.Column(db.Text, nullable=False)
+    output_dir = db.Column(db.Text, nullable=False)
+    
+    # Progress
+    total_rows = db.Column(db.Integer, nullable=True)
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    failed_rows = db.Column(db.Integer, nullable=False, default=0)
+    chunks_done = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    
+    # Timing
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    
+    # Worker process running the job, as host:pid
+    worker = db.Column(db.String(255), nullable=True)
+    
+    def to_dict(self):
+        """Convert job to JSON-serializable dict with progress and throughput"""
+        end = self.finished_at or self.heartbeat_at
+        elapsed = (end - self.started_at).total_seconds() if self.started_at and end else None
+        throughput = round(self.processed_rows / elapsed, 1) if elapsed else None
+        progress = None
+        if self.total_rows:
+            progress = round(min(self.processed_rows / self.total_rows, 1.0), 4)
+        elif self.status == 'completed':
+            progress = 1.0
+        
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'format': self.file_format,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'failed_rows': self.failed_rows,
+            'progress': progress,
+            'elapsed_seconds': round(elapsed, 3) if elapsed is not None else None,
+            'rows_per_second': throughput,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,323 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import make_url
+from app.metrics import DB_WRITE_ERRORS, DB_WRITE_ROWS, DB_WRITE_SECONDS
+from app.rollups import apply_rollups
+from app.spatial import encode_geohash, encode_geohashes
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new SQLite connection (see configure_sqlite)
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000
+}
+
+def configure_sqlite(engine, pragmas):
+    """Enable WAL mode and tuned pragmas on every SQLite connection"""
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    
+    logger.info(f"✅ SQLite pragmas enabled: {pragmas}")
+
+def is_sqlite_file(url):
+    """True for SQLite URLs that point at a database file (not :memory:)"""
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def engine_options(config):
+    """Connection pool settings for server databases; SQLite keeps SQLAlchemy's defaults"""
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+
+def writer_engine_options(url):
+    """Options for an engine that only writes: a single pooled connection"""
+    if make_url(url).get_backend_name() != 'sqlite':
+        return {'pool_size': 1, 'max_overflow': 0, 'pool_pre_ping': True}
+    return {'pool_size': 1, 'max_overflow': 0} if is_sqlite_file(url) else {}
+
+def create_writer_engine(engine, pragmas):
+    """
+    Engine for buffered prediction writes
+    
+    SQLite allows one writer at a time, so writes go through their own
+    single connection instead of competing with request threads for the
+    shared pool; readers keep running alongside it in WAL mode. Server
+    databases take concurrent writers and share the app's pool.
+    """
+    if not is_sqlite_file(engine.url):
+        return engine
+    writer = create_engine(engine.url, **writer_engine_options(engine.url))
+    configure_sqlite(writer, pragmas)
+    return writer
+
+def prediction_row(inputs, result, field_id, notes, created_at, geohash=None):
+    """Build a `predictions` table row from model inputs and a prediction result"""
+    if geohash is None:
+        geohash = encode_geohash(inputs.get('latitude'), inputs.get('longitude'))
+    row = {
+        'ndvi': inputs['ndvi'],
+        'chlorophyll': inputs['chlorophyll'],
+        'latitude': inputs.get('latitude'),
+        'longitude': inputs.get('longitude'),
+        'geohash': geohash,
+        'day_of_year': inputs.get('day_of_year'),
+        'created_at': created_at,
+        'field_id': field_id,
+        'notes': notes,
+        'model_version': result.get('model_version')
+    }
+    for name, value in result['predictions'].items():
+        row[name] = value
+        row[f'{name}_status'] = result['status'][name]
+        row[f'{name}_confidence'] = result['confidence'][name]
+    return row
+
+def prediction_rows(feature_names, X, result, field_ids, notes, created_at):
+    """Build table rows for a vectorized batch result (lists keyed by nutrient)"""
+    features = {name: X[:, col].tolist() for col, name in enumerate(feature_names)}
+    geohashes = [None] * len(field_ids)
+    if 'latitude' in feature_names and 'longitude' in feature_names:
+        geohashes = encode_geohashes(
+            X[:, feature_names.index('latitude')], X[:, feature_names.index('longitude')]
+        )
+    rows = []
+    for i in range(len(field_ids)):
+        inputs = {name: values[i] for name, values in features.items()}
+        if inputs.get('day_of_year') is not None:
+            inputs['day_of_year'] = int(inputs['day_of_year'])
+        row_result = {
+            key: {name: values[i] for name, values in result[key].items()}
+            for key in ('predictions', 'status', 'confidence')
+        }
+        row_result['model_version'] = result.get('model_version')
+        rows.append(prediction_row(inputs, row_result, field_ids[i], notes[i], created_at, geohashes[i]))
+    return rows
+
+def insert_predictions(connection, rows):
+    """Insert prediction rows with a single executemany and add them to the rollups"""
+    if rows:
+        connection.execute(insert(_predictions_table()), rows)
+        apply_rollups(connection, rows)
+
+class PredictionWriter:
+    """
+    Buffer prediction rows and write them with bulk inserts
+    
+    Rows passed to `submit` are flushed together by a background thread
+    once `batch_size` rows are waiting or `flush_interval` seconds have
+    passed, so many predictions share one transaction (and one fsync).
+    Callers that need the row id use `submit(row, wait=True)`, which
+    writes the row immediately in its own transaction and returns its id.
+    
+    If a buffered flush fails because the database is unavailable, the
+    rows are kept (up to `max_buffered` rows) for the next flush. Any
+    other failure means a row cannot be stored: the rows are retried one
+    by one and those that still fail are logged and dropped, so one bad
+    row never blocks the others.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 200
+        self.flush_interval = 1.0
+        self.max_buffered = 10000
+        self._engine = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+        self._atexit_registered = False
+        
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Read writer settings from the app config and flush on shutdown"""
+        self.app = app
+        self.batch_size = app.config['PREDICTION_WRITE_BATCH_SIZE']
+        self.flush_interval = app.config['PREDICTION_FLUSH_INTERVAL']
+        self.max_buffered = app.config.get('PREDICTION_BUFFER_MAX_ROWS', self.max_buffered)
+        self._engine = None
+        self._stopped = False
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+    
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app import db
+            with self.app.app_context():
+                self._engine = create_writer_engine(db.engine, self.app.config['SQLITE_PRAGMAS'])
+        return self._engine
+    
+    def submit(self, row, wait=False):
+        """Queue a row for writing; with wait=True write it now and return its id"""
+        if wait:
+            return self._write([row], return_id=True)
+        
+        with self._lock:
+            # A full buffer (the database is falling behind) makes the caller write its own row
+            overflow = len(self._buffer) >= self.max_buffered
+            if not overflow:
+                self._buffer.append(row)
+                full = len(self._buffer) >= self.batch_size
+        
+        if overflow:
+            self._write([row])
+            return None
+        
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+        return None
+    
+    def write(self, rows):
+        """Write rows synchronously in their own transaction"""
+        self._write(rows)
+    
+    def flush(self):
+        """Write all buffered rows now"""
+        self._flush()
+    
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+    
+    def close(self):
+        """Stop the background thread and flush whatever is left"""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        if self.app is not None:
+            try:
+                self._flush()
+            except Exception as e:
+                logger.error(f"❌ Final prediction flush failed: {str(e)}")
+    
+    def dispose(self):
+        """Drop the writer's pooled connection, e.g. one inherited across a fork"""
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+    
+    def _ensure_thread(self):
+        # Threads do not survive fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            try:
+                self._flush()
+            except Exception as e:
+                logger.error(f"❌ Background prediction flush failed: {str(e)}")
+                time.sleep(self.flush_interval)
+    
+    def _write(self, rows, return_id=False):
+        """Insert rows in one transaction; with return_id, return the id of the last row"""
+        rows = list(rows)
+        if not rows:
+            return None
+        last_row = rows.pop() if return_id else None
+        
+        with self._write_lock:
+            start = time.perf_counter()
+            try:
+                with self.engine.begin() as connection:
+                    insert_predictions(connection, rows)
+                    prediction_id = None
+                    if last_row is not None:
+                        result = connection.execute(insert(_predictions_table()), last_row)
+                        prediction_id = result.inserted_primary_key[0]
+                        apply_rollups(connection, [last_row])
+            except Exception:
+                DB_WRITE_ERRORS.inc()
+                raise
+            
+            elapsed = time.perf_counter() - start
+            written = len(rows) + (last_row is not None)
+            DB_WRITE_SECONDS.observe(elapsed)
+            DB_WRITE_ROWS.inc(written)
+            logger.debug("💾 Wrote %d predictions in %.1f ms", written, elapsed * 1000)
+            return prediction_id
+    
+    def _flush(self):
+        # One flush at a time, so flush() returns only after rows another flush took are written
+        with self._flush_lock:
+            with self._lock:
+                buffered, self._buffer = self._buffer, []
+            if not buffered:
+                return
+            
+            try:
+                self._write(buffered)
+            except OperationalError:
+                # Database unavailable or locked: keep the rows for the next flush
+                self._requeue(buffered)
+                raise
+            except Exception as e:
+                logger.error(f"❌ Bulk write of {len(buffered)} predictions failed, retrying row by row: {str(e)}")
+                self._write_each(buffered)
+    
+    def _write_each(self, rows):
+        """Write rows one at a time, dropping the ones that cannot be stored"""
+        for index, row in enumerate(rows):
+            try:
+                self._write([row])
+            except OperationalError:
+                self._requeue(rows[index:])
+                raise
+            except Exception as e:
+                logger.error(f"❌ Dropped prediction for field {row.get('field_id')!r}: {str(e)}")
+    
+    def _requeue(self, rows):
+        with self._lock:
+            self._buffer[:0] = rows
+            dropped = len(self._buffer) - self.max_buffered
+            if dropped > 0:
+                # Keep the newest rows
+                del self._buffer[:dropped]
+        if dropped > 0:
+            logger.error(f"❌ Prediction buffer full, dropped {dropped} unwritten predictions")
+
+def _predictions_table():
+    from app.models import Prediction
+    return Prediction.__table__
+
+prediction_writer = PredictionWriter()
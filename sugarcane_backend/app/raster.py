@@ -0,0 +1,283 @@
+"""
+Per-pixel nutrient maps from NDVI and chlorophyll rasters
+
+Inputs are two co-registered single-band rasters, either GeoTIFF (read
+with rasterio) or .npy arrays. A .npy input takes its georeferencing
+from a JSON sidecar `<name>.npy.json`:
+    
+    {"geotransform": [lon0, pixel_width, 0, lat0, 0, -pixel_height], "nodata": -9999}
+
+The geotransform uses GDAL's order and must be in degrees (EPSG:4326).
+Arrays are memory-mapped and GeoTIFFs read by window, so the rasters are
+processed tile by tile. Memory stays bounded by the tile size however
+large the estate is. Each pixel gets its latitude/longitude from the
+geotransform (pixel centre). The scaler and the three models run once
+per tile, and predictions go to one float32 raster per nutrient, in the
+input's format. Pixels that are nodata, NaN or fail the /predict range
+checks (NDVI in [0, 1], chlorophyll >= 0) are NaN in the output.
+    
+    python -m app.raster --ndvi ndvi.tif --chlorophyll chl.tif --day-of-year 182 --output-dir maps/
+"""
+
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.ml_models import NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TILE_SIZE = 512
+
+class RasterError(ValueError):
+    """Raised for unreadable, mismatched or ungeoreferenced rasters"""
+
+def pixel_coordinates(geotransform, row_off, col_off, height, width):
+    """Latitude and longitude of pixel centres in a window, each (height, width)"""
+    x0, dx_col, dx_row, y0, dy_col, dy_row = geotransform
+    rows = np.arange(row_off, row_off + height, dtype=np.float64)[:, None] + 0.5
+    cols = np.arange(col_off, col_off + width, dtype=np.float64)[None, :] + 0.5
+    longitude = x0 + cols * dx_col + rows * dx_row
+    latitude = y0 + cols * dy_col + rows * dy_row
+    return latitude, longitude
+
+def iter_windows(shape, tile_size):
+    """(row_off, col_off, height, width) tiles covering a raster in row-major order"""
+    height, width = shape
+    for row_off in range(0, height, tile_size):
+        for col_off in range(0, width, tile_size):
+            yield row_off, col_off, min(tile_size, height - row_off), min(tile_size, width - col_off)
+
+class NpyRaster:
+    """Memory-mapped .npy band with a JSON sidecar for its geotransform"""
+    
+    format = 'npy'
+    
+    def __init__(self, path, geotransform=None, nodata=None):
+        self.path = Path(path)
+        self.array = np.load(self.path, mmap_mode='r')
+        if self.array.ndim != 2:
+            raise RasterError(f'{self.path} must be a 2-D array, got shape {self.array.shape}')
+        
+        sidecar = Path(f'{self.path}.json')
+        meta = json.loads(sidecar.read_text()) if sidecar.exists() else {}
+        self.geotransform = geotransform or meta.get('geotransform')
+        if self.geotransform is None:
+            raise RasterError(f'{self.path} has no geotransform (add {sidecar.name} or pass --geotransform)')
+        self.geotransform = [float(value) for value in self.geotransform]
+        self.nodata = nodata if nodata is not None else meta.get('nodata')
+    
+    @property
+    def shape(self):
+        return self.array.shape
+    
+    def read(self, window):
+        row_off, col_off, height, width = window
+        return np.asarray(self.array[row_off:row_off + height, col_off:col_off + width], dtype=np.float64)
+    
+    def close(self):
+        self.array = None
+
+class GeoTiffRaster:
+    """Single-band GeoTIFF read window by window with rasterio"""
+    
+    format = 'tif'
+    
+    def __init__(self, path, band=1):
+        try:
+            import rasterio
+        except ImportError:
+            raise RasterError('GeoTIFF input requires rasterio')
+        
+        self.path = Path(path)
+        self.band = band
+        self.dataset = rasterio.open(self.path)
+        crs = self.dataset.crs
+        if crs is not None and not crs.is_geographic:
+            raise RasterError(f'{self.path} is in {crs}; reproject to EPSG:4326 first')
+        self.geotransform = list(self.dataset.transform.to_gdal())
+        self.nodata = self.dataset.nodata
+        self.profile = self.dataset.profile
+    
+    @property
+    def shape(self):
+        return self.dataset.height, self.dataset.width
+    
+    def read(self, window):
+        from rasterio.windows import Window
+        row_off, col_off, height, width = window
+        return self.dataset.read(self.band, window=Window(col_off, row_off, width, height)).astype(np.float64)
+    
+    def close(self):
+        self.dataset.close()
+
+def open_raster(path, geotransform=None, nodata=None):
+    suffix = Path(path).suffix.lower()
+    if suffix == '.npy':
+        return NpyRaster(path, geotransform, nodata)
+    if suffix in ('.tif', '.tiff'):
+        return GeoTiffRaster(path)
+    raise RasterError(f'Unsupported raster format: {path} (expected .npy, .tif or .tiff)')
+
+class NpyRasterWriter:
+    """float32 .npy output written in place through a memory map"""
+    
+    def __init__(self, path, shape, geotransform):
+        self.path = Path(path).with_suffix('.npy')
+        self.array = np.lib.format.open_memmap(self.path, mode='w+', dtype=np.float32, shape=shape)
+        Path(f'{self.path}.json').write_text(json.dumps({'geotransform': geotransform}))
+    
+    def write(self, window, values):
+        row_off, col_off, height, width = window
+        self.array[row_off:row_off + height, col_off:col_off + width] = values
+    
+    def close(self):
+        self.array.flush()
+        self.array = None
+
+class GeoTiffRasterWriter:
+    """float32 tiled GeoTIFF output with the input's georeferencing"""
+    
+    def __init__(self, path, profile):
+        import rasterio
+        
+        self.path = Path(path).with_suffix('.tif')
+        profile = dict(profile)
+        profile.update(
+            driver='GTiff', count=1, dtype='float32', nodata=np.nan,
+            tiled=True, blockxsize=256, blockysize=256, compress='deflate'
+        )
+        self.dataset = rasterio.open(self.path, 'w', **profile)
+    
+    def write(self, window, values):
+        from rasterio.windows import Window
+        row_off, col_off, height, width = window
+        self.dataset.write(values.astype(np.float32), 1, window=Window(col_off, row_off, width, height))
+    
+    def close(self):
+        self.dataset.close()
+
+def _valid_pixels(ndvi, chlorophyll, ndvi_nodata, chlorophyll_nodata):
+    """Mask of pixels that have data and pass the /predict range checks"""
+    valid = np.isfinite(ndvi) & np.isfinite(chlorophyll)
+    if ndvi_nodata is not None:
+        valid &= ndvi != ndvi_nodata
+    if chlorophyll_nodata is not None:
+        valid &= chlorophyll != chlorophyll_nodata
+    valid &= (ndvi >= 0) & (ndvi <= 1) & (chlorophyll >= 0)
+    return valid
+
+def predict_raster(manager, ndvi_path, chlorophyll_path, output_dir, day_of_year=None,
+                   tile_size=DEFAULT_TILE_SIZE, geotransform=None, nodata=None, confidence=False):
+    """
+    Write nitrogen/phosphorus/potassium rasters for co-registered NDVI and chlorophyll rasters
+    
+    Returns a summary with the output paths, pixel counts and throughput.
+    Models that also take day_of_year need it as a scalar (acquisition date).
+    """
+    ndvi = open_raster(ndvi_path, geotransform, nodata)
+    chlorophyll = open_raster(chlorophyll_path, geotransform, nodata)
+    shape = ndvi.shape
+    writers = {}
+    try:
+        if ndvi.shape != chlorophyll.shape:
+            raise RasterError(f'Raster shapes differ: NDVI {ndvi.shape}, chlorophyll {chlorophyll.shape}')
+        if not np.allclose(ndvi.geotransform, chlorophyll.geotransform):
+            raise RasterError('NDVI and chlorophyll rasters are not co-registered (geotransforms differ)')
+        
+        feature_names = manager.feature_names
+        if 'day_of_year' in feature_names and day_of_year is None:
+            raise RasterError('The models need day_of_year; pass the acquisition day of year')
+        
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        layers = list(NUTRIENTS)
+        if confidence:
+            layers += [f'{name}_confidence' for name in NUTRIENTS]
+        for layer in layers:
+            if ndvi.format == 'tif':
+                writers[layer] = GeoTiffRasterWriter(output_dir / layer, ndvi.profile)
+            else:
+                writers[layer] = NpyRasterWriter(output_dir / layer, ndvi.shape, ndvi.geotransform)
+        
+        logger.info(f"🗺️ Raster prediction: {ndvi.shape[0]}x{ndvi.shape[1]} pixels, {tile_size}px tiles")
+        start = time.perf_counter()
+        predicted = 0
+        
+        for window in iter_windows(ndvi.shape, tile_size):
+            height, width = window[2], window[3]
+            ndvi_tile = ndvi.read(window)
+            chlorophyll_tile = chlorophyll.read(window)
+            valid = _valid_pixels(ndvi_tile, chlorophyll_tile, ndvi.nodata, chlorophyll.nodata)
+            
+            outputs = {layer: np.full((height, width), np.nan, dtype=np.float32) for layer in layers}
+            n_valid = int(valid.sum())
+            if n_valid:
+                latitude, longitude = pixel_coordinates(ndvi.geotransform, *window)
+                columns = {
+                    'ndvi': ndvi_tile[valid],
+                    'chlorophyll': chlorophyll_tile[valid],
+                    'latitude': latitude[valid],
+                    'longitude': longitude[valid],
+                    'day_of_year': np.full(n_valid, day_of_year if day_of_year is not None else np.nan)
+                }
+                X = np.column_stack([columns[name] for name in feature_names])
+                result = manager.predict_batch(X, with_confidence=confidence)
+                for name in NUTRIENTS:
+                    outputs[name][valid] = result['predictions'][name]
+                    if confidence:
+                        outputs[f'{name}_confidence'][valid] = result['confidence'][name]
+                predicted += n_valid
+            
+            for layer, writer in writers.items():
+                writer.write(window, outputs[layer])
+        
+        elapsed = time.perf_counter() - start
+    finally:
+        for writer in writers.values():
+            writer.close()
+        ndvi.close()
+        chlorophyll.close()
+    
+    total = shape[0] * shape[1]
+    logger.info(f"✅ Raster prediction: {predicted}/{total} pixels in {elapsed:.1f}s")
+    return {
+        'shape': list(shape),
+        'pixels': total,
+        'predicted_pixels': predicted,
+        'seconds': round(elapsed, 3),
+        'pixels_per_second': round(predicted / elapsed, 1) if elapsed else None,
+        'outputs': {layer: str(writer.path) for layer, writer in writers.items()}
+    }
+
+def main():
+    from app.ml_models import get_model_manager
+    
+    parser = argparse.ArgumentParser(description='Predict nutrient maps from NDVI and chlorophyll rasters')
+    parser.add_argument('--ndvi', required=True, help='NDVI raster (.tif or .npy)')
+    parser.add_argument('--chlorophyll', required=True, help='chlorophyll raster (.tif or .npy)')
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--day-of-year', type=int, help='acquisition day of year')
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--geotransform', help='GDAL geotransform for .npy inputs, six comma-separated numbers')
+    parser.add_argument('--nodata', type=float, help='nodata value for .npy inputs')
+    parser.add_argument('--confidence', action='store_true', help='also write per-nutrient confidence rasters')
+    args = parser.parse_args()
+    
+    geotransform = [float(value) for value in args.geotransform.split(',')] if args.geotransform else None
+    if geotransform is not None and len(geotransform) != 6:
+        parser.error('--geotransform needs six numbers')
+    
+    summary = predict_raster(
+        get_model_manager(), args.ndvi, args.chlorophyll, args.output_dir,
+        day_of_year=args.day_of_year, tile_size=args.tile_size,
+        geotransform=geotransform, nodata=args.nodata, confidence=args.confidence
+    )
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Versioned model bundles
+
+Layout inside the models directory:
+    
+    trained_models/
+        ACTIVE                      # name of the active version
+        versions/
+            <version>/
+                manifest.json       # feature order, files and checksums
+                model_nitrogen_rf.pkl
+                ...
+
+Without an ACTIVE pointer the flat *.pkl files in the models directory
+are used, as in earlier releases.
+
+Publish and activate a bundle from the command line:
+    python -m app.registry publish --source path/to/new_models --version 2024-02-01
+    python -m app.registry activate 2024-02-01
+    python -m app.registry list
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Bundle member -> file name
+REQUIRED_FILES = {
+    'nitrogen': 'model_nitrogen_rf.pkl',
+    'phosphorus': 'model_phosphorus_svr.pkl',
+    'potassium': 'model_potassium_xgb.pkl',
+    'features_scaler': 'scaler_features.pkl'
+}
+
+# Bundle members copied and loaded only when present
+OPTIONAL_FILES = {
+    'status_classifier': 'classifier_nutrient_status.pkl'
+}
+
+MANIFEST_NAME = 'manifest.json'
+ACTIVE_POINTER = 'ACTIVE'
+
+# Version names are single directory names: no separators, no leading dot
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+class RegistryError(Exception):
+    """Raised for unknown versions or bundles that fail verification"""
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def check_version(version):
+    """Raise RegistryError unless `version` is a valid version name"""
+    if not isinstance(version, str) or not VERSION_PATTERN.match(version):
+        raise RegistryError(f'Invalid model version name: {version!r}')
+    return version
+
+class ModelRegistry:
+    """Versioned model bundles stored under the models directory"""
+    
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self.versions_dir = self.root / 'versions'
+        self.pointer_path = self.root / ACTIVE_POINTER
+    
+    def list_versions(self):
+        """Manifests of all published versions, oldest first"""
+        if not self.versions_dir.exists():
+            return []
+        manifests = []
+        for manifest_path in self.versions_dir.glob(f'*/{MANIFEST_NAME}'):
+            with open(manifest_path) as f:
+                manifests.append(json.load(f))
+        return sorted(manifests, key=lambda manifest: manifest.get('created_at', ''))
+    
+    def active_version(self):
+        """Version named by the ACTIVE pointer, or None for the legacy flat layout"""
+        try:
+            version = self.pointer_path.read_text().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+    
+    def pointer_mtime(self):
+        try:
+            return self.pointer_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def resolve(self, version):
+        """Return (directory, manifest) of a published version, verifying checksums"""
+        bundle_dir = self.versions_dir / check_version(version)
+        manifest_path = bundle_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            raise RegistryError(f'Unknown model version: {version}')
+        
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        
+        for key, entry in manifest['files'].items():
+            path = bundle_dir / entry['file']
+            if not path.exists():
+                raise RegistryError(f'Model version {version} is missing {entry["file"]}')
+            if file_sha256(path) != entry['sha256']:
+                raise RegistryError(f'Checksum mismatch for {entry["file"]} in version {version}')
+        
+        return bundle_dir, manifest
+    
+    def publish(self, source_dir, version, feature_order=None):
+        """Copy model files into a new version directory with a manifest"""
+        source_dir = Path(source_dir).resolve()
+        target_dir = self.versions_dir / check_version(version)
+        if target_dir.exists():
+            raise RegistryError(f'Model version {version} already exists')
+        
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f'.{version}-', dir=self.versions_dir))
+        try:
+            files = {}
+            for key, filename in REQUIRED_FILES.items():
+                source = source_dir / filename
+                if not source.exists():
+                    raise RegistryError(f'Missing model file: {source}')
+                shutil.copy2(source, staging / filename)
+                files[key] = {'file': filename, 'sha256': file_sha256(staging / filename)}
+            for key, filename in OPTIONAL_FILES.items():
+                source = source_dir / filename
+                if source.exists():
+                    shutil.copy2(source, staging / filename)
+                    files[key] = {'file': filename, 'sha256': file_sha256(staging / filename)}
+            
+            if feature_order is None:
+                import joblib
+                scaler = joblib.load(staging / REQUIRED_FILES['features_scaler'])
+                feature_order = [str(name) for name in getattr(scaler, 'feature_names_in_', [])] or None
+            
+            manifest = {
+                'version': version,
+                'created_at': datetime.utcnow().isoformat(),
+                'feature_order': feature_order,
+                'files': files
+            }
+            with open(staging / MANIFEST_NAME, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            
+            # Rename makes the version visible only once it is complete
+            os.rename(staging, target_dir)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        
+        logger.info(f"📦 Published model version {version}")
+        return manifest
+    
+    def set_active(self, version):
+        """Atomically point ACTIVE at a published version"""
+        self.resolve(version)
+        fd, tmp_path = tempfile.mkstemp(prefix='.ACTIVE-', dir=self.root)
+        with os.fdopen(fd, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, self.pointer_path)
+        logger.info(f"🔀 Active model version set to {version}")
+
+def main():
+    from app.ml_models import DEFAULT_MODELS_PATH
+    
+    parser = argparse.ArgumentParser(description='Manage versioned model bundles')
+    parser.add_argument('--models-path', default=DEFAULT_MODELS_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    publish = commands.add_parser('publish', help='publish a directory of model files as a new version')
+    publish.add_argument('--source', required=True)
+    publish.add_argument('--version', required=True)
+    publish.add_argument('--activate', action='store_true')
+    
+    activate = commands.add_parser('activate', help='make a published version active')
+    activate.add_argument('version')
+    
+    commands.add_parser('list', help='list published versions')
+    
+    args = parser.parse_args()
+    registry = ModelRegistry(args.models_path)
+    
+    if args.command == 'publish':
+        registry.publish(args.source, args.version)
+        if args.activate:
+            registry.set_active(args.version)
+    elif args.command == 'activate':
+        registry.set_active(args.version)
+    else:
+        active = registry.active_version()
+        for manifest in registry.list_versions():
+            marker = '*' if manifest['version'] == active else ' '
+            print(f"{marker} {manifest['version']}  {manifest.get('created_at', '')}")
+
+if __name__ == '__main__':
+    main()
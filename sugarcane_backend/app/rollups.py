@@ -0,0 +1,186 @@
+"""
+Per-field daily rollups of predictions
+
+`field_daily_rollups` holds one row per (field_id, day) with the count,
+sum, sum of squares, min, max and status counts of each nutrient. Every
+prediction write adds its rows' contribution in the same transaction
+(`apply_rollups`), so trend queries read O(days) rollup rows instead of
+scanning `predictions`. Rollups are never reduced, so they keep the
+trends of rows later removed from `predictions`.
+
+Rebuild from the predictions table (e.g. after restoring a backup):
+    python -m app.rollups rebuild
+
+Days before the archive watermark (see app/archive.py) are no longer in
+the table, so a rebuild leaves their rollups alone.
+"""
+
+import argparse
+import logging
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import Date, bindparam, delete, func, insert, select, text
+
+from app.aggregates import STATUSES, bucket_expression, nutrient_columns
+from app.ml_models import NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+# field_id stored for predictions written without one
+UNKNOWN_FIELD = 'UNKNOWN'
+
+STATUS_COLUMNS = {label: label.lower() for label in STATUSES}
+
+def _empty_rollup():
+    rollup = {'count': 0}
+    for name in NUTRIENTS:
+        rollup.update({f'{name}_sum': 0.0, f'{name}_sumsq': 0.0, f'{name}_min': None, f'{name}_max': None})
+        for column in STATUS_COLUMNS.values():
+            rollup[f'{name}_{column}'] = 0
+    return rollup
+
+def rollup_rows(rows):
+    """Aggregate `predictions` rows into rollup rows keyed by (field_id, day)"""
+    rollups = defaultdict(_empty_rollup)
+    for row in rows:
+        created_at = row.get('created_at') or datetime.utcnow()
+        rollup = rollups[(row.get('field_id') or UNKNOWN_FIELD, created_at.date())]
+        rollup['count'] += 1
+        for name in NUTRIENTS:
+            value = row[name]
+            rollup[f'{name}_sum'] += value
+            rollup[f'{name}_sumsq'] += value * value
+            low, high = rollup[f'{name}_min'], rollup[f'{name}_max']
+            rollup[f'{name}_min'] = value if low is None or value < low else low
+            rollup[f'{name}_max'] = value if high is None or value > high else high
+            column = STATUS_COLUMNS.get(row[f'{name}_status'])
+            if column is not None:
+                rollup[f'{name}_{column}'] += 1
+    
+    return [{'field_id': field_id, 'day': day, **rollup} for (field_id, day), rollup in rollups.items()]
+
+@lru_cache(maxsize=None)
+def _upsert(dialect_name):
+    """
+    INSERT that adds to an existing (field_id, day) row instead of failing
+    
+    Written as text: SQLAlchemy does not cache compiled ON CONFLICT
+    statements, and compiling this one on every write took ~1.5 ms.
+    """
+    if dialect_name == 'sqlite':
+        least, greatest = 'MIN', 'MAX'
+    elif dialect_name == 'postgresql':
+        least, greatest = 'LEAST', 'GREATEST'
+    else:
+        raise ValueError(f'Rollups are not supported on {dialect_name}')
+    
+    table = _rollups_table()
+    columns = [column.name for column in table.columns]
+    updates = ['count = field_daily_rollups.count + excluded.count']
+    for name in NUTRIENTS:
+        for suffix in ('sum', 'sumsq', *STATUS_COLUMNS.values()):
+            column = f'{name}_{suffix}'
+            updates.append(f'{column} = field_daily_rollups.{column} + excluded.{column}')
+        # Two-argument MIN/MAX ignore NULL on PostgreSQL but not on SQLite
+        for suffix, pick in (('min', least), ('max', greatest)):
+            column = f'{name}_{suffix}'
+            updates.append(
+                f'{column} = COALESCE({pick}(field_daily_rollups.{column}, excluded.{column}), '
+                f'excluded.{column}, field_daily_rollups.{column})'
+            )
+    
+    return text(
+        f"INSERT INTO field_daily_rollups ({', '.join(columns)}) "
+        f"VALUES ({', '.join(':' + column for column in columns)}) "
+        f"ON CONFLICT (field_id, day) DO UPDATE SET {', '.join(updates)}"
+    ).bindparams(bindparam('day', type_=Date))
+
+def apply_rollups(connection, rows):
+    """Add prediction rows to the rollups, inside the caller's transaction"""
+    rollups = rollup_rows(rows)
+    if rollups:
+        connection.execute(_upsert(connection.dialect.name), rollups)
+
+def rebuild_rollups(connection, since=None):
+    """Recompute rollups from the predictions table, from day `since` on if given; returns rollup rows written"""
+    from app.models import Prediction
+    
+    predictions = Prediction.__table__
+    table = _rollups_table()
+    day = bucket_expression(predictions.c.created_at, 'day', connection.dialect.name).label('day')
+    # Empty and null field ids both count as UNKNOWN_FIELD, as in apply_rollups
+    field_id = func.coalesce(func.nullif(predictions.c.field_id, ''), UNKNOWN_FIELD).label('field_id')
+    statement = (
+        select(field_id, day, *nutrient_columns(predictions))
+        .where(predictions.c.created_at.isnot(None))
+        .group_by(field_id, day)
+    )
+    removed = delete(table)
+    if since is not None:
+        statement = statement.where(predictions.c.created_at >= since)
+        removed = removed.where(table.c.day >= since.date())
+    
+    connection.execute(removed)
+    written = 0
+    result = connection.execute(statement.execution_options(yield_per=5000))
+    for partition in result.partitions():
+        rows = []
+        for row in partition:
+            row = dict(row._mapping)
+            row['day'] = datetime.strptime(row['day'], '%Y-%m-%d').date()
+            rows.append(row)
+        connection.execute(insert(table), rows)
+        written += len(rows)
+    
+    logger.info(f"📈 Rebuilt {written} field/day rollups")
+    return written
+
+def ensure_rollups(engine):
+    """Build rollups once for databases that have predictions but no rollups yet"""
+    from app.models import Prediction
+    
+    table = _rollups_table()
+    with engine.begin() as connection:
+        if connection.execute(select(table.c.field_id).limit(1)).first() is not None:
+            return 0
+        if connection.execute(select(Prediction.id).limit(1)).first() is None:
+            return 0
+        return rebuild_rollups(connection)
+
+def trend_columns(table):
+    """Aggregates over rollup rows, labelled like nutrient_columns"""
+    columns = [func.sum(table.c.count).label('count')]
+    for name in NUTRIENTS:
+        columns.extend([
+            func.sum(table.c[f'{name}_sum']).label(f'{name}_sum'),
+            func.sum(table.c[f'{name}_sumsq']).label(f'{name}_sumsq'),
+            func.min(table.c[f'{name}_min']).label(f'{name}_min'),
+            func.max(table.c[f'{name}_max']).label(f'{name}_max')
+        ])
+        for column in STATUS_COLUMNS.values():
+            columns.append(func.sum(table.c[f'{name}_{column}']).label(f'{name}_{column}'))
+    return columns
+
+def _rollups_table():
+    from app.models import FieldDailyRollup
+    return FieldDailyRollup.__table__
+
+def main():
+    from app import create_app, db
+    from app.archive import cold_storage
+    
+    parser = argparse.ArgumentParser(description='Maintain per-field daily prediction rollups')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('rebuild', help='recompute all rollups from the predictions table')
+    parser.parse_args()
+    
+    app = create_app({'JOB_RECOVER_ON_START': False})
+    with app.app_context():
+        with db.engine.begin() as connection:
+            written = rebuild_rollups(connection, since=cold_storage.watermark())
+    print(f'{written} rollup rows written')
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,81 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from app import db, logger
-from app.models import Prediction
-from app.ml_models import get_model_manager
+from app.models import FieldDailyRollup, Prediction, Job
+from app.jobs import job_runner, iter_output_csv, SURVEY_FORMATS
+from app.export import EXPORT_COLUMNS, EXPORT_FORMATS, encode_export
+from app.formats import FormatError, history_response, negotiate, parse_fields
+from app.aggregates import (
+    BUCKET_OPTIONS, GROUP_BY_OPTIONS, bucket_expression, merge_aggregates, nutrient_columns, summarize
+)
+from app.archive import cold_storage
+from app.persistence import prediction_writer, prediction_row, prediction_rows
+from app.ml_models import get_loaded_model_manager, get_model_manager, NUTRIENTS
+from app.metrics import metrics, observe_stage
+from app.admission import Overloaded, admission
+from app.registry import RegistryError, check_version
+from app.rollups import trend_columns
+from app.spatial import (
+    AreaError, GEOHASH_PRECISION, SMALL_AREA_ROWS, area_conditions, decode_geohash, parse_bbox, radius_bbox
+)
+from app.batch import BatchInputError, load_batch_frame, validate_batch, text_column
+from sqlalchemy import and_, func, or_, select, text
+from collections import namedtuple
 from datetime import datetime, timedelta
+import base64
+import binascii
+import hmac
+import os
+import time
 import traceback
 
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/health', methods=['GET'])
 def health():
-    """Health check - verify backend is running"""
-    logger.info("🏥 Health check called")
-    return jsonify({
-        'status': 'healthy',
-        'message': '✅ Backend is running',
+    """
+    Health check - verify backend is running
+    
+    Reports database connectivity and model readiness without loading
+    models. With ?ready=true (readiness probes) it answers 503 until the
+    models are loaded; otherwise only a database failure gives 503.
+    """
+    logger.debug("🏥 Health check called")
+    
+    try:
+        db.session.execute(text('SELECT 1'))
+        database = 'connected'
+    except Exception as e:
+        logger.error(f"❌ Health check database error: {str(e)}")
+        database = 'unavailable'
+    
+    manager = get_loaded_model_manager()
+    models = {'ready': manager is not None}
+    if manager is not None:
+        models.update({
+            'version': manager.version,
+            'load_seconds': manager.load_report.get('total_seconds')
+        })
+    
+    healthy = database == 'connected'
+    ready = healthy and models['ready']
+    if ready:
+        status, message = 'healthy', '✅ Backend is running'
+    elif healthy:
+        status, message = 'starting', '⏳ Models not loaded yet'
+    else:
+        status, message = 'unhealthy', '❌ Database unavailable'
+    
+    response = {
+        'status': status,
+        'message': message,
         'timestamp': datetime.utcnow().isoformat(),
-        'database': 'connected'
-    }), 200
+        'database': database,
+        'models': models,
+        'worker_pid': os.getpid()
+    }
+    
+    wants_ready = request.args.get('ready', '').lower() in ('1', 'true', 'yes')
+    return jsonify(response), 200 if (ready if wants_ready else healthy) else 503
 
 @api_bp.route('/predict', methods=['POST', 'OPTIONS'])
 def predict():
@@ -32,6 +91,14 @@ def predict():
         "day_of_year": 150,
         "field_id": "FIELD_001"
     }
+    
+    Predictions are written to the database in buffered bulk inserts, so
+    `prediction_id` is null unless the caller sends "return_id": true
+    (or ?return_id=true), which writes the row immediately.
+    
+    Clients over their rate limit get 429, and requests that cannot get
+    an in-flight slot within the queue budget get 503, both with
+    Retry-After (see app/admission.py).
     """
     
     # Handle CORS preflight
@@ -41,8 +108,11 @@ def predict():
     
     try:
         # Get JSON data
+        started = time.perf_counter()
         data = request.get_json()
-        logger.info(f"📥 Received prediction request: {data}")
+        parsed = time.perf_counter()
+        observe_stage('parse', parsed - started)
+        logger.debug("📥 Received prediction request: %s", data)
         
         # Validate required fields
         if not data:
@@ -62,79 +132,81 @@ def predict():
             latitude = float(data['latitude']) if 'latitude' in data else None
             longitude = float(data['longitude']) if 'longitude' in data else None
             day_of_year = int(data['day_of_year']) if 'day_of_year' in data else None
-            field_id = data.get('field_id', 'UNKNOWN')
-            notes = data.get('notes', '')
-            
-            logger.info(f"✅ Input validation passed")
+            field_id = _text_input(data, 'field_id', 'UNKNOWN')
+            notes = _text_input(data, 'notes', '')
             
+            logger.debug("✅ Input validation passed")
+        
         except ValueError as e:
-            logger.error(f"❌ Input validation error: {str(e)}")
+            logger.warning("❌ Input validation error: %s", e)
             return jsonify({'error': f'Invalid input format: {str(e)}'}), 400
         
         # Validate ranges
         if not (0 <= ndvi <= 1):
-            logger.error(f"❌ NDVI out of range: {ndvi}")
+            logger.warning("❌ NDVI out of range: %s", ndvi)
             return jsonify({'error': 'NDVI must be between 0 and 1'}), 400
         
         if chlorophyll < 0:
-            logger.error(f"❌ Chlorophyll negative: {chlorophyll}")
+            logger.warning("❌ Chlorophyll negative: %s", chlorophyll)
             return jsonify({'error': 'Chlorophyll must be non-negative'}), 400
         
-        logger.info(f"✅ All validations passed")
+        observe_stage('validate', time.perf_counter() - parsed)
+        logger.debug("✅ All validations passed")
         
-        # Get model manager and make prediction
+        # Model inference and the database write hold an in-flight slot;
+        # past the queue budget the request is shed with 503
         models = get_model_manager()
-        result = models.predict(ndvi, chlorophyll, latitude, longitude, day_of_year)
-        
-        if not result['success']:
-            logger.error(f"❌ Model prediction failed: {result['error']}")
-            return jsonify({
-                'error': result['error'],
-                'success': False
-            }), 500
-        
-        logger.info(f"✅ Prediction successful")
-        
-        # Save to database
-        try:
-            prediction = Prediction(
-                ndvi=ndvi,
-                chlorophyll=chlorophyll,
-                latitude=latitude,
-                longitude=longitude,
-                day_of_year=day_of_year,
-                nitrogen=result['predictions']['nitrogen'],
-                phosphorus=result['predictions']['phosphorus'],
-                potassium=result['predictions']['potassium'],
-                nitrogen_status=result['status']['nitrogen'],
-                phosphorus_status=result['status']['phosphorus'],
-                potassium_status=result['status']['potassium'],
-                nitrogen_confidence=result['confidence']['nitrogen'],
-                phosphorus_confidence=result['confidence']['phosphorus'],
-                potassium_confidence=result['confidence']['potassium'],
-                field_id=field_id,
-                notes=notes
-            )
+        with admission.slot():
+            result = models.predict(ndvi, chlorophyll, latitude, longitude, day_of_year)
             
-            db.session.add(prediction)
-            db.session.commit()
+            if not result['success']:
+                logger.error(f"❌ Model prediction failed: {result['error']}")
+                return jsonify({
+                    'error': result['error'],
+                    'success': False
+                }), 500
             
-            logger.info(f"✅ Prediction saved to database with ID: {prediction.id}")
+            logger.debug("✅ Prediction successful")
             
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"❌ Database save failed: {str(e)}")
-            logger.error(traceback.format_exc())
-            return jsonify({
-                'error': f'Failed to save prediction: {str(e)}',
-                'success': False
-            }), 500
+            # Save to database (buffered unless the caller needs the id)
+            return_id = _wants_prediction_id(data)
+            created_at = datetime.utcnow()
+            write_started = time.perf_counter()
+            try:
+                row = prediction_row(
+                    {
+                        'ndvi': ndvi,
+                        'chlorophyll': chlorophyll,
+                        'latitude': latitude,
+                        'longitude': longitude,
+                        'day_of_year': day_of_year
+                    },
+                    result,
+                    field_id,
+                    notes,
+                    created_at
+                )
+                prediction_id = prediction_writer.submit(row, wait=return_id)
+                observe_stage('db_write', time.perf_counter() - write_started)
+                
+                if return_id:
+                    logger.debug("✅ Prediction saved to database with ID: %s", prediction_id)
+                else:
+                    logger.debug("✅ Prediction queued for database write")
+            
+            except Exception as e:
+                logger.error(f"❌ Database save failed: {str(e)}")
+                logger.error(traceback.format_exc())
+                return jsonify({
+                    'error': f'Failed to save prediction: {str(e)}',
+                    'success': False
+                }), 500
         
         # Return response
         response = {
             'success': True,
-            'prediction_id': prediction.id,
-            'timestamp': prediction.created_at.isoformat(),
+            'prediction_id': prediction_id,
+            'timestamp': created_at.isoformat(),
             'inputs': {
                 'ndvi': ndvi,
                 'chlorophyll': chlorophyll
@@ -142,12 +214,18 @@ def predict():
             'predictions': result['predictions'],
             'status': result['status'],
             'confidence': result['confidence'],
+            'model_version': result['model_version'],
             'message': '✅ Prediction completed successfully'
         }
+        if 'overall_status' in result:
+            response['overall_status'] = result['overall_status']
         
-        logger.info(f"✅ Returning response: {response}")
+        logger.debug("✅ Returning response: %s", response)
         return jsonify(response), 201
     
+    except Overloaded as e:
+        return admission.reject('overloaded', e.retry_after)
+    
     except Exception as e:
         logger.error(f"❌ Unexpected error: {str(e)}")
         logger.error(traceback.format_exc())
@@ -156,9 +234,382 @@ def predict():
             'success': False
         }), 500
 
+def _text_input(data, name, default):
+    """A text field of the request: strings as is, numbers as text, null/absent as the default"""
+    value = data.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f'{name} must be a string')
+    return str(value)
+
+def _wants_prediction_id(data):
+    """True when the caller asked for the stored prediction id"""
+    flag = request.args.get('return_id', data.get('return_id', False))
+    if isinstance(flag, str):
+        return flag.lower() in ('1', 'true', 'yes')
+    return bool(flag)
+
+@api_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics: request counts, per-stage and per-model latency, DB writes"""
+    return metrics.render()
+
+@api_bp.route('/cache', methods=['GET', 'DELETE', 'OPTIONS'])
+def prediction_cache():
+    """Prediction cache hit/miss counters (GET) or clear the cache (DELETE, admin only)"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    if request.method == 'DELETE':
+        denied = _admin_error()
+        if denied:
+            return denied
+    
+    models = get_model_manager()
+    
+    if request.method == 'DELETE':
+        cleared = models.cache.clear()
+        return jsonify({'success': True, 'cleared': cleared}), 200
+    
+    return jsonify({
+        'success': True,
+        'model_version': models.version,
+        'cache': models.cache.stats()
+    }), 200
+
+def _admin_error():
+    """
+    Error response for admin requests that may not proceed, else None
+    
+    Admin endpoints need X-Admin-Token to match ADMIN_TOKEN; without a
+    configured token they are disabled.
+    """
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Admin endpoints are disabled: ADMIN_TOKEN is not set', 'success': False}), 403
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({'error': 'Unauthorized', 'success': False}), 401
+    return None
+
+@api_bp.route('/admin/models', methods=['GET'])
+def list_model_versions():
+    """List published model versions and the one serving requests"""
+    denied = _admin_error()
+    if denied:
+        return denied
+    
+    models = get_model_manager()
+    return jsonify({
+        'success': True,
+        'loaded_version': models.version,
+        'active_version': models.registry.active_version(),
+        'versions': models.registry.list_versions(),
+        'load_report': models.load_report,
+        'status_thresholds': models.thresholds.describe()
+    }), 200
+
+@api_bp.route('/admin/models/activate', methods=['POST'])
+def activate_model_version():
+    """
+    Switch the serving model version without downtime
+    
+    The new bundle is loaded and verified alongside the current one, then
+    swapped in; requests already running finish on the old bundle.
+    """
+    denied = _admin_error()
+    if denied:
+        return denied
+    
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if not version:
+        return jsonify({'error': 'Missing required field: version', 'success': False}), 400
+    try:
+        check_version(version)
+    except RegistryError as e:
+        return jsonify({'error': str(e), 'success': False}), 400
+    
+    models = get_model_manager()
+    previous = models.version
+    try:
+        models.activate(version)
+    except RegistryError as e:
+        logger.error(f"❌ Model activation failed: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 404
+    except Exception as e:
+        logger.error(f"❌ Model activation failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': f'Failed to load version {version}: {str(e)}', 'success': False}), 500
+    
+    logger.info(f"🔀 Model version switched: {previous} -> {models.version}")
+    return jsonify({
+        'success': True,
+        'previous_version': previous,
+        'active_version': models.version
+    }), 200
+
+@api_bp.route('/predict/batch', methods=['POST', 'OPTIONS'])
+def predict_batch():
+    """
+    Make predictions for many samples in one request
+    
+    Accepts a JSON list of samples (same fields as /predict), a
+    {"samples": [...]} object, or a CSV body / "file" upload with those
+    columns. Valid rows run through one vectorized pass of the scaler and
+    each model; invalid rows are reported individually without aborting
+    the batch.
+    
+    Query parameters:
+    - persist (bool, default true): save successful rows to the database
+    """
+    
+    # Handle CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        try:
+            frame = load_batch_frame(request)
+        except BatchInputError as e:
+            logger.error(f"❌ Invalid batch body: {str(e)}")
+            return jsonify({'error': str(e), 'success': False}), 400
+        
+        n_rows = len(frame)
+        max_rows = current_app.config['MAX_BATCH_ROWS']
+        
+        if n_rows == 0:
+            return jsonify({'error': 'No samples provided', 'success': False}), 400
+        
+        if n_rows > max_rows:
+            logger.error(f"❌ Batch too large: {n_rows} rows")
+            return jsonify({
+                'error': f'Batch exceeds maximum of {max_rows} rows',
+                'success': False
+            }), 413
+        
+        persist = request.args.get('persist', 'true').lower() not in ('0', 'false', 'no')
+        
+        models = get_model_manager()
+        X, valid_rows, errors = validate_batch(frame, models.feature_names)
+        
+        logger.info(f"📥 Batch request: {n_rows} rows, {len(valid_rows)} valid, {len(errors)} rejected")
+        
+        # The whole batch holds one in-flight slot: its rows run through one
+        # vectorized pass per model, like a single prediction
+        with admission.slot():
+            try:
+                result = models.predict_batch(X)
+            except Exception as e:
+                logger.error(f"❌ Batch prediction failed: {str(e)}")
+                logger.error(traceback.format_exc())
+                return jsonify({
+                    'error': f'Batch prediction failed: {str(e)}',
+                    'success': False
+                }), 500
+            
+            predictions = {name: result['predictions'][name].tolist() for name in NUTRIENTS}
+            status = {name: result['status'][name].tolist() for name in NUTRIENTS}
+            confidence = {name: result['confidence'][name].tolist() for name in NUTRIENTS}
+            overall_status = result['overall_status'].tolist() if result['overall_status'] is not None else None
+            field_ids = text_column(frame, 'field_id', valid_rows, 'UNKNOWN')
+            
+            # Save all successful rows in a single multi-row insert
+            if persist and len(valid_rows):
+                write_started = time.perf_counter()
+                try:
+                    rows = prediction_rows(
+                        models.feature_names,
+                        X,
+                        {
+                            'predictions': predictions,
+                            'status': status,
+                            'confidence': confidence,
+                            'model_version': result['model_version']
+                        },
+                        field_ids,
+                        text_column(frame, 'notes', valid_rows, ''),
+                        datetime.utcnow()
+                    )
+                    prediction_writer.write(rows)
+                    observe_stage('db_write', time.perf_counter() - write_started)
+                    
+                    logger.info(f"✅ Saved {len(rows)} batch predictions to database")
+                
+                except Exception as e:
+                    logger.error(f"❌ Batch database save failed: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    return jsonify({
+                        'error': f'Failed to save predictions: {str(e)}',
+                        'success': False
+                    }), 500
+        
+        # Per-row results in input order
+        results = [None] * n_rows
+        for i, row_index in enumerate(valid_rows.tolist()):
+            results[row_index] = {
+                'index': row_index,
+                'success': True,
+                'field_id': field_ids[i],
+                'predictions': {name: predictions[name][i] for name in NUTRIENTS},
+                'status': {name: status[name][i] for name in NUTRIENTS},
+                'confidence': {name: confidence[name][i] for name in NUTRIENTS}
+            }
+            if overall_status is not None:
+                results[row_index]['overall_status'] = overall_status[i]
+        for error in errors:
+            results[error['index']] = {
+                'index': error['index'],
+                'success': False,
+                'error': error['error']
+            }
+        
+        return jsonify({
+            'success': True,
+            'count': n_rows,
+            'succeeded': len(valid_rows),
+            'failed': len(errors),
+            'persisted': persist and len(valid_rows) > 0,
+            'model_version': result['model_version'],
+            'results': results
+        }), 200
+    
+    except Overloaded as e:
+        return admission.reject('overloaded', e.retry_after)
+    
+    except Exception as e:
+        logger.error(f"❌ Unexpected error: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'error': f'Internal server error: {str(e)}',
+            'success': False
+        }), 500
+
+@api_bp.route('/jobs', methods=['POST', 'OPTIONS'])
+def create_job():
+    """
+    Queue a survey file for asynchronous prediction
+    
+    Upload a CSV or Parquet file (ndvi, chlorophyll, latitude, longitude,
+    day_of_year, field_id) in the "file" field, or send it as the raw body
+    with ?format=csv|parquet. Returns the job id immediately.
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        if 'file' in request.files:
+            upload = request.files['file']
+            filename = upload.filename
+            stream = upload.stream
+        else:
+            filename = None
+            stream = request.stream
+        
+        file_format = request.args.get('format')
+        if not file_format:
+            if filename and filename.lower().endswith('.parquet'):
+                file_format = 'parquet'
+            elif request.mimetype in ('application/vnd.apache.parquet', 'application/x-parquet'):
+                file_format = 'parquet'
+            else:
+                file_format = 'csv'
+        file_format = file_format.lower()
+        
+        if file_format not in SURVEY_FORMATS:
+            return jsonify({
+                'error': f"Unsupported format: {file_format} (expected {', '.join(SURVEY_FORMATS)})",
+                'success': False
+            }), 400
+        
+        job = job_runner.create_job(stream, filename, file_format)
+        
+        return jsonify({
+            'success': True,
+            'job': job.to_dict(),
+            'status_url': f'/api/jobs/{job.id}',
+            'output_url': f'/api/jobs/{job.id}/output'
+        }), 202
+    
+    except Exception as e:
+        logger.error(f"❌ Job creation failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e), 'success': False}), 500
+
+@api_bp.route('/jobs/<job_id>', methods=['GET', 'OPTIONS'])
+def job_status(job_id):
+    """Get progress and throughput of a prediction job"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'success': False}), 404
+    
+    return jsonify({'success': True, 'job': job.to_dict()}), 200
+
+@api_bp.route('/jobs/<job_id>/output', methods=['GET'])
+def job_output(job_id):
+    """Download the predictions of a completed job as CSV"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'success': False}), 404
+    
+    if job.status != 'completed':
+        return jsonify({
+            'error': f'Job is {job.status}; output is available once it completes',
+            'success': False
+        }), 409
+    
+    return Response(
+        stream_with_context(iter_output_csv(job)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=job-{job.id}.csv'}
+    )
+
+def encode_cursor(created_at, prediction_id):
+    """Opaque keyset cursor for the row a page ended on"""
+    raw = f'{created_at.isoformat()}|{prediction_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, prediction_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(prediction_id)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+
+def _window_start(days):
+    return datetime.utcnow() - timedelta(days=days)
+
+def _prediction_filters(since, field_id=None):
+    """Filter conditions on the predictions table shared by /history, /statistics, /area and /export"""
+    conditions = [Prediction.created_at >= since]
+    if cold_storage.reaches(since):
+        # Archived rows are read from Parquet; rows an interrupted archive run left behind are skipped
+        conditions.append(Prediction.created_at >= cold_storage.watermark())
+    if field_id:
+        conditions.append(Prediction.field_id == field_id)
+    return conditions
+
 @api_bp.route('/history', methods=['GET', 'OPTIONS'])
 def history():
-    """Get prediction history"""
+    """
+    Get prediction history, newest first
+    
+    Pages are keyset-paginated: pass the `next_cursor` of one response as
+    `after` to get the next page. Each page is an index range scan on
+    (created_at, id), so deep pages cost the same as the first. Pages
+    that reach past the archive watermark continue into the Parquet
+    archive (see app/archive.py).
+    
+    `format=json|columnar|msgpack|arrow` (or the Accept header) picks the
+    response format and `fields=id,created_at,nitrogen,...` the columns
+    read and returned; see app/formats.py.
+    """
     if request.method == 'OPTIONS':
         return '', 204
     
@@ -166,28 +617,61 @@ def history():
         limit = request.args.get('limit', 50, type=int)
         days = request.args.get('days', 30, type=int)
         field_id = request.args.get('field_id')
+        after = request.args.get('after')
+        max_limit = current_app.config['MAX_HISTORY_LIMIT']
         
-        logger.info(f"📜 History request: limit={limit}, days={days}")
+        if not 1 <= limit <= max_limit:
+            return jsonify({'error': f'limit must be between 1 and {max_limit}', 'success': False}), 400
         
-        query = Prediction.query
+        try:
+            response_format = negotiate(request.args.get('format'), request.accept_mimetypes)
+            fields = parse_fields(request.args.get('fields'))
+        except FormatError as e:
+            return jsonify({'error': str(e), 'success': False}), e.status
         
-        if field_id:
-            query = query.filter_by(field_id=field_id)
+        logger.info(f"📜 History request: limit={limit}, days={days}, after={after}, format={response_format}")
         
-        start_date = datetime.utcnow() - timedelta(days=days)
-        query = query.filter(Prediction.created_at >= start_date)
+        since = _window_start(days)
+        conditions = _prediction_filters(since, field_id)
         
-        predictions = query.order_by(Prediction.created_at.desc()).limit(limit).all()
+        before = None
+        if after:
+            try:
+                cursor_time, cursor_id = decode_cursor(after)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor', 'success': False}), 400
+            before = (cursor_time, cursor_id)
+            conditions.append(or_(
+                Prediction.created_at < cursor_time,
+                and_(Prediction.created_at == cursor_time, Prediction.id < cursor_id)
+            ))
         
-        logger.info(f"✅ Found {len(predictions)} predictions")
+        # Only the requested columns are read, plus the cursor's (created_at, id)
+        selected = list(dict.fromkeys([*(fields or EXPORT_COLUMNS), 'created_at', 'id']))
+        table = Prediction.__table__
+        result = db.session.execute(
+            select(*[table.c[name] for name in selected])
+            .where(*conditions)
+            .order_by(table.c.created_at.desc(), table.c.id.desc())
+            .limit(limit)
+        )
+        # Plain named tuples: attribute access on SQLAlchemy rows is several times slower
+        record = namedtuple('HistoryRow', selected)
+        rows = [record._make(row) for row in result.tuples()]
         
-        return jsonify({
-            'success': True,
-            'count': len(predictions),
-            'limit': limit,
-            'days': days,
-            'data': [p.to_dict() for p in predictions]
-        }), 200
+        if len(rows) < limit and cold_storage.reaches(since):
+            archived = cold_storage.history(since, limit - len(rows), field_id, before, columns=selected)
+            rows += [record(**row) for row in archived]
+        
+        logger.info(f"✅ Found {len(rows)} predictions")
+        
+        next_cursor = None
+        if rows and len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        
+        meta = {'count': len(rows), 'limit': limit, 'days': days, 'next_cursor': next_cursor}
+        return history_response(current_app, response_format, rows, fields, meta), 200
     
     except Exception as e:
         logger.error(f"❌ History error: {str(e)}")
@@ -195,54 +679,322 @@ def history():
 
 @api_bp.route('/statistics', methods=['GET', 'OPTIONS'])
 def statistics():
-    """Get prediction statistics"""
+    """
+    Get prediction statistics
+    
+    Aggregates are computed in SQL (AVG/MIN/MAX and a sum-of-squares
+    variance), so no prediction rows are loaded into Python. Archived
+    rows in the window are aggregated from Parquet and merged in.
+    
+    Query parameters:
+    - days (int, default 30), field_id
+    - group_by=field_id: one entry per field
+    - bucket=day|week|month: one entry per time bucket (week starts Monday)
+    """
     if request.method == 'OPTIONS':
         return '', 204
     
     try:
         days = request.args.get('days', 30, type=int)
-        start_date = datetime.utcnow() - timedelta(days=days)
+        field_id = request.args.get('field_id')
+        group_by = request.args.get('group_by')
+        bucket = request.args.get('bucket')
         
-        predictions = Prediction.query.filter(
-            Prediction.created_at >= start_date
-        ).all()
+        if group_by and group_by not in GROUP_BY_OPTIONS:
+            return jsonify({
+                'error': f"Unsupported group_by: {group_by} (expected {', '.join(GROUP_BY_OPTIONS)})",
+                'success': False
+            }), 400
         
-        if not predictions:
+        if bucket and bucket not in BUCKET_OPTIONS:
+            return jsonify({
+                'error': f"Unsupported bucket: {bucket} (expected {', '.join(BUCKET_OPTIONS)})",
+                'success': False
+            }), 400
+        
+        table = Prediction.__table__
+        since = _window_start(days)
+        conditions = _prediction_filters(since, field_id)
+        
+        # Archived rows in the window, aggregated per group in one pass over the Parquet files
+        archived = None
+        if cold_storage.reaches(since):
+            names = (['field_id'] if group_by else []) + (['bucket'] if bucket else [])
+            archived = cold_storage.aggregates(since, field_id, names, bucket)
+        
+        overall = db.session.execute(
+            select(*nutrient_columns(table)).where(*conditions)
+        ).one()
+        if archived is not None:
+            overall = dict(overall._mapping)
+            for values in archived.values():
+                overall = merge_aggregates(overall, values)
+        summary = summarize(overall)
+        
+        if not summary['count']:
             return jsonify({
                 'success': True,
                 'count': 0,
                 'message': 'No predictions in this period'
             }), 200
         
-        import numpy as np
+        response = {'success': True, **summary}
         
-        nitrogen_values = [p.nitrogen for p in predictions]
-        phosphorus_values = [p.phosphorus for p in predictions]
-        potassium_values = [p.potassium for p in predictions]
+        if group_by or bucket:
+            keys = []
+            if group_by:
+                keys.append(table.c.field_id.label('field_id'))
+            if bucket:
+                dialect = db.engine.dialect.name
+                keys.append(bucket_expression(table.c.created_at, bucket, dialect).label('bucket'))
+            
+            rows = db.session.execute(
+                select(*keys, *nutrient_columns(table))
+                .where(*conditions)
+                .group_by(*keys)
+                .order_by(*keys)
+            ).all()
+            
+            if archived is None:
+                response['groups'] = [
+                    {**{key.name: row._mapping[key.name] for key in keys}, **summarize(row)}
+                    for row in rows
+                ]
+            else:
+                groups = {}
+                for row in rows:
+                    values = dict(row._mapping)
+                    groups[tuple(values.pop(name) for name in names)] = values
+                for key, values in archived.items():
+                    groups[key] = merge_aggregates(groups.get(key), values)
+                response['groups'] = [
+                    {**dict(zip(names, key)), **summarize(groups[key])}
+                    for key in sorted(groups, key=lambda key: [(value is not None, value) for value in key])
+                ]
+        
+        return jsonify(response), 200
+    
+    except Exception as e:
+        logger.error(f"❌ Statistics error: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 500
+
+@api_bp.route('/trends', methods=['GET', 'OPTIONS'])
+def trends():
+    """
+    Per-field nutrient trend series from the daily rollups
+    
+    Reads `field_daily_rollups` (one row per field per day, kept up to
+    date on every write), so the cost grows with the number of days, not
+    the number of predictions.
+    
+    Query parameters:
+    - field_id: one field (default: all fields combined)
+    - days (int, default 90): whole UTC days, today included
+    - bucket=day|week|month (default day)
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        field_id = request.args.get('field_id')
+        days = request.args.get('days', 90, type=int)
+        bucket = request.args.get('bucket', 'day')
+        
+        if bucket not in BUCKET_OPTIONS:
+            return jsonify({
+                'error': f"Unsupported bucket: {bucket} (expected {', '.join(BUCKET_OPTIONS)})",
+                'success': False
+            }), 400
+        
+        table = FieldDailyRollup.__table__
+        conditions = [table.c.day > (datetime.utcnow() - timedelta(days=days)).date()]
+        if field_id:
+            conditions.append(table.c.field_id == field_id)
+        
+        key = bucket_expression(table.c.day, bucket, db.engine.dialect.name).label('bucket')
+        rows = db.session.execute(
+            select(key, *trend_columns(table)).where(*conditions).group_by(key).order_by(key)
+        ).all()
         
         return jsonify({
             'success': True,
-            'count': len(predictions),
-            'nitrogen': {
-                'mean': round(float(np.mean(nitrogen_values)), 2),
-                'min': round(float(np.min(nitrogen_values)), 2),
-                'max': round(float(np.max(nitrogen_values)), 2),
-                'std': round(float(np.std(nitrogen_values)), 2)
-            },
-            'phosphorus': {
-                'mean': round(float(np.mean(phosphorus_values)), 2),
-                'min': round(float(np.min(phosphorus_values)), 2),
-                'max': round(float(np.max(phosphorus_values)), 2),
-                'std': round(float(np.std(phosphorus_values)), 2)
-            },
-            'potassium': {
-                'mean': round(float(np.mean(potassium_values)), 2),
-                'min': round(float(np.min(potassium_values)), 2),
-                'max': round(float(np.max(potassium_values)), 2),
-                'std': round(float(np.std(potassium_values)), 2)
-            }
+            'field_id': field_id,
+            'days': days,
+            'bucket': bucket,
+            'series': [{'bucket': row.bucket, **summarize(row)} for row in rows]
         }), 200
     
     except Exception as e:
-        logger.error(f"❌ Statistics error: {str(e)}")
+        logger.error(f"❌ Trends error: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 500
+
+# Columns returned per point by /area (compact rows for map views)
+AREA_POINT_COLUMNS = [
+    'id', 'latitude', 'longitude', 'field_id', 'created_at',
+    'nitrogen', 'phosphorus', 'potassium',
+    'nitrogen_status', 'phosphorus_status', 'potassium_status'
+]
+
+@api_bp.route('/area', methods=['GET', 'OPTIONS'])
+def area():
+    """
+    Predictions and aggregated N/P/K inside a bounding box or radius
+    
+    Query parameters:
+    - bbox=min_lat,min_lon,max_lat,max_lon, or lat, lon and radius_km
+    - days (int, default 30), field_id
+    - limit: points returned, newest first (default 1000, 0 for
+      aggregates only, at most MAX_AREA_POINTS)
+    - cell_precision=1..9: also aggregate per geohash cell of that length
+    
+    Rows are located through the indexed geohash column (see
+    app/spatial.py), so only the region's rows are read.
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        days = request.args.get('days', 30, type=int)
+        field_id = request.args.get('field_id')
+        limit = request.args.get('limit', 1000, type=int)
+        cell_precision = request.args.get('cell_precision', type=int)
+        max_points = current_app.config['MAX_AREA_POINTS']
+        
+        try:
+            if request.args.get('bbox'):
+                bbox = parse_bbox(request.args['bbox'])
+                center = radius_km = None
+                region = {'bbox': list(bbox)}
+            else:
+                lat = request.args.get('lat', type=float)
+                lon = request.args.get('lon', type=float)
+                radius_km = request.args.get('radius_km', type=float)
+                if lat is None or lon is None or radius_km is None:
+                    raise AreaError('Pass bbox=min_lat,min_lon,max_lat,max_lon or lat, lon and radius_km')
+                bbox = radius_bbox(lat, lon, radius_km)
+                center = (lat, lon)
+                region = {'center': [lat, lon], 'radius_km': radius_km}
+        except AreaError as e:
+            return jsonify({'error': str(e), 'success': False}), 400
+        
+        if limit < 0 or limit > max_points:
+            return jsonify({'error': f'limit must be between 0 and {max_points}', 'success': False}), 400
+        if cell_precision is not None and not 1 <= cell_precision <= GEOHASH_PRECISION:
+            return jsonify({
+                'error': f'cell_precision must be between 1 and {GEOHASH_PRECISION}',
+                'success': False
+            }), 400
+        
+        logger.info(f"🗺️ Area request: {region}, days={days}, limit={limit}")
+        
+        table = Prediction.__table__
+        conditions = _prediction_filters(_window_start(days), field_id)
+        conditions += area_conditions(table, bbox, center, radius_km)
+        
+        overall = db.session.execute(select(*nutrient_columns(table)).where(*conditions)).one()
+        response = {'success': True, 'region': region, 'days': days, **summarize(overall)}
+        
+        points = []
+        if limit and response['count']:
+            point_conditions = conditions
+            if response['count'] <= SMALL_AREA_ROWS:
+                # Otherwise the planner prefers the created_at index for the ORDER BY
+                point_conditions = [table.c.id.in_(select(table.c.id).where(*conditions))]
+            rows = db.session.execute(
+                select(*[table.c[name] for name in AREA_POINT_COLUMNS])
+                .where(*point_conditions)
+                .order_by(table.c.created_at.desc(), table.c.id.desc())
+                .limit(limit)
+            ).all()
+            for row in rows:
+                point = dict(row._mapping)
+                point['created_at'] = point['created_at'].isoformat()
+                points.append(point)
+        response['returned'] = len(points)
+        response['truncated'] = len(points) < response['count'] and limit > 0
+        response['data'] = points
+        
+        if cell_precision and response['count']:
+            cell = func.substr(table.c.geohash, 1, cell_precision).label('cell')
+            rows = db.session.execute(
+                select(cell, *nutrient_columns(table)).where(*conditions).group_by(cell).order_by(cell)
+            ).all()
+            cells = []
+            for row in rows:
+                latitude, longitude = decode_geohash(row.cell)
+                cells.append({
+                    'geohash': row.cell,
+                    'latitude': round(latitude, 6),
+                    'longitude': round(longitude, 6),
+                    **summarize(row)
+                })
+            response['cells'] = cells
+        
+        return jsonify(response), 200
+    
+    except Exception as e:
+        logger.error(f"❌ Area query error: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
+
+@api_bp.route('/export', methods=['GET', 'OPTIONS'])
+def export():
+    """
+    Stream prediction history as CSV, NDJSON or Parquet
+    
+    Rows are read with a server-side cursor in partitions of
+    EXPORT_BATCH_SIZE and encoded as they arrive, so memory stays
+    constant and the first bytes are sent immediately.
+    
+    Query parameters: format (csv|ndjson|parquet, default csv),
+    days (default 30), field_id
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    file_format = request.args.get('format', 'csv').lower()
+    days = request.args.get('days', 30, type=int)
+    field_id = request.args.get('field_id')
+    
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({
+            'error': f"Unsupported format: {file_format} (expected {', '.join(EXPORT_FORMATS)})",
+            'success': False
+        }), 400
+    
+    if file_format == 'parquet':
+        try:
+            import pyarrow
+        except ImportError:
+            return jsonify({'error': 'Parquet export requires pyarrow', 'success': False}), 400
+    
+    logger.info(f"📤 Export request: format={file_format}, days={days}, field_id={field_id}")
+    
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    since = _window_start(days)
+    archived = cold_storage.reaches(since)
+    statement = (
+        select(*[Prediction.__table__.c[name] for name in EXPORT_COLUMNS])
+        .where(*_prediction_filters(since, field_id))
+        .order_by(Prediction.created_at, Prediction.id)
+        .execution_options(yield_per=batch_size)
+    )
+    
+    def partitions():
+        # Archived rows are all older than the table's, so they come first
+        if archived:
+            yield from cold_storage.iter_rows(since, EXPORT_COLUMNS, field_id, batch_size)
+        result = db.session.execute(statement)
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+    
+    def generate():
+        yield from encode_export(file_format, partitions())
+    
+    extension = 'ndjson' if file_format == 'ndjson' else file_format
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[file_format],
+        headers={'Content-Disposition': f'attachment; filename=predictions.{extension}'}
+    )
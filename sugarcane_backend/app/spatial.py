@@ -0,0 +1,240 @@
+"""
+Geohash encoding and area queries over prediction locations
+
+Every prediction with a latitude/longitude stores its geohash (9
+characters, ~5 m cells) in an indexed column. Points that are close on
+the ground mostly share a prefix, and geohash strings sort in the same
+order as their cell numbers. So a bounding box is covered by a few
+prefix ranges, each an index range scan, and the exact bounds are
+applied only to the candidate rows.
+"""
+
+import logging
+import math
+
+import numpy as np
+from sqlalchemy import and_, bindparam, or_, select, update
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+# Upper bound on geohash cells used to cover one query region
+MAX_COVER_CELLS = 32
+
+# Regions with at most this many matching rows are read through the
+# geohash index and sorted; larger ones walk the created_at index newest
+# first, which reaches `limit` matches sooner
+SMALL_AREA_ROWS = 5000
+
+# Mean Earth radius / degree of latitude, for radius queries
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+_ALPHABET_CODES = np.frombuffer(GEOHASH_ALPHABET.encode(), dtype=np.uint8)
+
+class AreaError(ValueError):
+    """Raised for malformed or unsupported query regions"""
+
+def _bits(precision):
+    """(longitude bits, latitude bits) of a geohash with `precision` characters"""
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+def _cell_index(values, low, high, bits):
+    scaled = np.floor((np.asarray(values, dtype=np.float64) - low) / (high - low) * (1 << bits))
+    return np.clip(scaled, 0, (1 << bits) - 1).astype(np.uint64)
+
+def _interleave(lon_index, lat_index, precision):
+    """Geohash cell numbers from per-axis cell indices (longitude bits first)"""
+    lon_bits, lat_bits = _bits(precision)
+    code = np.zeros(np.shape(lon_index), dtype=np.uint64)
+    for position in range(5 * precision):
+        if position % 2 == 0:
+            bit = (lon_index >> np.uint64(lon_bits - 1 - position // 2)) & np.uint64(1)
+        else:
+            bit = (lat_index >> np.uint64(lat_bits - 1 - position // 2)) & np.uint64(1)
+        code = (code << np.uint64(1)) | bit
+    return code
+
+def _to_strings(codes, precision):
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.uint64) * np.uint64(5)
+    digits = (codes[:, None] >> shifts[None, :]) & np.uint64(31)
+    chars = _ALPHABET_CODES[digits.astype(np.intp)]
+    return [value.decode() for value in np.ascontiguousarray(chars).view(f'S{precision}').ravel()]
+
+def encode_geohashes(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash per row; None where either coordinate is missing"""
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    known = np.isfinite(latitude) & np.isfinite(longitude)
+    hashes = [None] * len(latitude)
+    if known.any():
+        lon_bits, lat_bits = _bits(precision)
+        codes = _interleave(
+            _cell_index(longitude[known], -180.0, 180.0, lon_bits),
+            _cell_index(latitude[known], -90.0, 90.0, lat_bits),
+            precision
+        )
+        for index, value in zip(np.flatnonzero(known), _to_strings(codes, precision)):
+            hashes[index] = value
+    return hashes
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of one location, or None without coordinates"""
+    if latitude is None or longitude is None:
+        return None
+    return encode_geohashes([latitude], [longitude], precision)[0]
+
+def decode_geohash(geohash):
+    """Centre (latitude, longitude) of a geohash cell"""
+    precision = len(geohash)
+    code = 0
+    for char in geohash:
+        code = (code << 5) | GEOHASH_ALPHABET.index(char)
+    lon_bits, lat_bits = _bits(precision)
+    lon_index = lat_index = 0
+    for position in range(5 * precision):
+        bit = (code >> (5 * precision - 1 - position)) & 1
+        if position % 2 == 0:
+            lon_index = (lon_index << 1) | bit
+        else:
+            lat_index = (lat_index << 1) | bit
+    return (
+        -90.0 + (lat_index + 0.5) * 180.0 / (1 << lat_bits),
+        -180.0 + (lon_index + 0.5) * 360.0 / (1 << lon_bits)
+    )
+
+def parse_bbox(value):
+    """'min_lat,min_lon,max_lat,max_lon' -> tuple of floats; raises AreaError"""
+    try:
+        bbox = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        raise AreaError('bbox must be four numbers: min_lat,min_lon,max_lat,max_lon')
+    if len(bbox) != 4 or not all(math.isfinite(part) for part in bbox):
+        raise AreaError('bbox must be four numbers: min_lat,min_lon,max_lat,max_lon')
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise AreaError('bbox latitudes must satisfy -90 <= min_lat <= max_lat <= 90')
+    if not (-180 <= min_lon <= max_lon <= 180):
+        raise AreaError('bbox longitudes must satisfy -180 <= min_lon <= max_lon <= 180 '
+                        '(boxes crossing the antimeridian are not supported)')
+    return bbox
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Bounding box of a circle, for the index scan of a radius query"""
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise AreaError('lat must be in [-90, 90] and lon in [-180, 180]')
+    if not (radius_km > 0):
+        raise AreaError('radius_km must be positive')
+    dlat = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    dlon = dlat / cos_lat if cos_lat > 1e-9 else 360.0
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if min_lon < -180 or max_lon > 180:
+        if dlon >= 180:
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            raise AreaError('Circles crossing the antimeridian are not supported')
+    return max(latitude - dlat, -90.0), min_lon, min(latitude + dlat, 90.0), max_lon
+
+def covering_ranges(bbox, max_cells=MAX_COVER_CELLS):
+    """
+    Geohash string ranges [low, high) that together cover a bounding box
+    
+    Uses the finest precision whose cells covering the box number at most
+    `max_cells`; cells with consecutive numbers merge into one range.
+    `high` is None for a range that runs to the end of the alphabet.
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    chosen = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lon_bits, lat_bits = _bits(precision)
+        lat_range = _cell_index([min_lat, max_lat], -90.0, 90.0, lat_bits)
+        lon_range = _cell_index([min_lon, max_lon], -180.0, 180.0, lon_bits)
+        n_cells = int(lat_range[1] - lat_range[0] + 1) * int(lon_range[1] - lon_range[0] + 1)
+        if n_cells > max_cells and chosen is not None:
+            break
+        chosen = precision, lat_range, lon_range
+    
+    precision, lat_range, lon_range = chosen
+    lat_index, lon_index = np.meshgrid(
+        np.arange(lat_range[0], lat_range[1] + 1, dtype=np.uint64),
+        np.arange(lon_range[0], lon_range[1] + 1, dtype=np.uint64)
+    )
+    codes = np.unique(_interleave(lon_index.ravel(), lat_index.ravel(), precision))
+    
+    # Runs of consecutive cell numbers -> (first, last) of each run
+    breaks = np.flatnonzero(np.diff(codes) != 1) + 1
+    starts = codes[np.concatenate([[0], breaks])]
+    ends = codes[np.concatenate([breaks - 1, [len(codes) - 1]])]
+    # The cell after a run bounds all finer geohashes under its last cell.
+    # Plain alphanumeric bounds also sort the same under PostgreSQL's
+    # locale collations, which order punctuation differently from SQLite
+    last_code = np.uint64((1 << (5 * precision)) - 1)
+    lows = _to_strings(starts, precision)
+    highs = _to_strings(np.minimum(ends, last_code - np.uint64(1)) + np.uint64(1), precision)
+    return [(low, None if end == last_code else high) for low, high, end in zip(lows, highs, ends)]
+
+def area_conditions(table, bbox, center=None, radius_km=None):
+    """
+    WHERE conditions selecting rows inside a bounding box or circle
+    
+    The geohash ranges drive the index scan; the latitude/longitude
+    bounds make the result exact. Circles use an equirectangular
+    distance around the centre, accurate to well under 0.5% for radii up
+    to a few hundred kilometres, and need no SQL trigonometry.
+    """
+    geohash = table.c.geohash
+    min_lat, min_lon, max_lat, max_lon = bbox
+    conditions = [
+        or_(*[
+            and_(geohash >= low, geohash < high) if high is not None else geohash >= low
+            for low, high in covering_ranges(bbox)
+        ]),
+        table.c.latitude.between(min_lat, max_lat),
+        table.c.longitude.between(min_lon, max_lon)
+    ]
+    if center is not None:
+        latitude, longitude = center
+        cos_lat = math.cos(math.radians(latitude))
+        dlat = table.c.latitude - latitude
+        dlon = (table.c.longitude - longitude) * cos_lat
+        conditions.append(dlat * dlat + dlon * dlon <= (radius_km / KM_PER_DEGREE) ** 2)
+    return conditions
+
+def backfill_geohashes(engine, table, batch_size=10000):
+    """Fill the geohash of rows written before the column existed; returns rows updated"""
+    statement = (
+        select(table.c.id, table.c.latitude, table.c.longitude)
+        .where(table.c.geohash.is_(None), table.c.latitude.isnot(None), table.c.longitude.isnot(None))
+        .where(table.c.id > bindparam('after'))
+        .order_by(table.c.id)
+        .limit(batch_size)
+    )
+    updated = 0
+    # Paged by id: rows with non-finite coordinates (NaN in PostgreSQL) keep a null geohash
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(statement, {'after': last_id}).all()
+            if not rows:
+                break
+            ids, latitude, longitude = zip(*rows)
+            hashes = [
+                {'row_id': row_id, 'hash': value}
+                for row_id, value in zip(ids, encode_geohashes(latitude, longitude)) if value is not None
+            ]
+            if hashes:
+                connection.execute(
+                    update(table).where(table.c.id == bindparam('row_id')).values(geohash=bindparam('hash')), hashes
+                )
+        updated += len(hashes)
+        last_id = ids[-1]
+        if len(rows) < batch_size:
+            break
+    
+    if updated:
+        logger.info(f"🌍 Geohash backfilled for {updated} predictions")
+    return updated
@@ -0,0 +1,286 @@
+import json
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# XGBoost objectives whose prediction is the raw margin
+IDENTITY_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:squaredlogerror')
+
+# Trees are padded to complete binary trees (2^(depth+1) - 1 nodes each),
+# so deep trees are left to the library instead of exhausting memory
+MAX_COMPILED_DEPTH = 20
+MAX_COMPILED_NODES = 2 ** 23
+
+class UnsupportedModel(ValueError):
+    """Raised for models the compiler cannot flatten"""
+
+class CompiledForest:
+    """
+    Tree ensemble flattened into NumPy arrays
+    
+    Every tree is padded to a complete binary tree of depth `max_depth`
+    (shallow leaves are repeated down to the last level) and all trees
+    share one set of node arrays. Children are found arithmetically, so
+    evaluation walks every tree for every row at once with one feature
+    gather and one threshold gather per depth level, instead of per-tree
+    Python or library overhead.
+    """
+    
+    def __init__(self, kind, feature, threshold, value, default_left, roots, max_depth,
+                 leaf_values, leaf_offsets, base_score=0.0, strict_less=False, dtype=np.float64, average=False):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.default_left = default_left
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_score = base_score
+        self.strict_less = strict_less
+        self.dtype = dtype
+        self.average = average
+        # Node values in the library's own node numbering, see leaf_outputs()
+        self.leaf_values = leaf_values
+        self.leaf_offsets = leaf_offsets
+        # Global index of a child: 2 * node + (1 - root) + went_right
+        self._child_offset = (1 - roots)[None, :]
+    
+    @property
+    def n_trees(self):
+        return len(self.roots)
+    
+    def tree_outputs(self, X):
+        """Leaf value of every tree for every row, shape (n_rows, n_trees)"""
+        X = np.asarray(X, dtype=np.float64)
+        if self.dtype == np.float32:
+            X = X.astype(np.float32)
+        else:
+            # sklearn evaluates float32 inputs against float64 thresholds
+            X = X.astype(np.float32).astype(np.float64)
+        
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        # Offset of each row in flat_X, so one gather fetches x[row, feature]
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        has_missing = bool(np.isnan(flat_X).any())
+        
+        for _ in range(self.max_depth):
+            x = flat_X[row_offsets + self.feature[node]]
+            threshold = self.threshold[node]
+            go_right = x >= threshold if self.strict_less else x > threshold
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.default_left[node], go_right)
+            node *= 2
+            node += self._child_offset
+            node += go_right
+        
+        return self.value[node]
+    
+    def leaf_outputs(self, leaves):
+        """Per-tree outputs from library leaf indices (`model.apply(X)`)"""
+        return self.leaf_values[self.leaf_offsets + np.asarray(leaves, dtype=np.intp)]
+    
+    def predict(self, X):
+        return self.combine(self.tree_outputs(X))
+    
+    def combine(self, outputs):
+        """Ensemble prediction from per-tree outputs"""
+        if self.average:
+            return outputs.mean(axis=1)
+        # Sequential float32 accumulation, as XGBoost sums tree outputs
+        margin = np.concatenate(
+            [np.full((outputs.shape[0], 1), self.base_score, dtype=self.dtype), outputs], axis=1
+        )
+        return np.cumsum(margin, axis=1, dtype=self.dtype)[:, -1].astype(np.float64)
+
+def _complete(feature, threshold, left, right, value, default_left, depth):
+    """Lay one tree out as a complete binary tree (children of i at 2i+1, 2i+2)"""
+    source = np.zeros(2 ** (depth + 1) - 1, dtype=np.intp)
+    for level in range(depth):
+        slots = np.arange(2 ** level - 1, 2 ** (level + 1) - 1)
+        nodes = source[slots]
+        is_leaf = left[nodes] < 0
+        source[2 * slots + 1] = np.where(is_leaf, nodes, left[nodes])
+        source[2 * slots + 2] = np.where(is_leaf, nodes, right[nodes])
+    
+    is_leaf = left[source] < 0
+    return (
+        np.where(is_leaf, 0, feature[source]),
+        # Repeated leaves always take the left branch
+        np.where(is_leaf, np.inf, threshold[source]),
+        value[source],
+        np.where(is_leaf, True, default_left[source])
+    )
+
+def _flatten(trees, dtype):
+    """Concatenate per-tree (feature, threshold, left, right, value, default_left, depth) arrays"""
+    max_depth = max(tree[-1] for tree in trees)
+    if max_depth > MAX_COMPILED_DEPTH:
+        raise UnsupportedModel(f'Trees of depth {max_depth} exceed the compiled limit of {MAX_COMPILED_DEPTH}')
+    size = 2 ** (max_depth + 1) - 1
+    if size * len(trees) > MAX_COMPILED_NODES:
+        raise UnsupportedModel(
+            f'{len(trees)} trees of depth {max_depth} need {size * len(trees)} padded nodes '
+            f'(limit {MAX_COMPILED_NODES})'
+        )
+    features, thresholds, values, defaults = [], [], [], []
+    leaf_values, leaf_offsets = [], []
+    offset = 0
+    
+    for feature, threshold, left, right, value, default_left, _ in trees:
+        leaf_values.append(value)
+        leaf_offsets.append(offset)
+        offset += len(value)
+        
+        feature, threshold, value, default_left = _complete(
+            feature, threshold, left, right, value, default_left, max_depth
+        )
+        features.append(feature)
+        thresholds.append(threshold)
+        values.append(value)
+        defaults.append(default_left)
+    
+    return (
+        np.concatenate(features).astype(np.intp),
+        np.concatenate(thresholds).astype(dtype),
+        np.concatenate(values).astype(dtype),
+        np.concatenate(defaults).astype(bool),
+        np.arange(len(trees), dtype=np.intp) * size,
+        max_depth,
+        np.concatenate(leaf_values).astype(dtype),
+        np.asarray(leaf_offsets, dtype=np.intp)
+    )
+
+def compile_random_forest(model):
+    """
+    Flatten a fitted sklearn random forest / extra trees model
+    
+    Regressors output one value per tree; classifiers output the class
+    probabilities of each tree's leaf, so `predict` returns the forest's
+    predict_proba.
+    """
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise UnsupportedModel('Only single-output forests are supported')
+    classifier = hasattr(model, 'classes_')
+    
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        if classifier:
+            counts = tree.value[:, 0, :]
+            value = counts / counts.sum(axis=1, keepdims=True)
+        else:
+            value = tree.value[:, 0, 0]
+        trees.append((
+            tree.feature,
+            tree.threshold,
+            tree.children_left,
+            tree.children_right,
+            value,
+            np.zeros(tree.node_count, dtype=bool),
+            tree.max_depth
+        ))
+    
+    return CompiledForest('random_forest', *_flatten(trees, np.float64), average=True)
+
+def _tree_depth(left, right):
+    depth = np.zeros(len(left), dtype=int)
+    for node in range(len(left)):
+        if left[node] >= 0:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+def compile_xgboost(model):
+    """Flatten a fitted XGBRegressor (gbtree booster, identity objective)"""
+    booster = model.get_booster()
+    config = json.loads(booster.save_raw('json'))['learner']
+    
+    objective = config['objective']['name']
+    if objective not in IDENTITY_OBJECTIVES:
+        raise UnsupportedModel(f'Unsupported XGBoost objective: {objective}')
+    if config['gradient_booster']['name'] != 'gbtree':
+        raise UnsupportedModel(f"Unsupported XGBoost booster: {config['gradient_booster']['name']}")
+    if int(config['learner_model_param'].get('num_target', 1)) != 1:
+        raise UnsupportedModel('Only single-target XGBoost models are supported')
+    
+    tree_configs = config['gradient_booster']['model']['trees']
+    best_iteration = getattr(model, 'best_iteration', None)
+    if best_iteration is not None:
+        per_round = int(config['gradient_booster']['model']['gbtree_model_param']['num_parallel_tree'])
+        tree_configs = tree_configs[:(best_iteration + 1) * per_round]
+    
+    trees = []
+    for tree in tree_configs:
+        if any(tree.get('split_type', [])):
+            raise UnsupportedModel('Categorical splits are not supported')
+        left = np.asarray(tree['left_children'])
+        right = np.asarray(tree['right_children'])
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        trees.append((
+            np.asarray(tree['split_indices']),
+            conditions,
+            left,
+            right,
+            # Leaf values are stored in split_conditions
+            np.where(left < 0, conditions, 0.0),
+            np.asarray(tree['default_left'], dtype=bool),
+            _tree_depth(left, right)
+        ))
+    
+    return CompiledForest(
+        'xgboost', *_flatten(trees, np.float32),
+        base_score=np.float32(float(config['learner_model_param']['base_score'])),
+        strict_less=True,
+        dtype=np.float32
+    )
+
+class NativeTreePredictor:
+    """
+    Predict with the compiled trees for small inputs, the library otherwise
+    
+    Vectorized NumPy traversal wins for single rows and small batches,
+    where the library's per-call setup dominates; past `max_rows` the
+    library's compiled, multi-threaded predictor is faster again.
+    """
+    
+    def __init__(self, model, compiled, max_rows):
+        self.model = model
+        self.compiled = compiled
+        self.max_rows = max_rows
+    
+    def predict(self, X):
+        if len(X) <= self.max_rows:
+            return self.compiled.predict(X)
+        return self.model.predict(X)
+
+def compile_model(model):
+    """Compile a supported tree ensemble; raises UnsupportedModel otherwise"""
+    name = type(model).__name__
+    if name in ('RandomForestRegressor', 'ExtraTreesRegressor', 'RandomForestClassifier', 'ExtraTreesClassifier'):
+        return compile_random_forest(model)
+    if name == 'XGBRegressor':
+        return compile_xgboost(model)
+    raise UnsupportedModel(f'No native backend for {name}')
+
+def verify_compiled(compiled, model, n_features, n_samples=2048, seed=0, rtol=1e-6, atol=1e-6):
+    """
+    Check a compiled model against the original on scaled-feature samples
+    
+    Returns the maximum absolute difference; raises AssertionError when the
+    outputs are not numerically equal within tolerance.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.vstack([
+        rng.standard_normal((n_samples, n_features)),
+        rng.uniform(-4, 4, (n_samples // 4, n_features)),
+        np.zeros((1, n_features))
+    ])
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    actual = compiled.predict(X)
+    max_error = float(np.max(np.abs(expected - actual)))
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        raise AssertionError(f'Compiled {compiled.kind} differs from original (max error {max_error:.3g})')
+    return max_error
@@ -0,0 +1,75 @@
+"""
+Benchmark: /api/predict/batch versus looping /api/predict
+
+Run from the sugarcane_backend directory:
+    python benchmarks/bench_batch.py --rows 2000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+
+def make_samples(n_rows, seed=42):
+    """Generate realistic-looking survey samples"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'ndvi': float(rng.uniform(0.2, 0.9)),
+            'chlorophyll': float(rng.uniform(15, 60)),
+            'latitude': float(rng.uniform(18.5, 19.5)),
+            'longitude': float(rng.uniform(72.5, 73.5)),
+            'day_of_year': int(rng.integers(1, 366)),
+            'field_id': f'FIELD_{int(rng.integers(1, 50)):03d}'
+        }
+        for _ in range(n_rows)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000, help='rows in the batch')
+    parser.add_argument('--single-rows', type=int, default=500,
+                        help='rows sent one by one through /api/predict')
+    parser.add_argument('--no-persist', action='store_true', help='skip database writes in the batch run')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # One client sends every request, so the per-client rate limit is off
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}", 'RATE_LIMIT_PER_MINUTE': 0})
+        client = app.test_client()
+        
+        samples = make_samples(max(args.rows, args.single_rows))
+        
+        # Warm up model loading so it is not part of either measurement
+        client.post('/api/predict', json=samples[0])
+        
+        start = time.perf_counter()
+        for sample in samples[:args.single_rows]:
+            client.post('/api/predict', json=sample)
+        single_elapsed = time.perf_counter() - start
+        single_rate = args.single_rows / single_elapsed
+        
+        persist = 'false' if args.no_persist else 'true'
+        start = time.perf_counter()
+        response = client.post(f'/api/predict/batch?persist={persist}', json=samples[:args.rows])
+        batch_elapsed = time.perf_counter() - start
+        batch_rate = args.rows / batch_elapsed
+        
+        body = response.get_json()
+        print(f"single /api/predict : {args.single_rows:>8} rows  {single_elapsed:8.3f}s  {single_rate:10.1f} rows/s")
+        print(f"batch  /predict/batch: {args.rows:>8} rows  {batch_elapsed:8.3f}s  {batch_rate:10.1f} rows/s"
+              f"  (succeeded={body['succeeded']}, failed={body['failed']})")
+        print(f"speedup: {batch_rate / single_rate:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: cost of model-derived confidence scores
+
+Compares, per model and batch size, the plain library predict call with
+the single pass that returns both the prediction and its spread, and
+reports the end-to-end ModelManager latency for both confidence modes.
+
+Run from the sugarcane_backend directory:
+    python benchmarks/bench_confidence.py
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.ml_models import DEFAULT_MODELS_PATH, NUTRIENTS, ModelManager
+
+def time_call(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-path', default=DEFAULT_MODELS_PATH)
+    parser.add_argument('--sizes', default='1,32,512,2048,10000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.INFO)
+    
+    fixed = ModelManager(args.models_path, confidence_mode='fixed')
+    spread = ModelManager(args.models_path, confidence_mode='model')
+    bundle = spread._bundle
+    rng = np.random.default_rng(0)
+    sizes = [int(value) for value in args.sizes.split(',')]
+    
+    print(f"{'model':<12} {'rows':>8} {'predict ms':>12} {'+spread ms':>12} {'overhead':>9}")
+    for name in NUTRIENTS:
+        model = bundle.models[name]
+        estimator = bundle.estimators[name]
+        for size in sizes:
+            X = rng.standard_normal((size, len(bundle.feature_names)))
+            plain = time_call(lambda: model.predict(X), args.repeat)
+            both = time_call(lambda: estimator.predict_spread(X), args.repeat)
+            print(f"{name:<12} {size:>8} {plain * 1000:>12.3f} {both * 1000:>12.3f} {both / plain - 1:>+8.0%}")
+    
+    print(f"\n{'predict_batch':<12} {'rows':>8} {'fixed ms':>12} {'model ms':>12} {'overhead':>9}")
+    low = np.array([0.2, 10.0, 17.0, 72.0, 1.0])
+    high = np.array([1.0, 70.0, 20.0, 78.0, 365.0])
+    for size in sizes:
+        X = rng.uniform(low, high, (size, len(low)))
+        plain = time_call(lambda: fixed.predict_batch(X), args.repeat)
+        both = time_call(lambda: spread.predict_batch(X), args.repeat)
+        print(f"{'all':<12} {size:>8} {plain * 1000:>12.3f} {both * 1000:>12.3f} {both / plain - 1:>+8.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: /history response formats
+
+Requests `--limit`-row history pages from a synthetic table in every
+response format, with and without a `fields=` projection, and reports
+bytes on the wire and server CPU time per 10k rows. The Flask test
+client runs the request in this process, so process CPU time is the
+server's cost (query, row building and encoding). "json (std encoder)"
+is the default layout encoded by Flask's standard JSON provider, for
+comparison with the orjson provider.
+
+Run from the sugarcane_backend directory:
+    python benchmarks/bench_history_formats.py --rows 100000 --limit 10000
+
+The table is shared with bench_suite.py (same --data-dir, --seed,
+--fields and --days), so an existing one is reused.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_suite import BENCH_DIR, open_table
+
+PROJECTION = 'id,created_at,field_id,nitrogen,phosphorus,potassium'
+
+CASES = [
+    ('json (std encoder)', '', None, 'std'),
+    ('json', '', None, 'orjson'),
+    ('json fields=', f'&fields={PROJECTION}', None, 'orjson'),
+    ('columnar', '&format=columnar', None, 'orjson'),
+    ('columnar fields=', f'&format=columnar&fields={PROJECTION}', None, 'orjson'),
+    ('msgpack', '', 'application/msgpack', 'orjson'),
+    ('msgpack fields=', f'&fields={PROJECTION}', 'application/msgpack', 'orjson'),
+    ('arrow', '', 'application/vnd.apache.arrow.stream', 'orjson'),
+    ('arrow fields=', f'&fields={PROJECTION}', 'application/vnd.apache.arrow.stream', 'orjson')
+]
+
+def measure(client, url, headers, repeat):
+    """(status, bytes, median CPU seconds, median wall seconds) of one request"""
+    cpu, wall = [], []
+    for _ in range(repeat + 1):
+        started_cpu, started = time.process_time(), time.perf_counter()
+        response = client.get(url, headers=headers)
+        body = response.get_data()
+        cpu.append(time.process_time() - started_cpu)
+        wall.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            return response.status_code, None, None, None
+    # The first sample warms caches and is dropped
+    cpu, wall = sorted(cpu[1:]), sorted(wall[1:])
+    return response.status_code, len(body), cpu[len(cpu) // 2], wall[len(wall) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='synthetic table size')
+    parser.add_argument('--limit', type=int, default=10000, help='rows per history page (at most --rows)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fields', type=int, default=500, help='distinct field_id values')
+    parser.add_argument('--days', type=int, default=60, help='days of history the table spans')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'))
+    parser.add_argument('--reuse-hours', type=float, default=24.0)
+    parser.add_argument('--database-url', help='run against this database instead of a SQLite file (its rows are replaced)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.INFO)
+    
+    app = open_table(args.data_dir, args.rows, args)
+    providers = {'orjson': app.json, 'std': DefaultJSONProvider(app)}
+    client = app.test_client()
+    base = f'/api/history?limit={args.limit}&days={args.days + 1}'
+    
+    results = []
+    for name, query, accept, encoder in CASES:
+        app.json = providers[encoder]
+        status, size, cpu, wall = measure(client, base + query, {'Accept': accept} if accept else {}, args.repeat)
+        if status != 200:
+            # e.g. 406 for msgpack without the msgpack package
+            if not args.json:
+                print(f'{name:<22} skipped (HTTP {status})')
+            continue
+        per_10k = 10000 / args.limit
+        result = {
+            'format': name,
+            'bytes_per_10k_rows': round(size * per_10k),
+            'cpu_ms_per_10k_rows': round(cpu * per_10k * 1000, 1),
+            'wall_ms_per_10k_rows': round(wall * per_10k * 1000, 1)
+        }
+        results.append(result)
+        if not args.json:
+            print(f"{name:<22} {result['bytes_per_10k_rows'] / 1e6:>8.2f} MB  "
+                  f"{result['cpu_ms_per_10k_rows']:>8.1f} ms CPU  {result['wall_ms_per_10k_rows']:>8.1f} ms wall  per 10k rows")
+    app.json = providers['orjson']
+    
+    if args.json:
+        print(json.dumps({'table_rows': args.rows, 'limit': args.limit, 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Load test: micro-batched vs direct single-row predictions
+
+Runs `--concurrency` threads that call `predict` back to back for
+`--duration` seconds, once on a plain ModelManager and once through
+BatchingModelManager, and reports throughput with p50/p99 latency for
+each. Threads stand in for gunicorn's gthread request threads. Inputs
+are randomized and the prediction cache is off, so every call reaches
+the models.
+
+Run from the sugarcane_backend directory:
+    python benchmarks/bench_microbatch.py --concurrency 1,4,16,64 --duration 5
+
+For the full HTTP path, start gunicorn with MODEL_MICROBATCH=true (and
+enough GUNICORN_THREADS to have concurrent requests per worker), then
+run benchmarks/load_test.py against it.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.batching import DEFAULT_MAX_BATCH_SIZE, BatchingModelManager
+from app.cache import PredictionCache
+from app.ml_models import DEFAULT_MODELS_PATH, ModelManager
+
+def client(manager, deadline, warmup_until, seed, results):
+    rng = np.random.default_rng(seed)
+    latencies = []
+    errors = 0
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        result = manager.predict(
+            float(rng.uniform(0.2, 0.95)), float(rng.uniform(15, 60)),
+            float(rng.uniform(17.0, 20.0)), float(rng.uniform(72.5, 77.5)), int(rng.integers(1, 366))
+        )
+        elapsed = time.perf_counter() - start
+        if start < warmup_until:
+            continue
+        if result['success']:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+    results.append((latencies, errors))
+
+def run(manager, concurrency, duration, warmup):
+    results = []
+    warmup_until = time.perf_counter() + warmup
+    deadline = warmup_until + duration
+    threads = [
+        threading.Thread(target=client, args=(manager, deadline, warmup_until, seed, results))
+        for seed in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    latencies = np.array(sorted(latency for worker_latencies, _ in results for latency in worker_latencies))
+    return {
+        'requests': len(latencies),
+        'errors': sum(worker_errors for _, worker_errors in results),
+        'requests_per_second': round(len(latencies) / duration, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3) if len(latencies) else None,
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 3) if len(latencies) else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-path', default=DEFAULT_MODELS_PATH)
+    parser.add_argument('--concurrency', default='1,4,16,64', help='comma-separated client thread counts')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--wait-ms', default='0,1', help='comma-separated batching windows to try')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.INFO)
+    
+    direct = ModelManager(args.models_path, cache=PredictionCache(maxsize=0))
+    modes = [('direct', direct)]
+    for wait_ms in [float(value) for value in args.wait_ms.split(',')]:
+        batching = BatchingModelManager(direct, max_batch_size=args.max_batch_size, max_wait=wait_ms / 1000)
+        modes.append((f'batched {wait_ms:g}ms', batching))
+    
+    rows = []
+    for concurrency in [int(value) for value in args.concurrency.split(',')]:
+        for mode, manager in modes:
+            stats = run(manager, concurrency, args.duration, args.warmup)
+            rows.append({'mode': mode, 'concurrency': concurrency, **stats})
+            if not args.json:
+                print(f"{mode:<14} c={concurrency:<4} {stats['requests_per_second']:>9.1f} req/s  "
+                      f"p50 {stats['p50_ms']:>8.3f} ms  p99 {stats['p99_ms']:>8.3f} ms  errors {stats['errors']}")
+    
+    if args.json:
+        print(json.dumps({'cpu_count': os.cpu_count(), 'results': rows}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: native NumPy tree backend versus library predict
+
+Verifies that the compiled nitrogen RandomForest and potassium XGBoost
+models match the originals, then times both backends per batch size.
+Use the crossover point to tune NATIVE_TREE_MAX_ROWS.
+
+Run from the sugarcane_backend directory:
+    python benchmarks/bench_native_trees.py
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.registry import REQUIRED_FILES
+from app.tree_compiler import compile_model, verify_compiled
+
+def time_call(fn, X, repeat):
+    fn(X)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-path', default='trained_models')
+    parser.add_argument('--sizes', default='1,8,32,128,512,2048,10000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(0)
+    
+    for name in ('nitrogen', 'potassium'):
+        model = joblib.load(os.path.join(args.models_path, REQUIRED_FILES[name]))
+        start = time.perf_counter()
+        compiled = compile_model(model)
+        compile_seconds = time.perf_counter() - start
+        max_error = verify_compiled(compiled, model, model.n_features_in_)
+        
+        print(f"\n{name}: {type(model).__name__}, {compiled.n_trees} trees, depth {compiled.max_depth}, "
+              f"compiled in {compile_seconds * 1000:.1f} ms, max error {max_error:.2e}")
+        print(f"{'rows':>8} {'library ms':>12} {'native ms':>12} {'speedup':>8}")
+        
+        for size in (int(value) for value in args.sizes.split(',')):
+            X = rng.standard_normal((size, model.n_features_in_))
+            library = time_call(model.predict, X, args.repeat)
+            native = time_call(compiled.predict, X, args.repeat)
+            print(f"{size:>8} {library * 1000:>12.3f} {native * 1000:>12.3f} {library / native:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Load test: sustained requests/sec and latency percentiles for /api/predict
+
+Opens `--concurrency` keep-alive connections, each sending requests back
+to back for `--duration` seconds after a warm-up, and reports throughput
+with p50/p90/p99/max latency. Inputs are randomized per request so the
+prediction cache does not hide model latency (use --repeat-input to
+measure cache hits instead).
+
+Responses shed by admission control (429 rate limited, 503 overloaded)
+are counted separately from errors, with their own latency, so a run
+past capacity shows how quickly excess load is turned away. Start the
+server with RATE_LIMIT_PER_MINUTE=0 to measure raw throughput, as every
+connection comes from the same client.
+
+Start the server first, e.g. from sugarcane_backend:
+    gunicorn -c gunicorn.conf.py wsgi:app
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 16 --duration 30
+
+Pass --json to get machine-readable results.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def random_sample(rng):
+    return {
+        'ndvi': round(rng.uniform(0.2, 0.95), 3),
+        'chlorophyll': round(rng.uniform(15, 60), 1),
+        'latitude': round(rng.uniform(17.0, 20.0), 4),
+        'longitude': round(rng.uniform(72.5, 77.5), 4),
+        'day_of_year': rng.randint(1, 365),
+        'field_id': f'LOAD_{rng.randint(1, 50):03d}'
+    }
+
+def worker(url, path, deadline, warmup_until, repeat_input, seed, results):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+    fixed_body = json.dumps(random_sample(rng))
+    latencies = []
+    shed = []
+    errors = 0
+    
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        body = fixed_body if repeat_input else json.dumps(random_sample(rng))
+        start = time.perf_counter()
+        try:
+            connection.request('POST', path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = None
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        elapsed = time.perf_counter() - start
+        
+        if start < warmup_until:
+            continue
+        if status is not None and status < 400:
+            latencies.append(elapsed)
+        elif status in (429, 503):
+            shed.append(elapsed)
+        else:
+            errors += 1
+    
+    connection.close()
+    results.append((latencies, shed, errors))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--path', default='/api/predict')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--repeat-input', action='store_true')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    
+    url = urlparse(args.url)
+    results = []
+    started = time.perf_counter()
+    warmup_until = started + args.warmup
+    deadline = warmup_until + args.duration
+    
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(url, args.path, deadline, warmup_until, args.repeat_input, seed, results)
+        )
+        for seed in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    latencies = sorted(latency for worker_latencies, _, _ in results for latency in worker_latencies)
+    shed = sorted(latency for _, worker_shed, _ in results for latency in worker_shed)
+    errors = sum(worker_errors for _, _, worker_errors in results)
+    summary = {
+        'url': args.url + args.path,
+        'concurrency': args.concurrency,
+        'duration_seconds': args.duration,
+        'cpu_count': os.cpu_count(),
+        'requests': len(latencies),
+        'errors': errors,
+        'shed': len(shed),
+        'shed_latency_ms_p50': round(percentile(shed, 0.50) * 1000, 2) if shed else None,
+        'requests_per_second': round(len(latencies) / args.duration, 1),
+        'latency_ms': {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in (
+                ('p50', percentile(latencies, 0.50)),
+                ('p90', percentile(latencies, 0.90)),
+                ('p99', percentile(latencies, 0.99)),
+                ('max', latencies[-1] if latencies else None)
+            )
+        }
+    }
+    
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    
+    latency = summary['latency_ms']
+    print(f"{summary['url']}  concurrency={args.concurrency}  duration={args.duration:.0f}s  cpus={summary['cpu_count']}")
+    print(f"requests: {summary['requests']}  errors: {errors}  throughput: {summary['requests_per_second']} req/s")
+    if shed:
+        print(f"shed (429/503): {len(shed)}  latency ms p50={summary['shed_latency_ms_p50']}")
+    print(f"latency ms  p50={latency['p50']}  p90={latency['p90']}  p99={latency['p99']}  max={latency['max']}")
+
+if __name__ == '__main__':
+    main()
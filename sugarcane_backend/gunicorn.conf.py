@@ -0,0 +1,86 @@
+"""
+Gunicorn production profile
+Run from sugarcane_backend with: gunicorn -c gunicorn.conf.py wsgi:app
+
+Inference is CPU-bound, so there is one worker process per core, each
+running a few threads to overlap database writes and slow clients.
+Models are loaded once in the master before forking (preload_app) and
+shared copy-on-write; each model predict call runs single-threaded so
+workers do not oversubscribe the cores. Every setting can be overridden
+with the environment variables below.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Must be set before NumPy / the models are imported by the preloaded app
+os.environ.setdefault('MODEL_PRELOAD', 'true')
+os.environ.setdefault('MODEL_N_JOBS', '1')
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(variable, '1')
+
+# Workers write metric samples here so /api/metrics aggregates all of them.
+# Emptied on start (the app is preloaded before any server hook runs), as
+# samples from a previous run would be summed in
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'sugarcane-metrics'))
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# Workers share one rate-limit bucket per client through a memory-mapped
+# file (app/admission.py), reset on start like the metrics
+os.environ.setdefault('ADMISSION_BACKEND', 'shared')
+os.environ.setdefault('ADMISSION_SHARED_PATH', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'sugarcane-admission'
+))
+try:
+    os.remove(os.environ['ADMISSION_SHARED_PATH'])
+except FileNotFoundError:
+    pass
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+
+# Load the app (and models) in the master, then fork workers
+preload_app = True
+
+# Recycle workers gradually to bound memory growth; jitter keeps them
+# from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+# Batch uploads can take a while; stuck workers are replaced after `timeout`
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Keep connections from a reverse proxy / load balancer open between requests
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def child_exit(server, worker):
+    """Drop live-only samples of a recycled worker; its counters are kept"""
+    from prometheus_client import multiprocess
+    
+    multiprocess.mark_process_dead(worker.pid)
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master"""
+    from app import db
+    from app.persistence import prediction_writer
+    
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+    prediction_writer.dispose()
+
+def worker_exit(server, worker):
+    """Flush buffered prediction writes before the worker goes away"""
+    from app.persistence import prediction_writer
+    
+    prediction_writer.close()
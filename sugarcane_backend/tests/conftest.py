@@ -0,0 +1,109 @@
+"""
+Shared fixtures: a fresh app and database per test, on every backend
+
+Tests run on SQLite and, when TEST_POSTGRES_URL points at a scratch
+PostgreSQL database (e.g. postgresql://postgres@localhost/sugarcane_test),
+on PostgreSQL as well. The tables of that database are dropped and
+recreated by every test.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, db
+from app.ml_models import NUTRIENTS
+from app.persistence import prediction_row, prediction_writer
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+# Model inputs of one sample (every feature the models use)
+SAMPLE = {
+    'ndvi': 0.72,
+    'chlorophyll': 38.5,
+    'latitude': 18.52,
+    'longitude': 73.85,
+    'day_of_year': 150
+}
+
+def make_prediction(created_at=None, field_id='FIELD_001', status='Adequate', notes='', **values):
+    """A `predictions` row with chosen values (nitrogen=..., etc.; 1.0 by default)"""
+    predictions = {name: float(values.get(name, 1.0)) for name in NUTRIENTS}
+    result = {
+        'predictions': predictions,
+        'status': {name: status for name in NUTRIENTS},
+        'confidence': {name: 0.9 for name in NUTRIENTS},
+        'model_version': 'test'
+    }
+    return prediction_row(SAMPLE, result, field_id, notes, created_at or datetime.utcnow())
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database_url(request, tmp_path):
+    """URL of an empty database on each backend"""
+    if request.param == 'sqlite':
+        return f"sqlite:///{tmp_path / 'predictions.db'}"
+    if not POSTGRES_URL:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    pytest.importorskip('psycopg2')
+    return POSTGRES_URL
+
+@pytest.fixture
+def app_config():
+    """Settings a test module overrides on top of the test defaults"""
+    return {}
+
+@pytest.fixture
+def app(database_url, tmp_path, app_config):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'RATE_LIMIT_PER_MINUTE': 0,
+        'JOB_RECOVER_ON_START': False,
+        'JOBS_DIR': str(tmp_path / 'jobs'),
+        'ARCHIVE_DIR': str(tmp_path / 'archive'),
+        **app_config
+    })
+    with app.app_context():
+        # A PostgreSQL database may hold tables of an earlier run
+        db.drop_all()
+        db.create_all()
+    
+    yield app
+    
+    prediction_writer.close()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    prediction_writer.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def add_predictions(app):
+    """Write `predictions` rows (see make_prediction) the way /predict/batch does"""
+    def add(*rows):
+        prediction_writer.write(list(rows))
+    return add
+
+@pytest.fixture
+def spread(add_predictions):
+    """Predictions for two fields over three weeks, several a day, written in separate transactions"""
+    now = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    for day in range(0, 21, 2):
+        add_predictions(*[
+            make_prediction(
+                now - timedelta(days=day, hours=hour),
+                field_id=f'FIELD_00{1 + (day + hour) % 2}',
+                status=('Deficient', 'Adequate', 'Excess')[hour % 3],
+                nitrogen=1.0 + day / 10 + hour,
+                phosphorus=0.5 * hour,
+                potassium=2.0 - day / 20
+            )
+            for hour in range(4)
+        ])
+        # Same field and day again: the rollup row is updated, not duplicated
+        add_predictions(make_prediction(now - timedelta(days=day), field_id='FIELD_001', nitrogen=0.25))
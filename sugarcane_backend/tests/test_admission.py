@@ -0,0 +1,83 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app.admission import InflightLimiter, Overloaded, admission
+from conftest import SAMPLE
+
+admission_module = sys.modules['app.admission']
+
+@pytest.fixture
+def app_config():
+    return {
+        'RATE_LIMIT_PER_MINUTE': 1,
+        'RATE_LIMIT_BURST': 2,
+        'RATE_LIMIT_CLIENT_HEADER': 'X-Forwarded-For',
+        'ADMISSION_MAX_INFLIGHT': 1,
+        'ADMISSION_QUEUE_BUDGET_MS': 100
+    }
+
+def _predict(client, client_ip='10.0.0.1'):
+    return client.post('/api/predict', json=SAMPLE, headers={'X-Forwarded-For': f'{client_ip}, 10.0.0.254'})
+
+def test_clients_are_limited_after_their_burst(client):
+    assert [_predict(client).status_code for _ in range(3)] == [201, 201, 429]
+    
+    limited = _predict(client)
+    assert limited.status_code == 429
+    assert 0 < int(limited.headers['Retry-After']) <= 60
+    assert limited.get_json()['success'] is False
+    # Another client has its own bucket, and reads spend no tokens
+    assert _predict(client, '10.0.0.2').status_code == 201
+    assert client.get('/api/history').status_code == 200
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/predict', SAMPLE),
+    ('/api/predict/batch', [SAMPLE, SAMPLE])
+])
+def test_predictions_are_shed_when_no_slot_frees_up(client, monkeypatch, path, body):
+    # One prediction in flight that usually takes a second: the queue budget cannot cover it
+    monkeypatch.setattr(admission.limiter, 'in_flight', 1)
+    monkeypatch.setattr(admission.limiter, 'service_time', 1.0)
+    
+    response = client.post(path, json=body)
+    
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+def test_queued_caller_gets_the_freed_slot():
+    limiter = InflightLimiter(limit=1, budget=1.0)
+    limiter.acquire()
+    threading.Timer(0.05, limiter.release, args=(0.05,)).start()
+    
+    waited = limiter.acquire()
+    
+    assert 0.03 < waited < 1.0
+    assert limiter.in_flight == 1
+
+def test_queued_caller_gives_up_at_the_budget():
+    limiter = InflightLimiter(limit=1, budget=0.05)
+    limiter.acquire()
+    
+    started = time.perf_counter()
+    with pytest.raises(Overloaded):
+        limiter.acquire()
+    
+    assert time.perf_counter() - started >= 0.05
+    assert (limiter.in_flight, limiter.waiting) == (1, 0)
+
+def test_microbatching_admits_a_full_batch(monkeypatch, tmp_path):
+    monkeypatch.setenv('MODEL_MICROBATCH', 'true')
+    monkeypatch.setenv('MODEL_MICROBATCH_MAX_SIZE', '16')
+    monkeypatch.delenv('ADMISSION_MAX_INFLIGHT', raising=False)
+    
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'predictions.db'}",
+        'JOB_RECOVER_ON_START': False
+    })
+    
+    assert app.config['ADMISSION_MAX_INFLIGHT'] == 16
+    assert admission.limiter.limit == 16
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app import db
+from app.archive import cold_storage
+from app.models import Prediction
+from conftest import make_prediction
+
+pytest.importorskip('pyarrow')
+
+@pytest.fixture
+def archived(app, add_predictions):
+    """Forty days of predictions with the oldest thirty archived"""
+    midnight = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    add_predictions(*[
+        make_prediction(midnight - timedelta(days=day, hours=1), field_id=f'FIELD_00{1 + day % 2}', nitrogen=day)
+        for day in range(39, -1, -1)
+    ])
+    with app.app_context():
+        return cold_storage.archive(db.engine, older_than_days=10, vacuum=False)
+
+def _table_count(app):
+    with app.app_context():
+        return db.session.execute(select(func.count()).select_from(Prediction.__table__)).scalar()
+
+def _history(client):
+    return client.get('/api/history', query_string={'limit': 1000, 'days': 60, 'fields': 'id,field_id,nitrogen'}).get_json()['data']
+
+def test_reads_span_both_tiers(app, client, archived):
+    assert archived['archived_rows'] == 30
+    assert _table_count(app) == 10
+    
+    assert sorted(row['nitrogen'] for row in _history(client)) == list(range(40))
+    statistics = client.get('/api/statistics', query_string={'days': 60, 'group_by': 'field_id'}).get_json()
+    assert statistics['count'] == 40
+    assert [group['count'] for group in statistics['groups']] == [20, 20]
+
+def test_backdated_rows_are_archived_not_lost(app, client, archived, add_predictions):
+    watermark = cold_storage.watermark()
+    add_predictions(make_prediction(watermark - timedelta(days=3), field_id='FIELD_003', nitrogen=100))
+    # A row an interrupted run archived but did not delete
+    leftover = cold_storage.history(watermark - timedelta(days=60), 1)[0]
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(insert(Prediction.__table__), [leftover])
+    
+    with app.app_context():
+        cold_storage.archive(db.engine, older_than_days=10, vacuum=False)
+    
+    assert _table_count(app) == 10
+    rows = _history(client)
+    assert len(rows) == 41
+    assert len({row['id'] for row in rows}) == 41
+    assert 'FIELD_003' in {row['field_id'] for row in rows}
+
+@pytest.mark.parametrize('columns', [['id', 'created_at', 'nitrogen'], ['nitrogen']])
+def test_iter_rows_merges_files_oldest_first(archived, columns):
+    chunks = list(cold_storage.iter_rows(datetime.utcnow() - timedelta(days=60), columns, batch_size=7))
+    
+    assert [len(chunk) for chunk in chunks] == [7, 7, 7, 7, 2]
+    rows = [row for chunk in chunks for row in chunk]
+    assert all(len(row) == len(columns) for row in rows)
+    # Every other day is in the other field's file; merged, the values count down by day
+    assert [row[-1] for row in rows] == list(range(39, 9, -1))
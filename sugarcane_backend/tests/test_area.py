@@ -0,0 +1,70 @@
+import math
+
+import pytest
+from sqlalchemy import select, update
+
+from app import db
+from app.models import Prediction
+from app.spatial import backfill_geohashes, encode_geohash
+from conftest import make_prediction
+
+# Rows around Pune, one near Nashik (~165 km north)
+LOCATIONS = [(18.52, 73.85), (18.53, 73.86), (18.55, 73.80), (18.60, 73.935), (20.00, 73.79)]
+
+def _at(latitude, longitude, **values):
+    row = make_prediction(**values)
+    row.update(latitude=latitude, longitude=longitude, geohash=encode_geohash(latitude, longitude))
+    return row
+
+@pytest.fixture
+def located(add_predictions):
+    add_predictions(*[_at(lat, lon, nitrogen=index) for index, (lat, lon) in enumerate(LOCATIONS)])
+
+def _area(client, **params):
+    response = client.get('/api/area', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_bbox_selects_the_rows_inside(client, located):
+    area = _area(client, bbox='18.45,73.75,18.60,73.90')
+    
+    assert area['count'] == 3
+    assert sorted(point['nitrogen'] for point in area['data']) == [0, 1, 2]
+    assert area['nitrogen']['max'] == 2
+
+def test_radius_selects_the_rows_within_the_distance(client, located):
+    area = _area(client, lat=18.52, lon=73.85, radius_km=10)
+    
+    # (18.60, 73.935) is inside the circle's bounding box but ~12.5 km away
+    assert sorted(point['nitrogen'] for point in area['data']) == [0, 1, 2]
+    assert _area(client, lat=18.52, lon=73.85, radius_km=200)['count'] == 5
+
+def test_cells_partition_the_area(client, located):
+    area = _area(client, bbox='18,73,21,75', cell_precision=4, limit=0)
+    
+    assert area['data'] == []
+    assert sum(cell['count'] for cell in area['cells']) == area['count'] == 5
+    assert all(len(cell['geohash']) == 4 for cell in area['cells'])
+
+@pytest.mark.parametrize('params', [
+    {'bbox': '18,73,19'},
+    {'bbox': '19,73,18,74'},
+    {'lat': 18.5, 'lon': 73.8},
+    {'lat': 18.5, 'lon': 73.8, 'radius_km': -1},
+    {'bbox': '18,73,19,74', 'cell_precision': 12}
+])
+def test_invalid_regions_are_rejected(client, params):
+    assert client.get('/api/area', query_string=params).status_code == 400
+
+def test_backfill_skips_rows_it_cannot_locate(app, add_predictions):
+    # A full first batch of rows without a geohash must not stop (or stall) the backfill
+    add_predictions(_at(math.inf, 73.85), _at(18.52, math.nan), *[_at(lat, lon) for lat, lon in LOCATIONS])
+    table = Prediction.__table__
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(update(table).values(geohash=None))
+        
+        assert backfill_geohashes(db.engine, table, batch_size=2) == len(LOCATIONS)
+        
+        hashes = db.session.execute(select(table.c.geohash).order_by(table.c.id)).scalars().all()
+    assert hashes == [None, None] + [encode_geohash(lat, lon) for lat, lon in LOCATIONS]
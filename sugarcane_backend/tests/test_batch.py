@@ -0,0 +1,68 @@
+import pytest
+
+from app.persistence import prediction_writer
+from conftest import SAMPLE
+
+def _history(client, **params):
+    response = client.get('/api/history', query_string={'limit': 1000, **params})
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+def test_batch_matches_single_predictions(client):
+    samples = [
+        {**SAMPLE, 'field_id': 'FIELD_001'},
+        {**SAMPLE, 'ndvi': 2.0, 'field_id': 'FIELD_002'},
+        {**SAMPLE, 'ndvi': 0.35, 'chlorophyll': 22.0, 'field_id': 'FIELD_003'}
+    ]
+    
+    response = client.post('/api/predict/batch', json=samples)
+    
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['count'], body['succeeded'], body['failed']) == (3, 2, 1)
+    assert body['results'][1]['success'] is False
+    for index in (0, 2):
+        single = client.post('/api/predict', json=samples[index]).get_json()
+        for name, value in body['results'][index]['predictions'].items():
+            assert value == pytest.approx(single['predictions'][name])
+        assert body['results'][index]['status'] == single['status']
+    
+    prediction_writer.flush()
+    stored = _history(client, fields='field_id')
+    # The batch rows plus the two single predictions
+    assert sorted(row['field_id'] for row in stored) == ['FIELD_001', 'FIELD_001', 'FIELD_003', 'FIELD_003']
+
+def test_batch_without_persist_stores_nothing(client):
+    response = client.post('/api/predict/batch?persist=false', json=[SAMPLE, SAMPLE])
+    
+    assert response.status_code == 200
+    assert response.get_json()['persisted'] is False
+    assert _history(client) == []
+
+def test_batch_accepts_csv(client):
+    header = ','.join(SAMPLE)
+    line = ','.join(str(value) for value in SAMPLE.values())
+    
+    response = client.post('/api/predict/batch', data=f'{header}\n{line}\n{line}\n', content_type='text/csv')
+    
+    assert response.status_code == 200
+    assert response.get_json()['succeeded'] == 2
+    assert len(_history(client)) == 2
+
+def test_batch_rejects_rows_with_non_text_identifiers(client):
+    samples = [
+        {**SAMPLE, 'field_id': {'a': 1}},
+        {**SAMPLE, 'notes': ['north', 'edge']},
+        {**SAMPLE, 'field_id': True},
+        {**SAMPLE, 'field_id': 7, 'notes': None},
+        {**SAMPLE, 'field_id': 'FIELD_001', 'notes': 'north'}
+    ]
+    
+    response = client.post('/api/predict/batch?persist=true', json=samples)
+    
+    body = response.get_json()
+    assert [row['success'] for row in body['results']] == [False, False, False, True, True]
+    assert body['results'][0]['error'] == 'field_id must be a string'
+    assert body['results'][1]['error'] == 'notes must be a string'
+    prediction_writer.flush()
+    assert sorted((row['field_id'], row['notes']) for row in _history(client)) == [('7', ''), ('FIELD_001', 'north')]
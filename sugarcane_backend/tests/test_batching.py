@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.batching import BatchingModelManager
+from app.ml_models import ModelManager
+from conftest import SAMPLE
+
+@pytest.fixture(scope='module')
+def manager():
+    return ModelManager()
+
+def _rows(n):
+    return [dict(SAMPLE, ndvi=round(0.2 + 0.6 * i / n, 4), day_of_year=100 + i) for i in range(n)]
+
+def _assert_same_result(result, expected):
+    # Vectorized kernels may differ from single-row calls in the last bits
+    assert result['predictions'] == pytest.approx(expected['predictions'], rel=1e-9)
+    assert result['confidence'] == pytest.approx(expected['confidence'], abs=1e-4)
+    assert {**result, 'predictions': None, 'confidence': None} == {**expected, 'predictions': None, 'confidence': None}
+
+def _predict_concurrently(batching, rows):
+    with ThreadPoolExecutor(max_workers=len(rows)) as pool:
+        return list(pool.map(lambda row: batching.predict(**row), rows))
+
+def test_batched_results_match_single_predictions(manager, monkeypatch):
+    batch_sizes = []
+    predict_many = manager.predict_many
+    def record(inputs):
+        batch_sizes.append(len(inputs))
+        return predict_many(inputs)
+    monkeypatch.setattr(manager, 'predict_many', record)
+    batching = BatchingModelManager(manager, max_batch_size=8, max_wait=0.05)
+    rows = _rows(24)
+    
+    results = _predict_concurrently(batching, rows)
+    
+    for row, result in zip(rows, results):
+        _assert_same_result(result, manager.predict(**row))
+    assert sum(batch_sizes) == len(rows)
+    assert max(batch_sizes) > 1 and max(batch_sizes) <= 8
+
+def test_a_bad_row_fails_alone(manager):
+    batching = BatchingModelManager(manager, max_batch_size=8, max_wait=0.05)
+    rows = _rows(7) + [dict(SAMPLE, ndvi='abc')]
+    
+    results = _predict_concurrently(batching, rows)
+    
+    assert [result['success'] for result in results] == [True] * 7 + [False]
+    assert results[-1]['error'].startswith('❌ Prediction failed')
+
+def test_a_lone_request_is_not_held_back(manager):
+    batching = BatchingModelManager(manager, max_batch_size=8)
+    
+    _assert_same_result(batching.predict(**SAMPLE), manager.predict(**SAMPLE))
+    assert batching.version == manager.version
@@ -0,0 +1,81 @@
+import pytest
+
+from app.cache import PredictionCache
+from app.ml_models import DEFAULT_MODELS_PATH, ModelManager
+from conftest import SAMPLE
+
+@pytest.fixture
+def app_config():
+    return {'ADMIN_TOKEN': 'secret'}
+
+@pytest.fixture(scope='module')
+def manager():
+    manager = ModelManager(DEFAULT_MODELS_PATH, cache=PredictionCache(maxsize=100))
+    manager.load_models()
+    return manager
+
+def test_keys_are_quantized_per_feature():
+    cache = PredictionCache()
+    
+    key = cache.make_key('v1', {'ndvi': 0.72049, 'chlorophyll': 38.54, 'latitude': None})
+    
+    assert key == ('v1', 0.72, 38.5, None)
+    assert cache.make_key('v1', {'ndvi': 0.7204, 'chlorophyll': 38.46, 'latitude': None}) == key
+    assert cache.make_key('v2', {'ndvi': 0.72049, 'chlorophyll': 38.54, 'latitude': None}) != key
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PredictionCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    
+    cache.put('c', 3)
+    
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    assert cache.stats()['evictions'] == 1
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.cache.time.monotonic', lambda: now[0])
+    cache = PredictionCache(ttl=60)
+    cache.put('a', 1)
+    
+    now[0] += 61
+    
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+def test_nearby_readings_share_a_prediction(manager):
+    manager.cache.clear()
+    first = manager.predict(**SAMPLE)
+    
+    second = manager.predict(**{**SAMPLE, 'ndvi': SAMPLE['ndvi'] + 0.0001})
+    
+    assert second == first
+    assert manager.cache.stats()['size'] == 1
+    # Callers get copies: changing one leaves the cached entry intact
+    second['predictions']['nitrogen'] = -1
+    assert manager.predict(**SAMPLE)['predictions'] == first['predictions']
+
+def test_batch_results_fill_the_cache(manager):
+    manager.cache.clear()
+    hits = manager.cache.hits
+    rows = [SAMPLE, {**SAMPLE, 'chlorophyll': 20.0}]
+    
+    manager.predict_many(rows)
+    
+    assert manager.cache.stats()['size'] == 2
+    manager.predict(**rows[1])
+    assert manager.cache.hits == hits + 1
+
+def test_cache_endpoint_reports_and_clears(client):
+    client.post('/api/predict', json=SAMPLE)
+    client.post('/api/predict', json=SAMPLE)
+    
+    stats = client.get('/api/cache').get_json()['cache']
+    assert stats['size'] >= 1 and stats['hits'] >= 1
+    
+    assert client.delete('/api/cache').status_code == 401
+    cleared = client.delete('/api/cache', headers={'X-Admin-Token': 'secret'})
+    assert cleared.get_json()['cleared'] >= 1
+    assert client.get('/api/cache').get_json()['cache']['size'] == 0
@@ -0,0 +1,73 @@
+import json
+
+import joblib
+import numpy as np
+import pytest
+
+from app.classification import DEFAULT_THRESHOLDS, StatusModel, StatusThresholds, ThresholdError
+from app.ml_models import DEFAULT_MODELS_PATH, NUTRIENTS, ModelManager
+from app.registry import OPTIONAL_FILES
+from conftest import SAMPLE
+
+REGIONS = {
+    'default': {'nitrogen': [60, 140]},
+    'regions': [
+        {'name': 'north', 'bounds': [20, 70, 30, 80], 'thresholds': {'phosphorus': [10, 15]}},
+        {'name': 'overlap', 'bounds': [25, 70, 35, 80], 'thresholds': {'phosphorus': [0, 5]}}
+    ]
+}
+
+def test_bands_include_their_edges():
+    status = StatusThresholds().classify({'nitrogen': np.array([49.99, 50, 150, 150.01])})
+    
+    assert status['nitrogen'].tolist() == ['Deficient', 'Adequate', 'Adequate', 'Excess']
+
+def test_regions_override_the_default_bands(tmp_path):
+    path = tmp_path / 'thresholds.json'
+    path.write_text(json.dumps(REGIONS))
+    thresholds = StatusThresholds.from_file(path)
+    predictions = {'nitrogen': np.array([55.0] * 4), 'phosphorus': np.array([12.0] * 4)}
+    
+    status = thresholds.classify(predictions, latitude=[10, 22, 27, 33], longitude=[75, 75, 75, 75])
+    
+    assert status['nitrogen'].tolist() == ['Deficient'] * 4
+    # Outside every region, in north, in both (the first wins), in overlap only
+    assert status['phosphorus'].tolist() == ['Deficient', 'Adequate', 'Adequate', 'Excess']
+    assert thresholds.describe()['default']['potassium'] == list(DEFAULT_THRESHOLDS['potassium'])
+    assert thresholds.describe()['regions'][0]['thresholds'] == {'phosphorus': [10.0, 15.0]}
+
+def test_rows_without_coordinates_use_the_default_bands():
+    thresholds = StatusThresholds(regions=REGIONS['regions'])
+    
+    status = thresholds.classify({'phosphorus': np.array([12.0])})
+    
+    assert status['phosphorus'].tolist() == ['Deficient']
+
+@pytest.mark.parametrize('default, regions', [
+    ({'nitrogen': [150, 50]}, ()),
+    ({'nitrogen': 'low'}, ()),
+    (None, [{'name': 'x', 'bounds': [1, 2, 3]}]),
+    (None, [{'name': 'x'}])
+])
+def test_malformed_thresholds_are_rejected(default, regions):
+    with pytest.raises(ThresholdError):
+        StatusThresholds(default, regions)
+
+def test_status_classifier_reports_an_overall_status():
+    manager = ModelManager(status_classifier=True)
+    model = joblib.load(f"{DEFAULT_MODELS_PATH}/{OPTIONAL_FILES['status_classifier']}")
+    status_model = StatusModel(model)
+    X = np.random.default_rng(0).standard_normal((1000, 5))
+    
+    assert status_model.predict(X[:100]).tolist() == model.predict(X[:100]).tolist()
+    assert status_model.predict(X).tolist() == model.predict(X).tolist()
+    result = manager.predict(**SAMPLE)
+    assert result['overall_status'] in set(model.classes_)
+    batch = manager.predict_batch(np.array([list(SAMPLE.values())] * 3))
+    assert batch['overall_status'].tolist() == [result['overall_status']] * 3
+
+def test_overall_status_is_off_by_default():
+    manager = ModelManager()
+    
+    assert 'overall_status' not in manager.predict(**SAMPLE)
+    assert set(manager.predict(**SAMPLE)['status']) == set(NUTRIENTS)
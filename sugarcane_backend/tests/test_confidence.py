@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from app import confidence
+from app.confidence import FALLBACK_CONFIDENCE, build_spread_estimator, confidence_from_spread
+from app.ml_models import NUTRIENTS, ModelManager
+from app.tree_compiler import UnsupportedModel
+from conftest import SAMPLE
+
+@pytest.fixture(scope='module')
+def manager():
+    return ModelManager()
+
+@pytest.fixture(scope='module')
+def X():
+    """Scaled feature rows around the training distribution"""
+    return np.random.default_rng(1).standard_normal((300, 5))
+
+def test_every_model_has_a_confidence_estimator(manager):
+    assert manager.load_report['confidence'] == {
+        'nitrogen': 'tree_variance', 'phosphorus': 'kernel_variance', 'potassium': 'subensemble_spread'
+    }
+
+@pytest.mark.parametrize('name', NUTRIENTS)
+def test_estimators_predict_like_their_models(manager, X, name):
+    estimator = build_spread_estimator(manager.models[name], X.shape[1])
+    
+    prediction, score = estimator.confidence(X)
+    
+    np.testing.assert_allclose(prediction, manager.models[name].predict(X), rtol=1e-4, atol=1e-4)
+    assert ((score > 0) & (score <= 1)).all()
+    assert np.ptp(score) > 0
+
+def test_forest_spread_is_the_spread_across_trees(manager, X):
+    forest = manager.models['nitrogen']
+    per_tree = np.stack([tree.predict(X.astype(np.float32)) for tree in forest.estimators_], axis=1)
+    
+    _, spread = build_spread_estimator(forest, X.shape[1]).predict_spread(X)
+    
+    np.testing.assert_allclose(spread, per_tree.std(axis=1), rtol=1e-5, atol=1e-6)
+
+def test_kernel_spread_grows_away_from_the_support_vectors(manager):
+    svr = manager.models['phosphorus']
+    estimator = build_spread_estimator(svr, svr.support_vectors_.shape[1])
+    
+    _, near = estimator.predict_spread(svr.support_vectors_)
+    _, far = estimator.predict_spread(svr.support_vectors_[:50] + 100.0)
+    
+    assert far.min() > near.max()
+    np.testing.assert_allclose(far, np.sqrt(estimator.signal_var + estimator.noise_var), rtol=1e-3)
+
+def test_chunked_spread_matches_one_pass(manager, X, monkeypatch):
+    estimator = build_spread_estimator(manager.models['potassium'], X.shape[1])
+    whole = estimator.predict_spread(X)
+    monkeypatch.setattr(confidence, 'CHUNK_ROWS', 64)
+    
+    chunked = estimator.predict_spread(X)
+    
+    np.testing.assert_allclose(chunked, whole)
+
+def test_confidence_falls_with_the_spread():
+    assert confidence_from_spread([0.0, 1.0, 3.0], 1.0).tolist() == [1.0, 0.5, 0.25]
+
+def test_unsupported_models_are_rejected():
+    model = LinearRegression().fit([[0.0], [1.0]], [0.0, 1.0])
+    
+    with pytest.raises(UnsupportedModel):
+        build_spread_estimator(model, 1)
+
+def test_fixed_confidence_mode(manager):
+    fixed = ModelManager(confidence_mode='fixed')
+    
+    result = fixed.predict(**SAMPLE)
+    
+    assert result['confidence'] == {name: FALLBACK_CONFIDENCE for name in NUTRIENTS}
+    assert result['predictions'] == pytest.approx(manager.predict(**SAMPLE)['predictions'])
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from app import db
+from app.dbcopy import DatabaseCopyError, copy_database
+from app.models import FieldDailyRollup, Prediction
+from app.persistence import insert_predictions
+from conftest import SAMPLE, make_prediction
+
+@pytest.fixture
+def source_url(tmp_path):
+    """SQLite database with a week of predictions for two fields"""
+    url = f"sqlite:///{tmp_path / 'source.db'}"
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        insert_predictions(connection, [
+            make_prediction(now - timedelta(days=index % 7, minutes=index), field_id=f'FIELD_00{1 + index % 2}', nitrogen=index)
+            for index in range(40)
+        ])
+    engine.dispose()
+    return url
+
+def _count(app, table):
+    with app.app_context():
+        return db.session.execute(select(func.count()).select_from(table)).scalar()
+
+def test_copy_moves_every_row(app, client, source_url):
+    copied = copy_database(source_url, app.config['SQLALCHEMY_DATABASE_URI'], batch_size=7)
+    
+    assert copied['predictions'] == 40
+    assert _count(app, Prediction.__table__) == 40
+    assert copied['field_daily_rollups'] == _count(app, FieldDailyRollup.__table__)
+    
+    history = client.get('/api/history', query_string={'limit': 1000, 'fields': 'nitrogen'}).get_json()
+    assert sorted(row['nitrogen'] for row in history['data']) == list(range(40))
+    trends = client.get('/api/trends', query_string={'days': 30}).get_json()
+    assert sum(entry['count'] for entry in trends['series']) == 40
+
+def test_new_rows_get_ids_after_the_copied_ones(app, client, source_url):
+    copy_database(source_url, app.config['SQLALCHEMY_DATABASE_URI'])
+    
+    response = client.post('/api/predict?return_id=true', json=SAMPLE)
+    
+    assert response.status_code == 201
+    assert response.get_json()['prediction_id'] == 41
+
+def test_copy_refuses_a_filled_target(app, source_url, add_predictions):
+    target = app.config['SQLALCHEMY_DATABASE_URI']
+    add_predictions(make_prediction())
+    
+    with pytest.raises(DatabaseCopyError):
+        copy_database(source_url, target)
+    
+    copied = copy_database(source_url, target, replace=True)
+    assert copied['predictions'] == _count(app, Prediction.__table__) == 40
+
+def test_rollups_are_built_for_sources_without_them(app, client, source_url):
+    engine = create_engine(source_url)
+    FieldDailyRollup.__table__.drop(engine)
+    engine.dispose()
+    
+    copy_database(source_url, app.config['SQLALCHEMY_DATABASE_URI'])
+    
+    trends = client.get('/api/trends', query_string={'days': 30, 'field_id': 'FIELD_001'}).get_json()
+    assert sum(entry['count'] for entry in trends['series']) == 20
+
+def test_copy_into_itself_is_refused(source_url):
+    with pytest.raises(DatabaseCopyError):
+        copy_database(source_url, source_url)
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.export import EXPORT_COLUMNS
+from conftest import make_prediction
+
+@pytest.fixture
+def app_config():
+    # Several partitions per export
+    return {'EXPORT_BATCH_SIZE': 2}
+
+@pytest.fixture
+def rows(add_predictions):
+    now = datetime.utcnow().replace(microsecond=0)
+    add_predictions(*[
+        make_prediction(now - timedelta(hours=hours), field_id=f'FIELD_00{1 + hours % 2}', nitrogen=hours)
+        for hours in range(1, 8)
+    ])
+    add_predictions(make_prediction(now - timedelta(days=40)))
+
+def _export(client, **params):
+    response = client.get('/api/export', query_string=params)
+    assert response.status_code == 200
+    return response
+
+def test_csv_export_streams_every_row_oldest_first(client, rows):
+    response = _export(client)
+    
+    assert response.mimetype == 'text/csv'
+    assert 'predictions.csv' in response.headers['Content-Disposition']
+    records = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert list(records[0]) == EXPORT_COLUMNS
+    assert [float(record['nitrogen']) for record in records] == [7, 6, 5, 4, 3, 2, 1]
+    assert datetime.fromisoformat(records[0]['created_at']) < datetime.fromisoformat(records[-1]['created_at'])
+
+def test_ndjson_export_filters_by_field(client, rows):
+    response = _export(client, format='ndjson', field_id='FIELD_002')
+    
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record['nitrogen'] for record in records] == [7.0, 5.0, 3.0, 1.0]
+    assert {record['field_id'] for record in records} == {'FIELD_002'}
+    assert set(records[0]) == set(EXPORT_COLUMNS)
+
+def test_parquet_export(client, rows):
+    pq = pytest.importorskip('pyarrow.parquet')
+    
+    response = _export(client, format='parquet', days=60)
+    
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.num_rows == 8
+    # One row group per partition of EXPORT_BATCH_SIZE rows
+    assert pq.ParquetFile(io.BytesIO(response.get_data())).num_row_groups >= 4
+
+def test_empty_export_has_only_the_header(client):
+    assert _export(client).get_data(as_text=True).splitlines() == [','.join(EXPORT_COLUMNS)]
+
+def test_unknown_export_format(client):
+    response = client.get('/api/export', query_string={'format': 'xlsx'})
+    
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
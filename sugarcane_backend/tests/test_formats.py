@@ -0,0 +1,72 @@
+import io
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.formats import FIELD_NAMES, HISTORY_FORMATS
+from conftest import make_prediction
+
+@pytest.fixture
+def rows(add_predictions):
+    now = datetime.utcnow().replace(microsecond=0)
+    add_predictions(*[make_prediction(now - timedelta(hours=hours), nitrogen=hours) for hours in range(1, 6)])
+
+def _history(client, headers=None, **params):
+    response = client.get('/api/history', query_string=params, headers=headers)
+    assert response.status_code == 200
+    return response
+
+def test_columnar_page_matches_the_json_page(client, rows):
+    rows = _history(client, limit=3, fields='id,created_at,nitrogen').get_json()
+    
+    page = _history(client, format='columnar', limit=3, fields='id,created_at,nitrogen')
+    
+    assert page.mimetype == HISTORY_FORMATS['columnar']
+    document = page.get_json()
+    assert document['fields'] == ['id', 'created_at', 'nitrogen']
+    assert document['next_cursor'] == rows['next_cursor']
+    columns = [document['columns'][name] for name in document['fields']]
+    assert [dict(zip(document['fields'], values)) for values in zip(*columns)] == rows['data']
+
+def test_columnar_page_has_every_column_by_default(client, rows):
+    document = _history(client, format='columnar').get_json()
+    
+    assert document['fields'] == FIELD_NAMES
+    assert document['columns']['nitrogen'] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+def test_accept_header_picks_the_format(client, rows):
+    response = _history(client, headers={'Accept': HISTORY_FORMATS['columnar']})
+    
+    assert response.mimetype == HISTORY_FORMATS['columnar']
+    assert _history(client, headers={'Accept': 'text/html'}).mimetype == 'application/json'
+
+def test_arrow_page(client, rows):
+    pa = pytest.importorskip('pyarrow')
+    
+    response = _history(client, format='arrow', limit=4, fields='id,created_at,nitrogen')
+    
+    table = pa.ipc.open_stream(io.BytesIO(response.get_data())).read_all()
+    assert table.column_names == ['id', 'created_at', 'nitrogen']
+    assert table.column('nitrogen').to_pylist() == [1.0, 2.0, 3.0, 4.0]
+    assert table.schema.field('created_at').type == pa.timestamp('us')
+    assert response.headers['X-Count'] == '4' and response.headers['X-Next-Cursor']
+
+def test_msgpack_page(client, rows):
+    msgpack = pytest.importorskip('msgpack')
+    
+    response = _history(client, format='msgpack', fields='nitrogen')
+    
+    assert msgpack.unpackb(response.get_data())['columns'] == {'nitrogen': [1.0, 2.0, 3.0, 4.0, 5.0]}
+
+def test_missing_encoder_is_not_acceptable(client, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'msgpack', None)
+    
+    response = client.get('/api/history', query_string={'format': 'msgpack'})
+    
+    assert response.status_code == 406
+    assert response.get_json()['success'] is False
+
+@pytest.mark.parametrize('params', [{'format': 'xml'}, {'fields': 'id,secret'}, {'fields': ','}])
+def test_unknown_formats_and_fields(client, params):
+    assert client.get('/api/history', query_string=params).status_code == 400
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_prediction
+
+def _page(client, **params):
+    response = client.get('/api/history', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_cursor_pages_return_every_row_once(client, add_predictions):
+    now = datetime.utcnow().replace(microsecond=0)
+    # Three rows share a timestamp, so pages must break ties on id
+    times = [now - timedelta(hours=hours) for hours in (1, 2, 2, 2, 3, 4, 5)]
+    add_predictions(*[make_prediction(created_at) for created_at in times])
+    
+    seen = []
+    page = _page(client, limit=3)
+    while True:
+        seen.extend((row['created_at'], row['id']) for row in page['data'])
+        if not page['next_cursor']:
+            break
+        page = _page(client, limit=3, after=page['next_cursor'])
+    
+    assert len(seen) == len(times)
+    assert len(set(seen)) == len(times)
+    assert seen == sorted(seen, reverse=True)
+
+def test_last_full_page_has_no_rows_after_it(client, add_predictions):
+    now = datetime.utcnow()
+    add_predictions(*[make_prediction(now - timedelta(minutes=minutes)) for minutes in range(4)])
+    
+    first = _page(client, limit=2)
+    second = _page(client, limit=2, after=first['next_cursor'])
+    third = _page(client, limit=2, after=second['next_cursor'])
+    
+    assert (first['count'], second['count'], third['count']) == (2, 2, 0)
+    assert third['next_cursor'] is None
+
+def test_history_filters_by_field_and_window(client, add_predictions):
+    now = datetime.utcnow()
+    add_predictions(
+        make_prediction(now - timedelta(days=1), field_id='FIELD_001'),
+        make_prediction(now - timedelta(days=1), field_id='FIELD_002'),
+        make_prediction(now - timedelta(days=10), field_id='FIELD_001')
+    )
+    
+    assert _page(client, field_id='FIELD_001')['count'] == 2
+    assert _page(client, field_id='FIELD_001', days=5)['count'] == 1
+
+def test_history_projects_fields(client, add_predictions):
+    add_predictions(make_prediction(nitrogen=3.5))
+    
+    [row] = _page(client, fields='id,nitrogen')['data']
+    
+    assert set(row) == {'id', 'nitrogen'}
+    assert row['nitrogen'] == pytest.approx(3.5)
+
+@pytest.mark.parametrize('params', [
+    {'limit': 0},
+    {'limit': -1},
+    {'limit': 100000},
+    {'after': 'not-a-cursor'}
+])
+def test_history_rejects_bad_paging(client, params):
+    assert client.get('/api/history', query_string=params).status_code == 400
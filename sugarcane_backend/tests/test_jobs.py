@@ -0,0 +1,94 @@
+import io
+import os
+import signal
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from app import db
+from app.jobs import job_runner
+from app.models import Job, Prediction
+from conftest import SAMPLE
+
+@pytest.fixture
+def jobs(app, monkeypatch):
+    """The job runner with small chunks, stopped after the test"""
+    monkeypatch.setattr(job_runner, 'chunk_size', 40)
+    yield job_runner
+    job_runner.shutdown()
+
+def _survey(rows):
+    lines = [','.join([*SAMPLE, 'field_id'])]
+    lines += [','.join([*map(str, SAMPLE.values()), f'FIELD_{row % 3:03d}']) for row in range(rows)]
+    # One row the models cannot use
+    lines.append('2.0,38.5,18.52,73.85,150,FIELD_BAD')
+    return io.BytesIO(('\n'.join(lines) + '\n').encode())
+
+def _submit(client, rows):
+    response = client.post('/api/jobs', data={'file': (_survey(rows), 'survey.csv')})
+    assert response.status_code == 202
+    return response.get_json()['job']['job_id']
+
+def _job(app, job_id):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        db.session.expunge_all()
+        return job
+
+def _wait(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def _stored(app):
+    with app.app_context():
+        return db.session.execute(select(func.count()).select_from(Prediction.__table__)).scalar()
+
+def test_job_predicts_every_row(app, client, jobs):
+    job_id = _submit(client, 250)
+    
+    _wait(lambda: _job(app, job_id).status in ('completed', 'failed'))
+    
+    job = client.get(f'/api/jobs/{job_id}').get_json()['job']
+    assert job['status'] == 'completed'
+    assert (job['total_rows'], job['processed_rows'], job['failed_rows']) == (251, 251, 1)
+    output = client.get(f'/api/jobs/{job_id}/output').get_data(as_text=True).splitlines()
+    assert len(output) == 252
+    assert output[-1].startswith('250,FIELD_BAD,')
+    assert _stored(app) == 250
+
+def test_output_waits_for_the_job(app, client, jobs):
+    job_id = _submit(client, 10)
+    
+    if _job(app, job_id).status != 'completed':
+        assert client.get(f'/api/jobs/{job_id}/output').status_code == 409
+    _wait(lambda: _job(app, job_id).status == 'completed')
+    assert client.get(f'/api/jobs/{job_id}/output').status_code == 200
+
+def test_killed_job_resumes_without_waiting_for_its_heartbeat(app, client, jobs):
+    job_id = _submit(client, 4000)
+    _wait(lambda: _job(app, job_id).processed_rows > 0)
+    
+    job = _job(app, job_id)
+    os.kill(int(job.worker.rpartition(':')[2]), signal.SIGKILL)
+    
+    # The heartbeat is fresh, but the worker is gone (once its pool has reaped it)
+    _wait(lambda: jobs.recover() == [job_id])
+    _wait(lambda: _job(app, job_id).status in ('completed', 'failed'))
+    
+    resumed = _job(app, job_id)
+    assert resumed.status == 'completed'
+    assert resumed.worker != job.worker
+    assert resumed.processed_rows == 4001
+    assert _stored(app) == 4000
+    assert len(client.get(f'/api/jobs/{job_id}/output').get_data(as_text=True).splitlines()) == 4002
+
+def test_live_jobs_are_not_taken_over(app, client, jobs):
+    job_id = _submit(client, 4000)
+    _wait(lambda: _job(app, job_id).processed_rows > 0)
+    
+    assert jobs.recover() == []
+    
+    _wait(lambda: _job(app, job_id).status == 'completed')
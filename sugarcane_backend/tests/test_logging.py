@@ -0,0 +1,42 @@
+import json
+import logging
+
+import pytest
+
+from app.logging_config import request_logger
+from conftest import SAMPLE
+
+def _logged(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == 'app.requests']
+
+@pytest.fixture
+def logs(caplog):
+    caplog.set_level(logging.INFO, logger='app.requests')
+    return caplog
+
+def test_fast_requests_are_sampled(client, logs, monkeypatch):
+    monkeypatch.setattr(request_logger, 'sample_rate', 0.0)
+    # The first prediction may load the models
+    monkeypatch.setattr(request_logger, 'slow_ms', 60000.0)
+    
+    client.post('/api/predict', json=SAMPLE)
+    client.get('/api/health')
+    
+    assert _logged(logs) == []
+
+def test_slow_requests_are_always_logged(client, logs, monkeypatch):
+    monkeypatch.setattr(request_logger, 'sample_rate', 0.0)
+    monkeypatch.setattr(request_logger, 'slow_ms', 0.0)
+    
+    client.post('/api/predict', json=SAMPLE)
+    
+    [record] = _logged(logs)
+    assert (record['method'], record['path'], record['status']) == ('POST', '/api/predict', 201)
+    assert record['sampled'] is False and record['duration_ms'] >= 0
+
+def test_sampled_requests_are_marked(client, logs, monkeypatch):
+    monkeypatch.setattr(request_logger, 'sample_rate', 1.0)
+    
+    client.get('/api/health')
+    
+    assert [record['sampled'] for record in _logged(logs)] == [True]
@@ -0,0 +1,94 @@
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+from app.lookup_grid import CHANNELS, GRID_FILE, META_FILE, LookupGrid, LookupGridError, build_grid
+from app.ml_models import DEFAULT_MODELS_PATH, NUTRIENTS, ModelManager
+from app.registry import OPTIONAL_FILES, REQUIRED_FILES
+from conftest import SAMPLE
+
+SMALL_SHAPE = {'ndvi': 3, 'chlorophyll': 3, 'latitude': 2, 'longitude': 2, 'day_of_year': 3}
+
+def _linear_grid():
+    """Grid over [0, 1] x [0, 10] x [-1, 1] storing the affine function 1 + 2a - b/5 + 3c"""
+    lower, upper, shape = np.array([0.0, 0.0, -1.0]), np.array([1.0, 10.0, 1.0]), (3, 6, 5)
+    axes = [np.linspace(low, high, n) for low, high, n in zip(lower, upper, shape)]
+    a, b, c = np.meshgrid(*axes, indexing='ij')
+    values = np.repeat((1 + 2 * a - b / 5 + 3 * c)[..., None], len(CHANNELS), axis=-1)
+    return LookupGrid(['a', 'b', 'c'], lower, upper, values)
+
+def _affine(X):
+    return 1 + 2 * X[:, 0] - X[:, 1] / 5 + 3 * X[:, 2]
+
+def test_interpolation_is_exact_for_affine_functions():
+    grid = _linear_grid()
+    X = np.random.default_rng(0).uniform(grid.lower, grid.upper, (500, 3))
+    # Include the corners and the upper faces of the box
+    X = np.vstack([X, grid.lower, grid.upper, [[1.0, 0.0, 1.0]]])
+    
+    values = grid.interpolate(X)
+    
+    assert values.shape == (len(X), len(CHANNELS))
+    np.testing.assert_allclose(values[:, 0], _affine(X), atol=1e-9)
+    predictions, confidence = grid.predict(X)
+    assert set(predictions) == set(confidence) == set(NUTRIENTS)
+
+def test_contains_only_rows_inside_the_box():
+    grid = _linear_grid()
+    
+    mask = grid.contains([[0.5, 5.0, 0.0], [1.0, 10.0, 1.0], [1.1, 5.0, 0.0], [0.5, -0.1, 0.0]])
+    
+    assert mask.tolist() == [True, True, False, False]
+    assert not grid.contains([[0.5, 5.0]]).any()
+
+def test_grids_need_two_points_per_axis():
+    with pytest.raises(LookupGridError):
+        LookupGrid(['a'], [0.0], [1.0], np.zeros((1, len(CHANNELS))))
+    with pytest.raises(LookupGridError):
+        LookupGrid(['a', 'b'], [0.0, 0.0], [1.0, 1.0], np.zeros((2, 2, 1)))
+
+@pytest.fixture(scope='module')
+def models_dir(tmp_path_factory):
+    """Copy of the bundled models with a small lookup grid beside them"""
+    directory = tmp_path_factory.mktemp('models')
+    for filename in [*REQUIRED_FILES.values(), *OPTIONAL_FILES.values()]:
+        shutil.copy2(f'{DEFAULT_MODELS_PATH}/{filename}', directory)
+    build_grid(ModelManager(directory), directory, shape=SMALL_SHAPE, samples=500)
+    return directory
+
+def test_build_records_the_interpolation_error(models_dir):
+    grid = LookupGrid.load(models_dir)
+    
+    assert grid.meta['shape'] == list(SMALL_SHAPE.values())
+    assert grid.meta['model_version'] == ModelManager(models_dir).version
+    assert grid.meta['error']['samples'] == 500
+    assert all(grid.meta['error'][name]['max_abs_error'] >= 0 for name in CHANNELS)
+
+def test_manager_serves_rows_inside_the_grid(models_dir):
+    models = ModelManager(models_dir)
+    gridded = ModelManager(models_dir, lookup_grid=True)
+    grid = gridded.grid
+    inside = dict(SAMPLE, latitude=float(grid.lower[2] + grid.upper[2]) / 2, longitude=float(grid.lower[3]))
+    outside = dict(inside, latitude=float(grid.upper[2]) + 1)
+    assert grid.contains([list(inside.values()), list(outside.values())]).tolist() == [True, False]
+    
+    served = gridded.predict(**inside)
+    
+    expected = grid.predict(np.array([list(inside.values())]))[0]
+    assert served['predictions'] == pytest.approx({name: expected[name][0] for name in NUTRIENTS})
+    assert gridded.load_report['lookup_grid']['shape'] == list(SMALL_SHAPE.values())
+    # Rows outside the box, alone or in a batch, go to the models
+    assert gridded.predict(**outside)['predictions'] == models.predict(**outside)['predictions']
+    batch = gridded.predict_batch(np.array([list(inside.values()), list(outside.values())]))
+    assert batch['predictions']['nitrogen'][0] == pytest.approx(served['predictions']['nitrogen'])
+    assert batch['predictions']['nitrogen'][1] == pytest.approx(models.predict(**outside)['predictions']['nitrogen'])
+
+def test_grid_for_other_models_is_ignored(models_dir, tmp_path):
+    for filename in [*REQUIRED_FILES.values(), GRID_FILE, META_FILE]:
+        shutil.copy2(models_dir / filename, tmp_path)
+    meta = json.loads((tmp_path / META_FILE).read_text())
+    (tmp_path / META_FILE).write_text(json.dumps(dict(meta, model_version='legacy-000000000000')))
+    
+    assert ModelManager(tmp_path, lookup_grid=True).grid is None
@@ -0,0 +1,35 @@
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client.parser import text_string_to_metric_families
+
+from conftest import SAMPLE
+
+def _samples(client):
+    """{(name, sorted label items): value} of the /metrics exposition"""
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.get_data(as_text=True))
+        for sample in family.samples
+    }
+
+def _requests(status):
+    labels = {'method': 'POST', 'endpoint': '/api/predict', 'status': status}
+    return ('sugarcane_http_requests_total', tuple(sorted(labels.items())))
+
+def test_metrics_content_type(client):
+    response = client.get('/api/metrics')
+    
+    assert response.headers['Content-Type'] == CONTENT_TYPE_LATEST
+
+def test_requests_are_counted_by_route(client):
+    # Counters live for the whole process, so compare with the counts before
+    before = _samples(client)
+    client.post('/api/predict', json=SAMPLE)
+    client.post('/api/predict', json={'ndvi': 2.0, 'chlorophyll': 30})
+    
+    after = _samples(client)
+    
+    for status in ('201', '400'):
+        assert after[_requests(status)] == before.get(_requests(status), 0) + 1
+    assert ('sugarcane_predict_stage_seconds_count', (('stage', 'scale'),)) in after
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app.ml_models import DEFAULT_MODELS_PATH, ModelManager
+from conftest import SAMPLE
+
+@pytest.fixture
+def rows():
+    return np.array([list(SAMPLE.values()), [0.3, 25.0, 18.9, 74.2, 300]])
+
+def test_parallel_and_sequential_loads_agree(rows):
+    parallel = ModelManager(DEFAULT_MODELS_PATH, parallel_load=True)
+    sequential = ModelManager(DEFAULT_MODELS_PATH, parallel_load=False, mmap_mode=None)
+    parallel.load_models()
+    sequential.load_models()
+    
+    for name, values in parallel.predict_batch(rows)['predictions'].items():
+        assert values == pytest.approx(sequential.predict_batch(rows)['predictions'][name])
+
+def test_parallel_load_retries_a_failed_import(monkeypatch, rows):
+    manager = ModelManager(DEFAULT_MODELS_PATH, parallel_load=True)
+    load_file = manager._load_file
+    failed = []
+    def flaky_load(path):
+        # What a thread sees when another thread is halfway through importing scikit-learn
+        if not failed:
+            failed.append(path)
+            raise ImportError("cannot import name 'clone' from partially initialized module 'sklearn.base'")
+        return load_file(path)
+    monkeypatch.setattr(manager, '_load_file', flaky_load)
+    
+    manager.load_models()
+    
+    assert len(failed) == 1
+    assert manager.predict_batch(rows)['predictions']['nitrogen'].shape == (2,)
@@ -0,0 +1,65 @@
+import joblib
+import numpy as np
+import pytest
+
+from app.ml_models import DEFAULT_MODELS_PATH, ModelManager, model_manager_from_env
+from app.registry import REQUIRED_FILES
+from app.tree_compiler import NativeTreePredictor, UnsupportedModel, compile_model, verify_compiled
+
+@pytest.fixture(scope='module')
+def library():
+    manager = ModelManager(DEFAULT_MODELS_PATH)
+    manager.load_models()
+    return manager
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(7)
+    return np.column_stack([
+        rng.uniform(0, 1, 40), rng.uniform(10, 60, 40), rng.uniform(16, 21, 40),
+        rng.uniform(72, 77, 40), rng.integers(1, 366, 40)
+    ])
+
+@pytest.mark.parametrize('name', ['nitrogen', 'potassium'])
+def test_compiled_trees_match_the_library(name):
+    model = joblib.load(f'{DEFAULT_MODELS_PATH}/{REQUIRED_FILES[name]}')
+    compiled = compile_model(model)
+    
+    assert verify_compiled(compiled, model, 5) < 1e-6
+    X = np.random.default_rng(1).standard_normal((3, 5))
+    assert compiled.predict(X) == pytest.approx(model.predict(X), abs=1e-6)
+
+def test_other_models_are_not_compiled():
+    model = joblib.load(f"{DEFAULT_MODELS_PATH}/{REQUIRED_FILES['phosphorus']}")
+    
+    with pytest.raises(UnsupportedModel):
+        compile_model(model)
+
+def test_native_backend_is_opt_in(monkeypatch, library):
+    monkeypatch.delenv('NATIVE_TREE_MODELS', raising=False)
+    
+    assert model_manager_from_env(DEFAULT_MODELS_PATH).native_models == set()
+    assert set(library.load_report['backends'].values()) == {'library'}
+
+def test_native_backend_predicts_like_the_library(library, rows):
+    native = ModelManager(DEFAULT_MODELS_PATH, native_models=['nitrogen', 'potassium'])
+    native.load_models()
+    
+    assert native.load_report['backends'] == {'nitrogen': 'native', 'phosphorus': 'library', 'potassium': 'native'}
+    expected = library.predict_batch(rows)
+    actual = native.predict_batch(rows)
+    for name in ('nitrogen', 'phosphorus', 'potassium'):
+        assert actual['predictions'][name] == pytest.approx(expected['predictions'][name], abs=1e-5)
+        assert actual['confidence'][name] == pytest.approx(expected['confidence'][name], abs=1e-4)
+
+def test_large_inputs_go_to_the_library():
+    class Model:
+        def predict(self, X):
+            return np.full(len(X), -1.0)
+    class Compiled:
+        def predict(self, X):
+            return np.ones(len(X))
+    predictor = NativeTreePredictor(Model(), Compiled(), max_rows=2)
+    
+    assert predictor.predict(np.zeros((2, 5))).tolist() == [1.0, 1.0]
+    assert predictor.predict(np.zeros((3, 5))).tolist() == [-1.0, -1.0, -1.0]
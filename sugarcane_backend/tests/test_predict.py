@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from app import persistence
+
+from app.persistence import prediction_writer
+from conftest import SAMPLE
+
+def _history(client, **params):
+    response = client.get('/api/history', query_string={'limit': 1000, **params})
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+def test_predict_returns_stored_id(client):
+    response = client.post('/api/predict?return_id=true', json={**SAMPLE, 'field_id': 'FIELD_001', 'notes': 'north'})
+    
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['success'] is True
+    assert set(body['predictions']) == {'nitrogen', 'phosphorus', 'potassium'}
+    
+    [stored] = _history(client)
+    assert stored['id'] == body['prediction_id']
+    assert stored['field_id'] == 'FIELD_001'
+    assert stored['notes'] == 'north'
+    assert stored['predictions']['nitrogen'] == pytest.approx(body['predictions']['nitrogen'], abs=0.005)
+
+def test_buffered_predictions_are_written_on_flush(client):
+    for field_id in ('FIELD_001', 'FIELD_002'):
+        response = client.post('/api/predict', json={**SAMPLE, 'field_id': field_id})
+        assert response.status_code == 201
+        assert response.get_json()['prediction_id'] is None
+    
+    prediction_writer.flush()
+    
+    assert sorted(row['field_id'] for row in _history(client)) == ['FIELD_001', 'FIELD_002']
+
+def test_flush_waits_for_a_flush_in_progress(client, monkeypatch):
+    insert_predictions = persistence.insert_predictions
+    def slow_insert(connection, rows):
+        time.sleep(0.3)
+        insert_predictions(connection, rows)
+    monkeypatch.setattr(persistence, 'insert_predictions', slow_insert)
+    client.post('/api/predict', json={**SAMPLE, 'field_id': 'FIELD_001'})
+    # The background thread takes the buffered row and is still writing it
+    background = threading.Thread(target=prediction_writer.flush)
+    background.start()
+    time.sleep(0.1)
+    
+    prediction_writer.flush()
+    
+    assert [row['field_id'] for row in _history(client)] == ['FIELD_001']
+    background.join()
+
+@pytest.mark.parametrize('change', [
+    {'ndvi': 1.5},
+    {'chlorophyll': -1},
+    {'ndvi': 'high'},
+    {'notes': {'text': 'not a string'}},
+    {'field_id': ['FIELD_001']}
+])
+def test_predict_rejects_invalid_input(client, change):
+    response = client.post('/api/predict', json={**SAMPLE, **change})
+    
+    assert response.status_code == 400
+
+def test_predict_requires_ndvi_and_chlorophyll(client):
+    response = client.post('/api/predict', json={'latitude': 18.5})
+    
+    assert response.status_code == 400
+
+def test_numeric_field_id_is_stored_as_text(client):
+    response = client.post('/api/predict?return_id=true', json={**SAMPLE, 'field_id': 7})
+    
+    assert response.status_code == 201
+    assert _history(client)[0]['field_id'] == '7'
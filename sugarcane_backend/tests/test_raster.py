@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.ml_models import NUTRIENTS, ModelManager
+from app.raster import RasterError, iter_windows, pixel_coordinates, predict_raster
+from conftest import SAMPLE
+
+GEOTRANSFORM = [73.8, 0.001, 0.0, 18.6, 0.0, -0.001]
+NODATA = -9999.0
+
+@pytest.fixture(scope='module')
+def manager():
+    return ModelManager()
+
+def _write_raster(path, array, geotransform=GEOTRANSFORM):
+    np.save(path, array)
+    path.with_name(f'{path.name}.json').write_text(json.dumps({'geotransform': geotransform, 'nodata': NODATA}))
+    return path
+
+@pytest.fixture
+def rasters(tmp_path):
+    """37x23 NDVI and chlorophyll bands with nodata, NaN and out-of-range pixels"""
+    rng = np.random.default_rng(0)
+    ndvi = rng.uniform(0.2, 0.9, (37, 23))
+    chlorophyll = rng.uniform(20, 50, (37, 23))
+    ndvi[0, 0] = NODATA
+    chlorophyll[5, 7] = np.nan
+    ndvi[36, 22] = 1.5
+    chlorophyll[20, 3] = -1.0
+    return _write_raster(tmp_path / 'ndvi.npy', ndvi), _write_raster(tmp_path / 'chl.npy', chlorophyll)
+
+def test_pixel_centres_follow_the_geotransform():
+    latitude, longitude = pixel_coordinates(GEOTRANSFORM, 2, 3, 2, 2)
+    
+    np.testing.assert_allclose(latitude, [[18.5975, 18.5975], [18.5965, 18.5965]])
+    np.testing.assert_allclose(longitude, [[73.8035, 73.8045], [73.8035, 73.8045]])
+
+def test_windows_cover_the_raster_once():
+    covered = np.zeros((37, 23), dtype=int)
+    for row_off, col_off, height, width in iter_windows(covered.shape, 16):
+        covered[row_off:row_off + height, col_off:col_off + width] += 1
+    
+    assert (covered == 1).all()
+
+def test_every_valid_pixel_is_predicted(manager, rasters, tmp_path):
+    ndvi_path, chlorophyll_path = rasters
+    
+    summary = predict_raster(manager, ndvi_path, chlorophyll_path, tmp_path / 'maps',
+                             day_of_year=SAMPLE['day_of_year'], tile_size=16, confidence=True)
+    
+    assert (summary['pixels'], summary['predicted_pixels']) == (37 * 23, 37 * 23 - 4)
+    assert set(summary['outputs']) == {*NUTRIENTS, *(f'{name}_confidence' for name in NUTRIENTS)}
+    maps = {layer: np.load(path) for layer, path in summary['outputs'].items()}
+    invalid = [(0, 0), (5, 7), (36, 22), (20, 3)]
+    for layer in maps.values():
+        assert layer.shape == (37, 23) and layer.dtype == np.float32
+        assert all(np.isnan(layer[pixel]) for pixel in invalid)
+        assert np.isfinite(layer).sum() == summary['predicted_pixels']
+    
+    ndvi, chlorophyll = np.load(ndvi_path), np.load(chlorophyll_path)
+    latitude, longitude = pixel_coordinates(GEOTRANSFORM, 30, 10, 1, 1)
+    expected = manager.predict(ndvi=ndvi[30, 10], chlorophyll=chlorophyll[30, 10], latitude=latitude[0, 0],
+                               longitude=longitude[0, 0], day_of_year=SAMPLE['day_of_year'])
+    for name in NUTRIENTS:
+        assert maps[name][30, 10] == pytest.approx(expected['predictions'][name], rel=1e-5)
+        assert maps[f'{name}_confidence'][30, 10] == pytest.approx(expected['confidence'][name], abs=1e-4)
+
+def test_tile_size_does_not_change_the_maps(manager, rasters, tmp_path):
+    tiled = predict_raster(manager, *rasters, tmp_path / 'tiled', day_of_year=100, tile_size=8)
+    whole = predict_raster(manager, *rasters, tmp_path / 'whole', day_of_year=100, tile_size=64)
+    
+    for name in NUTRIENTS:
+        np.testing.assert_allclose(np.load(tiled['outputs'][name]), np.load(whole['outputs'][name]), rtol=1e-6)
+
+def test_mismatched_rasters_are_rejected(manager, rasters, tmp_path):
+    ndvi_path, _ = rasters
+    shifted = _write_raster(tmp_path / 'shifted.npy', np.load(ndvi_path), [73.9, *GEOTRANSFORM[1:]])
+    smaller = _write_raster(tmp_path / 'smaller.npy', np.load(ndvi_path)[:10])
+    
+    with pytest.raises(RasterError, match='co-registered'):
+        predict_raster(manager, ndvi_path, shifted, tmp_path / 'out', day_of_year=100)
+    with pytest.raises(RasterError, match='shapes differ'):
+        predict_raster(manager, ndvi_path, smaller, tmp_path / 'out', day_of_year=100)
+    with pytest.raises(RasterError, match='day_of_year'):
+        predict_raster(manager, *rasters, tmp_path / 'out')
+
+def test_npy_rasters_need_a_geotransform(manager, tmp_path):
+    np.save(tmp_path / 'bare.npy', np.zeros((2, 2)))
+    
+    with pytest.raises(RasterError, match='no geotransform'):
+        predict_raster(manager, tmp_path / 'bare.npy', tmp_path / 'bare.npy', tmp_path / 'out', day_of_year=100)
@@ -0,0 +1,88 @@
+import shutil
+
+import pytest
+
+from app.ml_models import DEFAULT_MODELS_PATH, ModelManager
+from app.registry import OPTIONAL_FILES, REQUIRED_FILES, ModelRegistry, RegistryError
+from conftest import SAMPLE
+
+ADMIN = {'X-Admin-Token': 'secret'}
+
+@pytest.fixture
+def app_config():
+    return {'ADMIN_TOKEN': 'secret'}
+
+@pytest.fixture
+def registry(tmp_path):
+    """An empty models directory and a copy of the bundled models to publish"""
+    source = tmp_path / 'source'
+    source.mkdir()
+    for filename in [*REQUIRED_FILES.values(), *OPTIONAL_FILES.values()]:
+        shutil.copy2(f'{DEFAULT_MODELS_PATH}/{filename}', source)
+    registry = ModelRegistry(tmp_path / 'models')
+    registry.source = source
+    return registry
+
+def test_published_versions_are_verified(registry):
+    manifest = registry.publish(registry.source, 'v1')
+    
+    assert manifest['feature_order'] == list(SAMPLE)
+    assert set(manifest['files']) == {*REQUIRED_FILES, *OPTIONAL_FILES}
+    assert [entry['version'] for entry in registry.list_versions()] == ['v1']
+    with pytest.raises(RegistryError, match='already exists'):
+        registry.publish(registry.source, 'v1')
+    
+    with open(registry.versions_dir / 'v1' / REQUIRED_FILES['nitrogen'], 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(RegistryError, match='Checksum mismatch'):
+        registry.resolve('v1')
+
+@pytest.mark.parametrize('version', ['../v1', '.hidden', 'a/b', ''])
+def test_version_names_are_single_directory_names(registry, version):
+    with pytest.raises(RegistryError):
+        registry.publish(registry.source, version)
+
+def test_activation_switches_every_manager(registry):
+    registry.publish(registry.source, 'v1')
+    registry.publish(registry.source, 'v2')
+    registry.set_active('v1')
+    serving = ModelManager(registry.root)
+    other = ModelManager(registry.root)
+    
+    serving.activate('v2')
+    
+    assert (serving.version, registry.active_version()) == ('v2', 'v2')
+    # Another worker process follows the ACTIVE pointer
+    assert other.refresh_if_changed(interval=0)
+    assert other.version == 'v2'
+    assert other.predict(**SAMPLE)['predictions'] == serving.predict(**SAMPLE)['predictions']
+
+def test_failed_activation_keeps_the_current_version(registry):
+    registry.publish(registry.source, 'v1')
+    registry.publish(registry.source, 'v2')
+    registry.set_active('v1')
+    manager = ModelManager(registry.root)
+    (registry.versions_dir / 'v2' / REQUIRED_FILES['potassium']).unlink()
+    
+    with pytest.raises(RegistryError):
+        manager.activate('v2')
+    
+    assert (manager.version, registry.active_version()) == ('v1', 'v1')
+    assert manager.predict(**SAMPLE)['success']
+
+def test_admin_endpoints_need_the_token(app, client):
+    assert client.get('/api/admin/models').status_code == 401
+    assert client.get('/api/admin/models', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+    
+    listing = client.get('/api/admin/models', headers=ADMIN).get_json()
+    assert listing['success'] and listing['loaded_version']
+    
+    app.config['ADMIN_TOKEN'] = None
+    assert client.get('/api/admin/models', headers=ADMIN).status_code == 403
+
+@pytest.mark.parametrize('body, status', [({}, 400), ({'version': '../x'}, 400), ({'version': 'missing'}, 404)])
+def test_activate_endpoint_rejects_bad_versions(client, body, status):
+    response = client.post('/api/admin/models/activate', json=body, headers=ADMIN)
+    
+    assert response.status_code == status
+    assert response.get_json()['success'] is False
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, select
+
+from app import db
+from app.models import FieldDailyRollup
+from app.rollups import ensure_rollups, rebuild_rollups
+from conftest import make_prediction
+
+def _get(client, path, **params):
+    response = client.get(path, query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+def _summary(entry):
+    return {key: value for key, value in entry.items() if key not in ('bucket', 'field_id', 'success')}
+
+def _rollups(app):
+    with app.app_context():
+        rows = db.session.execute(select(FieldDailyRollup.__table__)).mappings().all()
+    return sorted((dict(row) for row in rows), key=lambda row: (row['field_id'], row['day']))
+
+@pytest.mark.parametrize('bucket', ['day', 'week', 'month'])
+@pytest.mark.parametrize('field_id', [None, 'FIELD_001'])
+def test_trends_match_statistics_buckets(client, spread, bucket, field_id):
+    params = {'days': 60, 'bucket': bucket, **({'field_id': field_id} if field_id else {})}
+    
+    statistics = _get(client, '/api/statistics', **params)
+    trends = _get(client, '/api/trends', **params)
+    
+    assert [group['bucket'] for group in statistics['groups']] == [entry['bucket'] for entry in trends['series']]
+    for group, entry in zip(statistics['groups'], trends['series']):
+        assert _summary(group) == _summary(entry)
+
+def test_writes_to_the_same_day_update_one_rollup(app, add_predictions):
+    now = datetime.utcnow()
+    add_predictions(make_prediction(now, nitrogen=2.0))
+    add_predictions(make_prediction(now, nitrogen=5.0), make_prediction(now, nitrogen=3.0))
+    
+    [rollup] = _rollups(app)
+    
+    assert rollup['count'] == 3
+    assert (rollup['nitrogen_min'], rollup['nitrogen_max']) == (2.0, 5.0)
+    assert rollup['nitrogen_sum'] == pytest.approx(10.0)
+
+def test_rebuild_matches_incremental_rollups(app, spread):
+    incremental = _rollups(app)
+    
+    with app.app_context():
+        with db.engine.begin() as connection:
+            written = rebuild_rollups(connection)
+    
+    assert written == len(incremental)
+    rebuilt = _rollups(app)
+    assert [(row['field_id'], row['day']) for row in rebuilt] == [(row['field_id'], row['day']) for row in incremental]
+    for row, expected in zip(rebuilt, incremental):
+        assert row == pytest.approx(expected)
+
+def test_rebuild_counts_blank_field_ids_as_unknown(app, add_predictions):
+    now = datetime.utcnow()
+    add_predictions(make_prediction(now, field_id=''), make_prediction(now, field_id=None))
+    incremental = _rollups(app)
+    
+    with app.app_context():
+        with db.engine.begin() as connection:
+            rebuild_rollups(connection)
+    
+    assert [(row['field_id'], row['count']) for row in incremental] == [('UNKNOWN', 2)]
+    [rebuilt] = _rollups(app)
+    assert rebuilt == pytest.approx(incremental[0])
+
+def test_ensure_rollups_builds_missing_rollups_once(app, client, spread):
+    trends = _get(client, '/api/trends', days=60)
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(delete(FieldDailyRollup.__table__))
+        
+        assert ensure_rollups(db.engine) > 0
+        assert ensure_rollups(db.engine) == 0
+    
+    assert _get(client, '/api/trends', days=60) == trends
+
+def test_trends_of_an_empty_window(client):
+    assert _get(client, '/api/trends')['series'] == []
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.ml_models import NUTRIENTS
+
+def _get(client, path, **params):
+    response = client.get(path, query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+def _summary(entry):
+    return {key: value for key, value in entry.items() if key not in ('bucket', 'field_id', 'success')}
+
+def _rows(client, **params):
+    fields = ','.join(['field_id', *NUTRIENTS, *[f'{name}_status' for name in NUTRIENTS]])
+    return _get(client, '/api/history', limit=1000, days=60, fields=fields, **params)['data']
+
+@pytest.mark.parametrize('field_id', [None, 'FIELD_002'])
+def test_statistics_match_the_rows(client, spread, field_id):
+    params = {'field_id': field_id} if field_id else {}
+    rows = _rows(client, **params)
+    
+    statistics = _get(client, '/api/statistics', days=60, **params)
+    
+    assert statistics['count'] == len(rows)
+    for name in NUTRIENTS:
+        values = np.array([row[name] for row in rows])
+        assert statistics[name] == {
+            'mean': pytest.approx(round(values.mean(), 2), abs=0.011),
+            'min': round(values.min(), 2),
+            'max': round(values.max(), 2),
+            'std': pytest.approx(round(values.std(), 2), abs=0.011)
+        }
+        for label, count in statistics['status_counts'][name].items():
+            assert count == sum(row[f'{name}_status'] == label for row in rows)
+
+def test_week_buckets_start_on_monday(client, spread):
+    statistics = _get(client, '/api/statistics', days=60, bucket='week')
+    
+    for group in statistics['groups']:
+        assert datetime.strptime(group['bucket'], '%Y-%m-%d').weekday() == 0
+    assert sum(group['count'] for group in statistics['groups']) == statistics['count']
+
+def test_statistics_group_by_field(client, spread):
+    statistics = _get(client, '/api/statistics', days=60, group_by='field_id')
+    
+    assert [group['field_id'] for group in statistics['groups']] == ['FIELD_001', 'FIELD_002']
+    for group in statistics['groups']:
+        single = _get(client, '/api/statistics', days=60, field_id=group['field_id'])
+        assert _summary(group) == _summary(single)
+
+@pytest.mark.parametrize('params', [{'group_by': 'notes'}, {'bucket': 'hour'}])
+def test_statistics_rejects_unknown_groupings(client, params):
+    assert client.get('/api/statistics', query_string=params).status_code == 400
+
+def test_empty_window(client):
+    assert _get(client, '/api/statistics')['count'] == 0
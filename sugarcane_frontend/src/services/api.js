@@ -49,7 +49,8 @@ api.interceptors.response.use(
 export const predictNutrients = async (formData) => {
   try {
     console.log('🔮 Making prediction...');
-    const response = await api.post('/predict', formData);
+    // return_id: the results view shows the stored prediction ID
+    const response = await api.post('/predict', { ...formData, return_id: true });
     console.log('✅ Prediction successful:', response.data);
     return response.data;
   } catch (error) {